@@ -344,14 +344,14 @@ class TreeController(advancedtkinter.Controller):
         lastrow = self.tree.get_children(parentiid)
         ## If we don't have any rows loaded
         if not lastrow or len(lastrow) == 1:
-            lastrow = -1
+            lastrow = None
         else:
             ## Skip SHOWMORE
             lastrow = lastrow[-2]
             ## Get text returns [ columns.text, ...]
             lastrow = self.tree.gettext(lastrow)[0]
 
-        rows = table.quickselect(pk__gt=lastrow, rowid=True, limit=ROWBATCH)
+        rows = table.paginate(ROWBATCH, after=lastrow)
         ## If the table has no more rows
         if not rows:
             ## Get rid of SHOWMORE
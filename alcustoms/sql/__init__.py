@@ -7,4 +7,7 @@ from .objects import *
 from .objects.Connection import *
 from .objects.Table import *
 from .objects.View import *
-from .objects.Utilities import *
\ No newline at end of file
+from .objects.Utilities import *
+from .objects.Async import *
+from .objects.Instrumentation import *
+from .objects.Index import *
\ No newline at end of file
@@ -7,6 +7,22 @@ QUOTECHARS = ['"','[','`',"'"]
 ## This module's variable replacement limit (smaller than sqlite's limit just in case)
 REPLACEMENT_LIMIT = 900
 
+## The largest "__in" list which quick-queries split into REPLACEMENT_LIMIT-sized queries; larger lists (and "__notin" lists) are loaded into a temporary table
+## (loading a temporary table is faster once more than a couple of queries would be needed, but it has to write to the connection's temp database)
+LARGEIN_CHUNKLIMIT = 2 * REPLACEMENT_LIMIT
+
+## The default number of rows fetched at a time by iterative selects (i.e.- AdvancedTable.iselect)
+BATCHSIZE = 500
+## The default number of values per column in each batch yielded by AdvancedTable.iter_columns
+COLUMNBATCHSIZE = 65536
+
+## The maximum number of compiled quick-query statements kept by objects.QUERYCACHE
+QUERYCACHE_SIZE = 1024
+
+## The values accepted by the rows argument of AdvancedTable.select (and related methods) to bypass the Table's row_factory:
+## plain tuples, namedtuples created from the cursor's description (see objects.namedtuple_factory), or sqlite3.Row
+ROWMODES = ["tuple","namedtuple","row"]
+
 ## The [second] most complete DateTime format accepted by sqlite (extra work would have to be done to truncate the miliseconds in the datetime module)
 DTFORMAT = f"%Y-%m-%dT%H:%M:%S"
 
@@ -85,6 +101,9 @@ COLUMNDEFS = ["NOT NULL","AUTOINCREMENT",
              "ON CONFLICT",
              "PRIMARY KEY","FOREIGN KEY"] + COLUMNTYPES + COLLATEALGORITHMS + ONCONFLICTALGORITHMS + DEFAULTVALUES
 
+## Aggregate functions accepted by AdvancedTable.aggregate and AdvancedTable.group_by
+AGGREGATEFUNCTIONS = ["count","sum","avg","min","max","total","group_concat"]
+
 COMPOUNDOPS = ["UNION ALL","UNION","INTERSECT","EXCEPT"]
 
 basejoins = ["","LEFT","RIGHT","INNER","CROSS","LEFT OUTER"]
@@ -3,27 +3,83 @@ from alcustoms.sql.objects import graphdb
 
 from flask import current_app, g
 
+## Key for app.extensions
+POOLKEY = "alcustoms.sql.pools"
 
-def get_db(connection = None):
-    if 'db' not in g:
+def get_pool(connection = None):
+    """ Returns the DatabasePool registered for the given connection type with init_app (or None) """
+    return current_app.extensions.get(POOLKEY,dict()).get(connection)
+
+def get_db(connection = None, write = False):
+    """ Returns the Database for the current app context.
+
+        Each connection type (None for the default connection and "graph" for GraphDB) is held separately.
+        If a DatabasePool was registered for the connection type with init_app, the Database
+        is drawn from the pool (the writer if write is True, otherwise a reader) and is
+        returned to the pool when the app context is torn down. The reader and the writer are
+        held separately, so a writer can still be requested after a reader; once the writer is
+        held it is also returned for reads so that they see the context's uncommitted changes.
+        Otherwise a new connection is opened to DATABASE_PATH.
+    """
+    ## The connections held by the app context: {connection type: dict(pool, db (the reader), writer)}
+    connections = g.setdefault('dbs',dict())
+    if connection not in connections:
+        connections[connection] = dict(pool = get_pool(connection), db = None, writer = None)
+    held = connections[connection]
+    pool = held['pool']
+    if pool is not None:
+        if held['writer'] is not None: return held['writer']
+        if write:
+            held['writer'] = pool.acquire(write = True)
+            return held['writer']
+        if held['db'] is None:
+            held['db'] = pool.acquire()
+        return held['db']
+
+    if held['db'] is None:
         if connection == "graph":
             Connection = graphdb.GraphDB
             row_factory = graphdb.node_factory
         else:
             Connection = sql.Database
             row_factory = sql.advancedrow_factory
-        g.db = Connection(current_app.config['DATABASE_PATH'])
-        g.db.row_factory = row_factory
+        db = Connection(current_app.config['DATABASE_PATH'])
+        db.row_factory = row_factory
+        held['db'] = db
 
-    return g.db
+    return held['db']
 
 def close_db(e = None):
-    db = g.pop('db',None)
+    connections = g.pop('dbs',dict())
+    for held in connections.values():
+        pool = held['pool']
+        for db in (held['db'],held['writer']):
+            if db is None: continue
+            ## Uncommitted changes are discarded, as they would be by close()
+            if pool is not None: pool.release(db)
+            else: db.close()
+
+def create_pool(app, connection = None, **kw):
+    """ Creates a DatabasePool for DATABASE_PATH which uses the same Database class and row_factory as get_db.
 
-    if db is not None:
-        db.close()
+        The pool size can be set with the app's DATABASE_POOL_READERS config value.
+        Additional keyword arguments are passed to DatabasePool.
+    """
+    if connection == "graph":
+        kw.setdefault("databaseclass",graphdb.GraphDB)
+        kw.setdefault("row_factory",graphdb.node_factory)
+    else:
+        kw.setdefault("row_factory",sql.advancedrow_factory)
+    kw.setdefault("readers",app.config.get("DATABASE_POOL_READERS",4))
+    return sql.DatabasePool(app.config['DATABASE_PATH'], **kw)
 
+def init_app(app, pools = None):
+    """ Registers get_db and close_db with the app.
 
-def init_app(app):
+        pools is an optional dict mapping connection types (None for the default connection and
+        "graph" for GraphDB) to DatabasePools which get_db should draw from.
+    """
     app.get_db = get_db
-    app.teardown_appcontext(close_db)
\ No newline at end of file
+    app.teardown_appcontext(close_db)
+    if pools:
+        app.extensions[POOLKEY] = dict(pools)
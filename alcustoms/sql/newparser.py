@@ -1,6 +1,6 @@
 ## This Module
 from . import objects, virtual
-from .objects import Table, View
+from .objects import Table, View, Index
 from .constants import *
 
 ## Builtin
@@ -35,6 +35,18 @@ CREATERE = re.compile("""
     )?
 """, re.IGNORECASE | re.VERBOSE)
 
+INDEXCREATERE = re.compile("""
+^\s*CREATE\s+
+    (?P<unique>UNIQUE\s+)?
+    INDEX\s+
+    (?P<ifnotexists>
+        IF\s+NOT\s+EXISTS\s+
+    )?
+""", re.IGNORECASE | re.VERBOSE)
+INDEXONRE = re.compile("ON\s+",re.IGNORECASE)
+INDEXWHERERE = re.compile("WHERE\s+(?P<where>.*?)\s*;?\s*$",re.IGNORECASE | re.DOTALL)
+INDEXEDCOLUMNRE = re.compile("""^(?P<name>.+?)(?:\s+COLLATE\s+(?P<collation>\S+))?(?:\s+(?P<order>ASC|DESC))?$""",re.IGNORECASE | re.DOTALL)
+
 TABLECREATE_TYPERE = re.compile("""
 ^(?P<mode>\(|AS\s+)
 """, re.IGNORECASE | re.VERBOSE)
@@ -58,7 +70,7 @@ COLUMNTOKENS = [
     ("\/\*","multilinecomment"),
     ("\w+\(\d+(\,\d+)?\)","signedtype"),
     ("\w+","identifier"),
-    (".+","other")
+    ("\S+","other")
     ]
 
 TABLETOKENS = [
@@ -126,10 +138,67 @@ SELECTMODERE = re.compile(f"(?P<mode>{'|'.join(SELECTMODES)})",re.IGNORECASE)
 RESULTCOLUMNENDS = ["FROM","WHERE","GROUP\s+BY"]+COMPOUNDOPS
 RESULTCOLUMNENDSRE = re.compile(f"(?P<endpoint>{'|'.join(RESULTCOLUMNENDS)})",re.IGNORECASE)
 
+## Scanner Regexes
+WHITESPACERE = re.compile("\s*")
+NONWHITESPACERE = re.compile("\S*")
+EXPRESSIONSTARTRE = re.compile("(?P<extra>.*?)(\()")
+REFERENCESRE = re.compile("REFERENCES\s+",re.IGNORECASE)
+## Note that Table Constraint conflict clauses have always been case sensitive
+TABLEONCONFLICTRE = re.compile(objects.ONCONFLICTRE_regex)
+
 def stripmatch(input,match):
     """ Strips the match from the front of the string and any additional whitespace at both ends (via strip()) """
     return input.replace(match.group(0),"",1).strip()
 
+class Scanner():
+    """ A position index over a definition string.
+
+        Stripping each token from the front of the definition copies the remainder of the
+        definition every time, which makes parsing quadratic in the length of the definition.
+        The Scanner instead keeps an offset into the original string and matches regexes at
+        that offset, so the definition is walked once.
+        Like stripmatch, advancing the Scanner skips any whitespace after the consumed text.
+    """
+    def __init__(self, definition, pos = 0):
+        if not isinstance(definition,str):
+            raise TypeError("Scanner definition must be a string")
+        self.definition = definition
+        self.pos = pos
+        self.skipwhitespace()
+
+    def skipwhitespace(self):
+        """ Moves the position past any whitespace """
+        self.pos = WHITESPACERE.match(self.definition,self.pos).end()
+
+    def match(self,regex):
+        """ Matches the compiled regex at the current position """
+        return regex.match(self.definition,self.pos)
+
+    def consume(self,match):
+        """ Moves the position to the end of the given match (which should have been returned by Scanner.match) """
+        self.pos = match.end()
+        self.skipwhitespace()
+
+    def advance(self,length):
+        """ Moves the position forward by the given number of characters """
+        self.pos += length
+        self.skipwhitespace()
+
+    def peek(self):
+        """ Returns the character at the current position (or an empty string if the definition has been consumed) """
+        return self.definition[self.pos:self.pos+1]
+
+    @property
+    def remaining(self):
+        """ Returns the remainder of the definition (stripped) """
+        return self.definition[self.pos:].strip()
+
+    def __bool__(self):
+        return self.pos < len(self.definition)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} Object: {self.pos}/{len(self.definition)}"
+
 class Parser():
     def __init__(self,_definition = None, database = None):
         """ New parser which parses the Table's definition as part of the instantiation of the class """
@@ -176,6 +245,10 @@ class Parser():
         ## To aid in parsing, strip first
         d = self._definition.strip()
 
+        ## "CREATE [UNIQUE] INDEX [IF NOT EXISTS]"
+        match = INDEXCREATERE.match(d)
+        if match: return self.parse_index(match)
+
         ## "CREATE [TEMP|TEMPORARY|VIRTUAL] [TABLE|VIEW] [IF NOT EXISTS]"
         match = CREATERE.match(d)
 
@@ -246,6 +319,42 @@ class Parser():
         else:
             raise RuntimeError("Parser parsed an unknown Creation Statement")
 
+    def parse_index(self,match):
+        """ Parses the "[schema.]name ON table (indexed-columns) [WHERE expression]" syntax for Index creation """
+        if self.obj:
+            raise ValueError("Parser detected an Index Creation statement, but supplied object is not an Index")
+        scanner = Scanner(self._definition.strip())
+        scanner.consume(match)
+
+        name = scan_multipartidentifier(scanner)
+        schema = None
+        if isinstance(name,objects.MultipartIdentifier):
+            schema = name.scope.name
+            name = name.name
+        name = name.name
+
+        on = scanner.match(INDEXONRE)
+        if not on:
+            raise ValueError(f'Near "{scanner.remaining}" syntax')
+        scanner.consume(on)
+        table = scan_identifier(scanner).name
+
+        columns = [parse_indexedcolumn(column) for column in split_expressionlist(scan_expression(scanner))]
+        if not columns:
+            raise ValueError("Cannot create an Index without Columns")
+
+        where = None
+        remaining = scanner.remaining
+        if remaining and remaining != ";":
+            research = INDEXWHERERE.match(remaining)
+            if not research:
+                raise ValueError(f'Near "{remaining}" syntax')
+            where = research.group("where")
+
+        self._obj = Index.Index(name, table = table, columns = columns, unique = bool(match.group("unique")),
+                            where = where, existsok = bool(match.group("ifnotexists")), schema = schema)
+        return self._obj
+
     def getname(self,d):
         """ Gets the created table name """ 
         ## Offload to MultipartIdentifier.parse
@@ -351,8 +460,10 @@ class Parser():
         if not research:
             raise ValueError("Could not parse Table Creation")
         if research.group("mode") == "(":
-            d = self.parse_tablecolumns(stripmatch(d,research))
-            d = self.parse_tableconstraints(d)
+            scanner = Scanner(d,research.end())
+            self.parse_tablecolumns(scanner)
+            self.parse_tableconstraints(scanner)
+            d = scanner.remaining
         elif research.group("mode").strip().upper() == "AS":
             d = self.parse_tableas(stripmatch(d,research))
         else:
@@ -367,10 +478,14 @@ class Parser():
         return
 
     def parse_tablecolumns(self,d):
-        """ Parses table column definitions of a Table """
-        ## Making regex.match a little easer by stripping whitespace
-        d = d.strip()
-        match = COLUMNRE.match(d)
+        """ Parses table column definitions of a Table.
+        
+            d should be a Scanner (or a string, which will be converted to a Scanner) positioned after
+            the opening parentheses. Returns the Scanner positioned after the Column Definitions.
+        """
+        if isinstance(d,str): d = Scanner(d)
+        scanner = d
+        match = scanner.match(COLUMNRE)
         column = None
         last = None
         def addcolumn():
@@ -383,7 +498,7 @@ class Parser():
                 if last == "endcolumn": raise ValueError('Near ")" syntax')
                 if column:
                     addcolumn()
-                d = stripmatch(d,match)
+                scanner.consume(match)
                 break
 
             elif name == "endcolumn":
@@ -402,15 +517,15 @@ class Parser():
             elif name == "primarykey":
                 ## If we match Primary Key without a column, PK is a 
                 ## Table Constraint and is handled separately
-                if not column: return d
+                if not column: return scanner
                 ## Otherwise, offload to another method
-                pk,d = parse_columnprimarykey(d,match)
+                pk = parse_columnprimarykey(scanner,match)
                 ## Add Primary Key Constraint to Column
                 column.constraints.append(pk)
 
                 ## Get next match and continue
                 last = name
-                match = COLUMNRE.match(d)
+                match = scanner.match(COLUMNRE)
                 continue
             elif name in ("notnull","unique"):
                 ## Not Null and Unique have the same parsing pattern
@@ -418,62 +533,62 @@ class Parser():
                     raise ValueError(f'Near "{match.group(0)}" syntax')
                 elif name == "unique" and not column:
                     ## A UNIQUE constraint without a column would start the Table Constraints
-                    return d
-                con,d = parse_columnsimpleconstraint(d,match)
+                    return scanner
+                con = parse_columnsimpleconstraint(scanner,match)
                 column.constraints.append(con)
                 last = name
-                match = COLUMNRE.match(d)
+                match = scanner.match(COLUMNRE)
                 continue
             elif name == "checkclause":
                 if not column:
                     ## Check constraints without a Column would be part of the Table Constraints
-                    return d
-                con,d = parse_columncheck(d,match)
+                    return scanner
+                con = parse_columncheck(scanner,match)
                 column.constraints.append(con)
                 last = name
-                match = COLUMNRE.match(d)
+                match = scanner.match(COLUMNRE)
                 continue
             elif name == "defaultclause":
                 if not column:
                     raise ValueError(f'Near "{match.group(0)}" syntax')
-                con,d = parse_columndefault(d,match)
+                con = parse_columndefault(scanner,match)
                 column.constraints.append(con)
                 last = name
-                match = COLUMNRE.match(d)
+                match = scanner.match(COLUMNRE)
                 continue
             elif name == "collateclause":
                 if not column:
                     raise ValueError(f'Near "{match.group(0)}" syntax')
-                con,d = parse_columncollate(d,match)
+                con = parse_columncollate(scanner,match)
                 column.constraints.append(con)
                 last = name
-                match = COLUMNRE.match(d)
+                match = scanner.match(COLUMNRE)
                 continue
             elif name == "foreignkeyclause":
                 if not column:
                     ## Unlike other Table Constraints, Foreign Key Table Constraint 
                     ## doesn't start the same way as the Column Constraint
                     raise ValueError(f'Near "{match.group(0)}" syntax')
-                con,d = parse_columnforeignkey(d,match)
+                con = parse_columnforeignkey(scanner,match)
                 column.constraints.append(con)
                 last = name
-                match = COLUMNRE.match(d)
+                match = scanner.match(COLUMNRE)
                 continue
             elif name == "tableforeignkeyclause":
                 ## We have hit the end of the Column Definitions (return)
-                return d
+                return scanner
             elif name == "comment":
                 if column: column.comments.append(objects.Comment(match.group(0)))
                 else: self.obj._comments.append(objects.Comment(match.group(0)))
             elif name == "multilinecomment":
-                comment = objects.MultilineComment(d)
-                d1 = d
-                d = d.replace(str(comment),"").strip()
-                if d == d1: raise RuntimeError("MultilineComment Replacement Failed")
+                commentmatch = scanner.match(objects.MultilineComment.REGEX)
+                if not commentmatch: raise ValueError("Could not Parse Comment")
+                comment = objects.MultilineComment(commentmatch.group(0))
+                scanner.consume(commentmatch)
                 if column: column.comments.append(comment)
                 else: self.obj._comments.append(comment)
                 last = name
-                match = COLUMNRE.match(d)
+                match = scanner.match(COLUMNRE)
                 continue
             elif name == "signedtype":
                 if not column:
@@ -484,9 +599,15 @@ class Parser():
                 if name not in ("identifier","other"):
                     ## This is a check to ensure that we remember to add logic for future tokens
                     raise SyntaxError(f"Undefined Token: {name}")
-                try: identifier = objects.Identifier.parse(match.group(0))
+                try:
+                    ## "identifier" is already bounded by the match; "other" (i.e.- quoted identifiers) has to be scanned
+                    if name == "identifier":
+                        identifier = objects.Identifier.parse(match.group(0))
+                        if not identifier.raw: raise ValueError()
+                        scanner.advance(len(identifier.raw))
+                    else:
+                        identifier = scan_identifier(scanner)
                 except: raise ValueError(f'Near "{match.group(0)}" syntax')
-                d = d.replace(identifier.raw,"",1).strip()
                 if not column:
                     column = objects.Column(identifier, table = self._obj)
                     last = "columnidentifier"
@@ -500,92 +621,96 @@ class Parser():
                     column._datatype = (column._datatype + " "+identifier.raw).strip()
                     last = "datatype"
                 ## Since we are not using the full match, we'll continue from here
-                match = COLUMNRE.match(d)
+                match = scanner.match(COLUMNRE)
                 continue
 
             last = name
-            d = stripmatch(d,match)
-            match = COLUMNRE.match(d)
+            scanner.consume(match)
+            match = scanner.match(COLUMNRE)
         if column:
             addcolumn()
-        return d
+        return scanner
 
     def parse_tableconstraints(self,d):
-        """ Parses Table Constraints for table creation """
-        ## Making regex.match a little easer by stripping whitespace
-        d = d.strip()
-        match = TABLERE.match(d)
+        """ Parses Table Constraints for table creation.
+        
+            d should be a Scanner (or a string, which will be converted to a Scanner).
+            Returns the Scanner positioned after the Table Constraints.
+        """
+        if isinstance(d,str): d = Scanner(d)
+        scanner = d
+        match = scanner.match(TABLERE)
         while match:
             name = match.lastgroup
             if name == "closeparens":
-                d = stripmatch(d,match)
-                return
+                scanner.consume(match)
+                return scanner
             ## Technically, this should really be taken care of inside each constraint parse
             elif name == "endconstraint":
-                d = stripmatch(d,match)
-                match = TABLERE.match(d)
+                scanner.consume(match)
+                match = scanner.match(TABLERE)
                 continue
             elif name in ("primarykey","unique"):
                 ## Primary Key and Unique have a similar pattern
-                constraint,d = self.parse_tablepk_unique(d,match)
+                constraint = self.parse_tablepk_unique(scanner,match)
                 self.obj._tableconstraints.append(constraint)
-                match = TABLERE.match(d)
+                match = scanner.match(TABLERE)
                 continue
             elif name == "check":
-                constraint,d = parse_tablecheck(d,match)
+                constraint = parse_tablecheck(scanner,match)
                 self.obj._tableconstraints.append(constraint)
-                match = TABLERE.match(d)
+                match = scanner.match(TABLERE)
                 continue
             elif name == "foreignkey":
-                constraint,d = self.parse_tableforeignkey(d,match)
+                constraint = self.parse_tableforeignkey(scanner,match)
                 self.obj._tableconstraints.append(constraint)
-                match = TABLERE.match(d)
+                match = scanner.match(TABLERE)
                 continue
             else:
                 raise RuntimeError("Parsed an Unknown Table Constraint")
 
-        return d
+        return scanner
 
-    def parse_tablepk_unique(self,d, match):
+    def parse_tablepk_unique(self,scanner, match):
         """ Parses either a Table Primary Key or Table Unique Constraint (similar syntax). """
         name = match.lastgroup
         if name not in ("primarykey","unique"):
             raise ValueError("parse_tablepk_unique only handles Primary Keys and Uniques (invalid match group)")
-        d = stripmatch(d,match)
+        scanner.consume(match)
         try:
-            columns,d = parse_columnlist(d)
+            columns = scan_columnlist(scanner)
         except ValueError:
             if name == "primarykey": name = "Primary Key"
             else: name = "Unique"
             raise ValueError(f'{name} Table Constraint requires columns')
-        columns = [self._obj.columns[str(col)] for col in columns]
+        columns = [self._obj._columns[str(col)] for col in columns]
         onconflict = None
-        match = re.match(objects.ONCONFLICTRE_regex,d)
+        match = scanner.match(TABLEONCONFLICTRE)
         if match:
-            d = stripmatch(d,match)
+            scanner.consume(match)
             onconflict = objects.ConflictClause(match.group(0))
 
-        match = TABLERE.match(d)
+        match = scanner.match(TABLERE)
         if match and match.lastgroup == "endconstraint":
-            d = stripmatch(d,match)
+            scanner.consume(match)
 
         if name == "primarykey":
-            return objects.TablePrimaryKeyConstraint(*columns,conflictclause=onconflict),d
+            return objects.TablePrimaryKeyConstraint(*columns,conflictclause=onconflict)
         else:
-            return objects.UniqueTableConstraint(*columns,conflictclause=onconflict),d
+            return objects.UniqueTableConstraint(*columns,conflictclause=onconflict)
 
-    def parse_tableforeignkey(self,d,match):
+    def parse_tableforeignkey(self,scanner,match):
         """ Parses a Table Foreign Key Constraint """
-        d = stripmatch(d,match)
+        scanner.consume(match)
         try:
-            columns,d = parse_columnlist(d)
+            columns = scan_columnlist(scanner)
         except ValueError:
             raise ValueError(f'Table Foreign Key Constraint requires columns')
-        columns = [self._obj.columns[str(col)] for col in columns]
-        ## parse_foreignkeyclause returns a dict that can be used for ReferenceConstraint subclasses
-        fkclause,d = parse_foreignkeyclause(d)
+        columns = [self._obj._columns[str(col)] for col in columns]
+        ## scan_foreignkeyclause returns a dict that can be used for ReferenceConstraint subclasses
+        fkclause = scan_foreignkeyclause(scanner)
         fkclause = objects.TableReferenceConstraint(columns,**fkclause)
-        return fkclause,d
+        return fkclause
 
     def parse_column(input,table):
         """ Parses a single column and returns it """
@@ -595,7 +720,7 @@ class Parser():
                 self.name = table.name
         p = Parser()
         p._obj = DummyObject()
-        p.parse_tablecolumns(input)
+        p.parse_tablecolumns(Scanner(input))
         return list(p._obj._columns.values())[0]
 
     def parse_select(self,d = None):
@@ -644,13 +769,15 @@ class Parser():
         self._obj._ifnotexists = ifnotexists
 
         ## parse as normal Table
+        scanner = Scanner(d)
         ## Remove open parens
-        d = d.strip().lstrip("(")
-        d = self.parse_tablecolumns(d)
-        d = self.parse_tableconstraints(d)
+        while scanner.peek() == "(":
+            scanner.advance(1)
+        self.parse_tablecolumns(scanner)
+        self.parse_tableconstraints(scanner)
 
         ## Make sure nothing else is there
-        d = d.strip()
+        d = scanner.remaining
         if d and d!= ";":
             raise ValueError(f'Near "{d}" Syntax')
 
@@ -660,136 +787,203 @@ class Parser():
         "fts4":parse_fts4,
         }
 
-def parse_columnprimarykey(d,match):
+def scan_identifier(scanner):
+    """ Parses an Identifier at the Scanner's position and advances the Scanner past it.
+
+        Only the candidate token is passed to Identifier.parse (instead of the remainder of the definition).
+    """
+    scanner.skipwhitespace()
+    d,pos = scanner.definition, scanner.pos
+    quote = scanner.peek()
+    if quote and quote in QUOTECHARS:
+        endquote = objects.getendquote(quote)
+        research = re.compile(r"(?<!\\)"+re.escape(endquote)).search(d,pos+1)
+        ## If there is no endquote, Identifier.parse will raise the appropriate error
+        if research: token = d[pos:research.end()]
+        else: token = d[pos:]
+    else:
+        token = scanner.match(NONWHITESPACERE).group(0)
+    identifier = objects.Identifier.parse(token)
+    if not identifier.raw:
+        raise ValueError(f'Near "{token}" syntax')
+    scanner.advance(len(identifier.raw))
+    return identifier
+
+def scan_multipartidentifier(scanner):
+    """ Parses an Identifier or MultipartIdentifier at the Scanner's position and advances the Scanner past it """
+    scanner.skipwhitespace()
+    start = scanner.pos
+    base = scan_identifier(scanner)
+    end = start + len(base.raw)
+    if scanner.definition[end:end+1] == ".":
+        scanner.pos = end + 1
+        name = scan_identifier(scanner)
+        return objects.MultipartIdentifier(name,base)
+    return base
+
+def parse_columnprimarykey(scanner,match):
     """ Parses the Primary Key syntax for table creation """
     ## Strip "PRIMARY KEY" match
-    d = stripmatch(d,match)
-    match = COLUMNRE.match(d)
+    scanner.consume(match)
+    match = scanner.match(COLUMNRE)
     if not match:
         raise ValueError(f"Failed to parse the remainder of the Primary Key constraint")
     name = match.lastgroup
     sorting = None
     if name == "sorting":
         sorting = match.group("sorting")
-        d = stripmatch(d,match)
-        match = COLUMNRE.match(d)
+        scanner.consume(match)
+        match = scanner.match(COLUMNRE)
         if not match:
             raise ValueError("Failed to parse the remainder of the Primary Key constraint")
         name = match.lastgroup
     onconflict = None
     if name == "conflictclause":
         onconflict = objects.ConflictClause(match.group(0))
-        d = stripmatch(d,match)
-        match = COLUMNRE.match(d)
+        scanner.consume(match)
+        match = scanner.match(COLUMNRE)
+        if not match:
+            raise ValueError("Failed to parse the remainder of the Primary Key constraint")
         name = match.lastgroup
     autoincrement = False
     if name == "autoincrement":
         autoincrement = True
-        d = stripmatch(d,match)
-    return objects.PrimaryKeyConstraint(mode = sorting, autoincrement = autoincrement, conflictclause= onconflict), d
+        scanner.consume(match)
+    return objects.PrimaryKeyConstraint(mode = sorting, autoincrement = autoincrement, conflictclause= onconflict)
 
-def parse_columnsimpleconstraint(d,match):
+def parse_columnsimpleconstraint(scanner,match):
     """ Parses simple (NOT NULL, UNIQUE) constraints """
     name = match.lastgroup
     if name == "notnull": con = "NOT NULL"
     else: con = "UNIQUE"
-    d = stripmatch(d,match)
-    match = COLUMNRE.match(d)
+    scanner.consume(match)
+    match = scanner.match(COLUMNRE)
     onconflict = None
     if match:
         name = match.lastgroup
         if name == "conflictclause":
             onconflict = objects.ConflictClause(match.group(0))
-            d = stripmatch(d,match)
-    return objects.Constraint(con,conflictclause=onconflict),d
+            scanner.consume(match)
+    return objects.Constraint(con,conflictclause=onconflict)
 
-def parse_columncheck(d,match):
+def parse_columncheck(scanner,match):
     """ Parses the CHECK constraint for columns """
     ## Strip "CHECK"
-    d = stripmatch(d,match)
-    expression,d = parse_expression(d)
+    scanner.consume(match)
+    expression = scan_expression(scanner)
     value = re.match("^\((.*)\)$",expression)
     if not value:
         raise ValueError("Could not parse Check Expression")
     if not value.group(1).strip():
         raise ValueError("Check Expression may not be empty")
-    return objects.Constraint("CHECK",info = expression), d
+    return objects.Constraint("CHECK",info = expression)
 
-def parse_columndefault(d,match):
+def parse_columndefault(scanner,match):
     """ Parses the DEFAULT value for the given column """
     ## Strip DEFAULT keyword
-    d = stripmatch(d,match)
+    scanner.consume(match)
     ## Check if it matches constants or [signed ]numeric-literal (both)
-    value = DEFAULTCONSTANTSRE.match(d) or SIGNEDNUMBERRE.match(d)
+    value = scanner.match(DEFAULTCONSTANTSRE) or scanner.match(SIGNEDNUMBERRE)
     if value:
-        d = stripmatch(d,value)
+        scanner.consume(value)
         value = value.group(0)
     else:
         ## Check for expression
-        if d[0] == "(":
-            value,d = parse_expression(d)
+        if scanner.peek() == "(":
+            value = scan_expression(scanner)
         else:
             try:
                 ## Other Literals should follow the same rules as Identifiers 
-                value = objects.Identifier.parse(d)
+                value = scan_identifier(scanner)
             except:
                 raise ValueError("Could not parse Default Value")
             else:
                 value = value.raw
-                d = d.replace(value,"",1)
 
     if not value:
         raise ValueError("Could not parse Default Value")
-    return objects.Constraint("DEFAULT",info = value), d
+    return objects.Constraint("DEFAULT",info = value)
 
-def parse_columncollate(d,match):
+def parse_columncollate(scanner,match):
     """ Parses the COLLATE value """
-    d = stripmatch(d,match)
+    scanner.consume(match)
     collation = match.group("collationname")
-    return objects.Constraint("COLLATE",info = collation),d
+    return objects.Constraint("COLLATE",info = collation)
 
-def parse_columnforeignkey(d,match):
+def parse_columnforeignkey(scanner,match):
     """ Parses a Foreign Key reference Column constraint """
-    ## Do not strip the REFERENCES match: parse_foreignkeyclause will do that for us
+    ## Do not consume the REFERENCES match: scan_foreignkeyclause will do that for us
     ## The Column Constraint version of Foreign Key only uses the Foreign Key Clause
-    ## parse_foreignkeyclause returns a dict that can be used for ReferenceConstraint subclasses 
-    constraint,d = parse_foreignkeyclause(d)
-    return objects.ColumnReferenceConstraint(**constraint),d
+    ## scan_foreignkeyclause returns a dict that can be used for ReferenceConstraint subclasses 
+    constraint = scan_foreignkeyclause(scanner)
+    return objects.ColumnReferenceConstraint(**constraint)
             
-def parse_tablecheck(d,match):
+def parse_tablecheck(scanner,match):
     """ Parses out a Table's Check constraint """
-    d = stripmatch(d,match)
-    expression,d = parse_expression(d)
+    scanner.consume(match)
+    expression = scan_expression(scanner)
     value = re.match("^\((.*)\)$",expression)
     if not value:
         raise ValueError("Could not parse Table Check Expression")
     if not value.group(1).strip():
         raise ValueError("Table Check Expression may not be empty")
-    return objects.TableConstraint("CHECK",columns = [], info = expression), d
+    return objects.TableConstraint("CHECK",columns = [], info = expression)
 
 def parse_expression(d):
     """ Captures and strips all information within the first set of parentheses """
-    start = re.match("(?P<extra>.*?)(\()",d)
+    scanner = Scanner(d)
+    expression = scan_expression(scanner)
+    return expression,scanner.remaining
+
+def scan_expression(scanner):
+    """ Captures all information within the first set of parentheses and advances the Scanner past it """
+    start = scanner.match(EXPRESSIONSTARTRE)
     if not start:
         raise ValueError("Could not parse Expression")
     if start.group("extra").strip():
         raise ValueError(f"""Near "{start.group('extra')}" syntax""")
-    d = stripmatch(d,start)
+    scanner.consume(start)
     expression = "("
     openparen = 1
-    match = PARENSRE.match(d)
+    match = scanner.match(PARENSRE)
     ## Continue to search until we run out of string, run out of matches, or close the first parens
-    while d and match and openparen > 0:
+    while scanner and match and openparen > 0:
         if match.group(2) == ")": openparen -= 1
         else: openparen += 1
         expression += match.group(0)
-        d = stripmatch(d,match)
-        match = PARENSRE.match(d)
+        scanner.consume(match)
+        match = scanner.match(PARENSRE)
     if openparen > 0:
         raise ValueError("Could not find closing parentheses")
     if openparen < 0:
         raise RuntimeError("Parsed too many Parentheses")
-    return expression,d
+    return expression
+
+def split_expressionlist(expression):
+    """ Splits a parenthesized, comma-separated list of expressions (as returned by scan_expression) into its top-level items """
+    expression = expression.strip()[1:-1]
+    items,depth,quote,start = [],0,None,0
+    for i,c in enumerate(expression):
+        if quote:
+            if c == quote: quote = None
+        elif c in ("'",'"','`'): quote = c
+        elif c == "[": quote = "]"
+        elif c == "(": depth += 1
+        elif c == ")": depth -= 1
+        elif c == "," and not depth:
+            items.append(expression[start:i].strip())
+            start = i+1
+    items.append(expression[start:].strip())
+    return [item for item in items if item]
+
+def parse_indexedcolumn(input):
+    """ Parses an Indexed Column ("{column or expression} [COLLATE {collation}] [ASC|DESC]") """
+    match = INDEXEDCOLUMNRE.match(input.strip())
+    if not match:
+        raise ValueError(f'Near "{input}" syntax')
+    order = match.group("order")
+    if order: order = order.upper()
+    return Index.IndexedColumn(match.group("name"),match.group("collation"),order)
 
 def parse_columnlist(input):
     """ Parses a list of column names from a string.
@@ -800,27 +994,38 @@ def parse_columnlist(input):
     """
     if not isinstance(input,str) or input[0] != "(":
         raise ValueError("Column list string should be a string that starts with a parentheses.")
+    scanner = Scanner(input)
+    columns = scan_columnlist(scanner)
+    return columns, scanner.remaining
+
+def scan_columnlist(scanner):
+    """ Parses a list of column names at the Scanner's position and advances the Scanner past it.
+
+    The Scanner should be positioned at an open parentheses.
+    Returns a list which contains any parsed columnnames.
+    """
+    if scanner.peek() != "(":
+        raise ValueError("Column list string should be a string that starts with a parentheses.")
     ## Remove open parens
-    d = input[1:]
+    scanner.advance(1)
     ## Column names in this context should not be multipart
     columns = []
-    columnname = objects.Identifier.parse(d)
+    columnname = scan_identifier(scanner)
     while columnname:
         columns.append(columnname)
-        d = d.replace(columnname.raw,"",1).strip()
         columnname = None
         ## Check for comma or end parens
-        nxt = d[0]
+        nxt = scanner.peek()
         if nxt == ",":
-            d = d[1:].strip()
-            columnname = objects.Identifier.parse(d)
+            scanner.advance(1)
+            columnname = scan_identifier(scanner)
         elif nxt == ")":
             ## Parse out closing parens
-            d = d[1:].strip()
+            scanner.advance(1)
             break
         else:
-            raise ValueError(f'Near "{d}" syntax')
-    return columns, d
+            raise ValueError(f'Near "{scanner.remaining}" syntax')
+    return columns
 
 def parse_resultcolumns(d):
     """ Parses out Result Columns from SELECT/VIEW Syntax """
@@ -833,24 +1038,29 @@ def parse_foreignkeyclause(input):
     """ Parses out a Foreign Key Clause from the given string """
     if not isinstance(input,str):
          raise TypeError("input must be string")
+    scanner = Scanner(input)
+    clause = scan_foreignkeyclause(scanner)
+    return clause,scanner.remaining
+
+def scan_foreignkeyclause(scanner):
+    """ Parses out a Foreign Key Clause at the Scanner's position and advances the Scanner past it """
     ## Match REFERENCES
-    match = re.match("REFERENCES\s+",input,re.IGNORECASE)
+    match = scanner.match(REFERENCESRE)
     if not match:
         raise SyntaxError('parse_foreignkeyclause\'s input does not start with "REFERENCES"')
-    d = stripmatch(input,match)
+    scanner.consume(match)
     ## Parse Foreign Table name
-    table = objects.MultipartIdentifier.parse(d)
-    d = d.replace(table.raw,"",1).strip()
+    table = scan_multipartidentifier(scanner)
     ## Check for table columns
     columns = None
-    if d[0] == "(":
-        columns,d = parse_columnlist(d)
+    if scanner.peek() == "(":
+        columns = scan_columnlist(scanner)
         if not columns:
             raise ValueError("No columns declared for Foreign Key Column Reference")
     update,delete = None,None
-    match = FOREIGNKEYONRE.match(d)
+    match = scanner.match(FOREIGNKEYONRE)
     if match:
-        d = stripmatch(d,match)
+        scanner.consume(match)
         mode = match.group("mode").upper()
         if mode == "DELETE":
             delete = match.group("resolution").upper()
@@ -858,9 +1068,9 @@ def parse_foreignkeyclause(input):
             update = match.group("resolution").upper()
         else:
             raise RuntimeError("Parsed an invalid FOREIGN KEY trigger")
-        match = FOREIGNKEYONRE.match(d)
+        match = scanner.match(FOREIGNKEYONRE)
         if match:
-            d = stripmatch(d,match)
+            scanner.consume(match)
             mode = match.group("mode").upper()
             if (mode == "DELETE" and delete) or (mode == "UDPATE" and update):
                 raise ValueError(f"{mode} Trigger defined twice for this Foreign Key")
@@ -868,9 +1078,9 @@ def parse_foreignkeyclause(input):
             elif mode == "UPDATE": update = match.group("resolution").upper()
             else: raise RuntimeError("Parsed an invalid FOREIGN KEY trigger")
     deferred = None
-    match = FOREIGNKEYDEFERRE.match(d)
+    match = scanner.match(FOREIGNKEYDEFERRE)
     if match:
-        d = stripmatch(d,match)
+        scanner.consume(match)
         ## There is exactly one way to set a FK as Deferred
         if not match.group("not") and match.group("mode").upper() == "DEFERRED":
             deferred = True
@@ -878,4 +1088,4 @@ def parse_foreignkeyclause(input):
         else:
             deferred = False
 
-    return {"foreigntable":table,"foreigncolumns":columns,"ondelete": delete, "onupdate":update, "deferrable":deferred},d
\ No newline at end of file
+    return {"foreigntable":table,"foreigncolumns":columns,"ondelete": delete, "onupdate":update, "deferrable":deferred}
@@ -0,0 +1,230 @@
+""" alcustoms.sql.objects.Async
+
+    An asyncio facade for Database and AdvancedTable.
+
+    AsyncDatabase runs all queries on its own worker threads so that the event loop is never blocked
+    by sqlite. For a database file, the workers draw connections from a DatabasePool (one writer and
+    a number of WAL readers), so independent reads can overlap with each other and with writes. For
+    ":memory:" databases a single connection is used on a single worker thread.
+
+    AsyncAdvancedTable methods are thin wrappers around the AdvancedTable methods of the same name, which
+    are run on the worker thread with the connection it was given; all query building is therefore
+    identical to the synchronous API.
+
+    Example Usage:
+        async with AsyncDatabase("example.db", row_factory = advancedrow_factory) as db:
+            table = await db.getadvancedtable("mytable")
+            rows = await table.quickselect(name__like = "Hello%")
+            async for row in table.iquickselect(value__gt = 10):
+                print(row.name)
+
+    Rows returned by AsyncAdvancedTable are fully fetched, but AdvancedRows still lazily query the database
+    when a Foreign Key attribute is accessed: that query runs synchronously on the calling thread, so use
+    prefetch (see AdvancedTable.prefetch) to load Foreign Keys on the worker thread instead.
+"""
+## This Module
+from alcustoms.sql import constants
+from alcustoms.sql.objects import Connection
+
+## Builtin
+import asyncio
+import concurrent.futures
+import functools
+import itertools
+
+__all__ = ["AsyncDatabase","AsyncAdvancedTable",]
+
+class _NullSlots():
+    """ An async context manager which does nothing (contextlib.nullcontext only supports async with from Python 3.10) """
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+class AsyncDatabase():
+    """ An asyncio interface for a Database which runs its queries on dedicated worker threads """
+    def __init__(self, file, readers = 2, databaseclass = None, row_factory = None, **kw):
+        """ Creates a new AsyncDatabase.
+
+            If file is a database file, a DatabasePool is created with the given number of readers
+            and the AsyncDatabase uses readers + 1 worker threads. Reads and writes wait on the event loop
+            until a connection is free, so a worker thread is never left blocking on the pool (and open
+            iquickselect/iselect streams can always fetch their next batch). If file is ":memory:", a single
+            Database is opened and used on a single worker thread.
+            databaseclass is the Database class to use (default Database).
+            Additional keyword arguments are passed to the DatabasePool (or the Database).
+        """
+        if databaseclass is None: databaseclass = Connection.Database
+        self.file = file
+        self.pool = None
+        self.database = None
+        if str(file) == ":memory:":
+            if row_factory is not None: kw['row_factory'] = row_factory
+            self.database = databaseclass(file, **kw)
+            workers = 1
+            ## The single worker thread already serializes all access
+            self._readslots = self._writeslots = _NullSlots()
+        else:
+            self.pool = Connection.DatabasePool(file, readers = readers, databaseclass = databaseclass, row_factory = row_factory, **kw)
+            workers = readers + 1
+            ## One slot per pooled connection: a query only goes to the executor once its connection is free.
+            ## The Semaphores are created by _slots once there is a running event loop: before Python 3.10
+            ## they are bound to the event loop which is current when they are created.
+            self._readslots = self._writeslots = None
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers = workers, thread_name_prefix = "AsyncDatabase")
+        self.closed = False
+
+    def _acquire(self, write = False):
+        """ Returns a connection for use on a worker thread """
+        if self.pool is not None: return self.pool.acquire(write = write)
+        return self.database
+
+    def _release(self, db, write = False, error = False):
+        """ Finishes with a connection on a worker thread, committing writes unless there was an error """
+        try:
+            if write and db.in_transaction:
+                if error: db.rollback()
+                else: db.commit()
+        finally:
+            if self.pool is not None: self.pool.release(db)
+
+    def _call(self, func, args, kw, write = False):
+        """ Runs func(db, *args, **kw) with a connection; executed on a worker thread """
+        db = self._acquire(write = write)
+        try: result = func(db, *args, **kw)
+        except:
+            self._release(db, write = write, error = True)
+            raise
+        self._release(db, write = write)
+        return result
+
+    async def _run(self, func, args = (), kw = None, write = False):
+        if self.closed: raise Connection.ProgrammingError("Cannot operate on a closed AsyncDatabase")
+        if kw is None: kw = dict()
+        loop = asyncio.get_running_loop()
+        async with self._slots(write):
+            return await loop.run_in_executor(self.executor, functools.partial(self._call, func, args, kw, write = write))
+
+    def _slots(self, write = False):
+        """ Returns the (async) context manager which must be held while using a reader or the writer """
+        if self._readslots is None:
+            self._readslots = asyncio.Semaphore(self.pool.size)
+            self._writeslots = asyncio.Semaphore(1)
+        if write: return self._writeslots
+        return self._readslots
+
+    async def run(self, func, *args, write = False, **kw):
+        """ Runs func(db, *args, **kw) on a worker thread and returns the result.
+
+            db is a reader connection unless write is True, in which case it is the writer
+            and any changes are committed afterwards (or rolled back if func raises an Exception).
+        """
+        return await self._run(func, args, kw, write = write)
+
+    async def execute(self, sql, parameters = (), write = False):
+        """ Executes the given sql on a worker thread and returns all resulting rows """
+        return await self._run(lambda db: db.execute(sql, parameters).fetchall(), write = write)
+
+    async def getadvancedtable(self, tablename):
+        """ Returns an AsyncAdvancedTable for the given table. Raises the same errors as Database.getadvancedtable """
+        await self._run(lambda db: db.getadvancedtable(tablename))
+        return AsyncAdvancedTable(self, tablename)
+
+    async def close(self):
+        """ Waits for all running queries to finish and closes all connections """
+        if self.closed: return
+        self.closed = True
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._close)
+
+    def _close(self):
+        self.executor.shutdown(wait = True)
+        if self.pool is not None: self.pool.close()
+        else: self.database.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+class AsyncAdvancedTable():
+    """ An asyncio interface for an AdvancedTable.
+
+        Each method retrieves the AdvancedTable from the worker's connection (which is
+        cheap thanks to the Database's schema cache) and calls the method of the same name.
+    """
+    def __init__(self, database, tablename):
+        self.database = database
+        self.name = tablename
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.name})"
+
+    def _call(self, method, args, kw, write = False):
+        return self.database._run(lambda db: getattr(db.getadvancedtable(self.name), method)(*args, **kw), write = write)
+
+    async def select(self, *args, **kw):
+        """ Awaitable AdvancedTable.select """
+        return await self._call("select", args, kw)
+
+    async def selectall(self, *args, **kw):
+        """ Awaitable AdvancedTable.selectall """
+        return await self._call("selectall", args, kw)
+
+    async def quickselect(self, *expressions, **kw):
+        """ Awaitable AdvancedTable.quickselect """
+        return await self._call("quickselect", expressions, kw)
+
+    async def get(self, pk):
+        """ Awaitable AdvancedTable.get """
+        return await self._call("get", (pk,), dict())
+
+    async def addrow(self, **kw):
+        """ Awaitable AdvancedTable.addrow. The row is committed once it has been added. """
+        return await self._call("addrow", (), kw, write = True)
+
+    async def addmultiple(self, *rows, **kw):
+        """ Awaitable AdvancedTable.addmultiple. The rows are committed once they have been added. """
+        return await self._call("addmultiple", rows, kw, write = True)
+
+    async def quickupdate(self, **kw):
+        """ Awaitable AdvancedTable.quickupdate. Changes are committed once they have been made. """
+        return await self._call("quickupdate", (), kw, write = True)
+
+    async def quickdelete(self, *expressions, **kw):
+        """ Awaitable AdvancedTable.quickdelete. Changes are committed once they have been made. """
+        return await self._call("quickdelete", expressions, kw, write = True)
+
+    def iselect(self, *args, batch_size = constants.BATCHSIZE, **kw):
+        """ An async iterator version of AdvancedTable.iselect. Rows are fetched on the worker thread batch_size rows at a time. """
+        return self._stream("iselect", args, dict(kw, batch_size = batch_size), batch_size)
+
+    def iquickselect(self, *expressions, batch_size = constants.BATCHSIZE, **kw):
+        """ An async iterator version of AdvancedTable.iquickselect. Rows are fetched on the worker thread batch_size rows at a time. """
+        return self._stream("iquickselect", expressions, dict(kw, batch_size = batch_size), batch_size)
+
+    async def _stream(self, method, args, kw, batch_size):
+        """ Holds a single connection (and its reader slot) for the duration of the iteration and fetches each batch on a worker thread """
+        database = self.database
+        if database.closed: raise Connection.ProgrammingError("Cannot operate on a closed AsyncDatabase")
+        loop = asyncio.get_running_loop()
+        def start():
+            db = database._acquire()
+            try: return db, getattr(db.getadvancedtable(self.name), method)(*args, **kw)
+            except:
+                database._release(db)
+                raise
+        def finish(db, rows):
+            try: rows.close()
+            finally: database._release(db)
+        async with database._slots():
+            db,rows = await loop.run_in_executor(database.executor, start)
+            try:
+                while True:
+                    batch = await loop.run_in_executor(database.executor, lambda: list(itertools.islice(rows, batch_size)))
+                    if not batch: break
+                    for row in batch: yield row
+            finally:
+                await loop.run_in_executor(database.executor, finish, db, rows)
@@ -1,14 +1,17 @@
 
 ## This Module
 from alcustoms.sql import objects
-from alcustoms.sql.objects import Table, View, Utilities
+from alcustoms.sql.objects import Table, View, Utilities, Instrumentation, Index
 
 ## Builtin
 import functools
 import pathlib
+import queue
+import threading
+import time
 from sqlite3 import *
 
-__all__ = ["Database",]
+__all__ = ["Database","DatabasePool","PoolTimeout",]
 
 ############################################
 """
@@ -52,6 +55,15 @@ def listalltables(conn):
     tables = getalltables(conn)
     return [row['name'] for row in tables]
 
+def getschemaversion(conn):
+    """ Returns the connection's schema_version (a counter which sqlite increments whenever the schema is changed).
+
+        The query is run on a separate cursor without a row_factory so that it is unaffected by the connection's row_factory.
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor.execute("""PRAGMA schema_version;""").fetchone()[0]
+
 def update_row_factory(func):
     """ A decorator to setup advanced_rowfactory on child tables """
     @functools.wraps(func)
@@ -69,6 +81,31 @@ def update_row_factory(func):
                                          """
 ############################################
 
+class SchemaCache():
+    """ A cache of parsed Table and AdvancedTable objects for a single Database.
+
+        The cache records the schema_version of the Database when it is populated and is
+        emptied whenever that value changes (sqlite increments it whenever any connection
+        creates, alters, or drops a table). Database methods which change the schema also
+        clear the cache explicitly.
+        Cached objects are never returned directly: the Database returns copies of them
+        (via copy_table) so that changes to a returned Table do not affect the cache.
+        queries stores compiled quick-queries which depend on more than one Table (i.e.- which
+        traverse Foreign Keys), as they have to be recompiled whenever the schema changes.
+    """
+    def __init__(self):
+        self.version = None
+        self.tables = dict()
+        self.advancedtables = dict()
+        self.queries = objects.QueryCache()
+
+    def clear(self):
+        """ Empties the cache """
+        self.version = None
+        self.tables.clear()
+        self.advancedtables.clear()
+        self.queries.clear()
+
 class Database(Connection):
     """ A Custom Connection object
 
@@ -78,6 +115,10 @@ class Database(Connection):
     """
     ## Variable for use as Context Manager to autocommit before closing
     _contextcommit = False
+    ## QueryLog used while the Database is instrumented (see instrument())
+    querylog = None
+    ## IndexAdvisor used to record quick-query shapes (see startindexadvisor())
+    indexadvisor = None
 
     def __init__(self, file, check_same_thread = False, timeout = 10, _parser = None, row_factory = None, table_constructor = None, **kw):
         """ Initializes a new Database object.
@@ -93,6 +134,7 @@ class Database(Connection):
         be used as default.
         """
         super().__init__(str(file), check_same_thread=check_same_thread, timeout=timeout,**kw)
+        self.schemacache = SchemaCache()
         if _parser is None: _parser = objects.PARSER
         self.parser = _parser
         self.file = file
@@ -122,9 +164,46 @@ class Database(Connection):
         ## For when sql is executed manually (bypassing AdvancedTable)
         if isinstance(self.row_factory,objects.AdvancedRow_Factory) and not self.row_factory.parent:
             with Utilities.temp_row_factory(self,objects.dict_factory):
-                return super().execute(*args,**kw)
+                return self._execute(*args,**kw)
         ## Otherwise, continue as normal
-        return super().execute(*args,**kw)
+        return self._execute(*args,**kw)
+
+    def _execute(self,*args,**kw):
+        if self.querylog is None:
+            return super().execute(*args,**kw)
+        return self.cursor().execute(*args,**kw)
+
+    def executemany(self,*args,**kw):
+        if self.querylog is None:
+            return super().executemany(*args,**kw)
+        return self.cursor().executemany(*args,**kw)
+
+    def cursor(self, factory = None):
+        """ Returns a new Cursor (using factory, if supplied). While the Database is instrumented, the default is an InstrumentedCursor """
+        if factory is not None:
+            return super().cursor(factory)
+        if self.querylog is None:
+            return super().cursor()
+        cursor = super().cursor(Instrumentation.InstrumentedCursor)
+        cursor.querylog = self.querylog
+        return cursor
+
+    def instrument(self, threshold = None, explain = False, callback = None):
+        """ Starts recording statistics for all statements executed by the Database and returns the QueryLog they are recorded to.
+
+            threshold is the execution time (in seconds) at which a statement is considered slow (None considers all statements slow).
+            If explain is True, the EXPLAIN QUERY PLAN of slow statements is recorded.
+            callback, if supplied, is called with a QueryRecord for each slow statement.
+            See Instrumentation.QueryLog for more information.
+            Cursors created before the Database is instrumented are not recorded.
+        """
+        self.querylog = Instrumentation.QueryLog(threshold = threshold, explain = explain, callback = callback)
+        return self.querylog
+
+    def uninstrument(self):
+        """ Stops recording statistics and returns the QueryLog that was in use (or None) """
+        querylog,self.querylog = self.querylog,None
+        return querylog
 
     ###############################################
     """
@@ -138,6 +217,25 @@ class Database(Connection):
         return [r['sql'] for r in result]
         #return result
 
+    def getschemaversion(self):
+        """ Returns the Database's current schema_version """
+        return getschemaversion(self)
+
+    def checkschemacache(self):
+        """ Compares the schemacache's version to the Database's current schema_version, clearing the cache if they differ.
+
+            Returns the schemacache.
+        """
+        version = self.getschemaversion()
+        if version != self.schemacache.version:
+            self.schemacache.clear()
+            self.schemacache.version = version
+        return self.schemacache
+
+    def clearschemacache(self):
+        """ Empties the schemacache: this should be called if the schema is changed in a way that does not update schema_version """
+        self.schemacache.clear()
+
     def is_open(self):
         """ Returns whether or not the Database connection is open """
         try: self.execute("")
@@ -162,7 +260,9 @@ class Database(Connection):
             oldtable = self.gettable(table.fullname)
         except ValueError as e:
             return False
-        return table == oldtable
+        ## All declared indexes must exist (additional indexes in the Database are allowed)
+        oldindexes = oldtable.indexes
+        return table == oldtable and all(index in oldindexes for index in table.indexes)
 
     @objects.saverowfactory
     def listtables(self):
@@ -183,16 +283,15 @@ class Database(Connection):
             
             If advanced is True (default), returns Advanced Objects when possible.
         """
-        tables = self.execute("""SELECT sql FROM sqlite_master WHERE type="table";""").fetchall()
+        tables = self.execute("""SELECT name FROM sqlite_master WHERE type="table";""").fetchall()
+        tables = [self.gettable(table['name']) for table in tables]
         ## Let parser determine type (if available)
         if self.parser:
-           tables = [self.parser(table['sql']).obj for table in tables]
-           tables = [table.to_advancedtable(self) if hasattr(table,'to_advancedtable') else table for table in tables]
-        else:
-            if advanced:
-                tables = [Table.AdvancedTable(table['sql'],self) for table in tables]
-            else:
-                tables = [Table.Table(table['sql'],self) for table in tables]
+            ## Plain Tables can use the schemacache; other types are converted by their own to_advancedtable methods
+            tables = [self._getcachedadvancedtable(table.name, Table.AdvancedTable) if type(table) is Table.Table
+                      else table.to_advancedtable(self) if hasattr(table,'to_advancedtable') else table for table in tables]
+        elif advanced:
+            tables = [self._getcachedadvancedtable(table.name, Table.AdvancedTable) for table in tables]
         return tables
 
     @objects.saverowfactory
@@ -201,7 +300,15 @@ class Database(Connection):
 
         tablename should be the string name of an existing table (including schema name for attached tables).
         Raises a ValueError if the table does not exist.
+        Parsed Tables are cached (see SchemaCache), so the table's definition is only parsed again if the schema changes.
         """
+        ## This method is also used with non-Database Connections, which do not have a schemacache
+        cache = None
+        if isinstance(self,Database):
+            cache = self.checkschemacache()
+            if str(tablename) in cache.tables:
+                return cache.tables[str(tablename)].copy_table()
+
         if tablename != "sqlite_master":
             tableentry = self.execute("""SELECT sql FROM sqlite_master WHERE type="table" AND tbl_name=?;""",(str(tablename),)).fetchone()
             if not tableentry:
@@ -209,8 +316,17 @@ class Database(Connection):
         else:
             tableentry = {"sql":SQLITE_MASTER_SCHEMA}
 
-        if self.parser: return self.parser(tableentry['sql'],database = self).obj
-        return Table.Table(tableentry['sql'],database = self)
+        if self.parser: table = self.parser(tableentry['sql'],database = self).obj
+        else: table = Table.Table(tableentry['sql'],database = self)
+
+        if isinstance(table,Table.Table) and tablename != "sqlite_master":
+            table._indexes = Index.getindexes(self,table.name)
+
+        ## Only Table instances support copy_table
+        if cache is None or not isinstance(table,Table.Table):
+            return table
+        cache.tables[str(tablename)] = table
+        return table.copy_table()
     
     @update_row_factory
     def gettablebyid(self,rowid):
@@ -222,12 +338,11 @@ class Database(Connection):
         if not isinstance(rowid,int):
             raise TypeError("rowid should be an integer")
         with Utilities.temp_row_factory(self,objects.dict_factory):
-            tableentry = self.execute("""SELECT sql FROM sqlite_master WHERE type="table" AND rowid=?;""",(rowid,)).fetchone()
+            tableentry = self.execute("""SELECT tbl_name FROM sqlite_master WHERE type="table" AND rowid=?;""",(rowid,)).fetchone()
         if not tableentry:
-            raise ValueError(f"Table {tablename} does not exist.")
+            raise ValueError(f"Table {rowid} does not exist.")
 
-        if self.parser: return self.parser(tableentry['sql'],database = self).obj.to_advancedtable()
-        return Table.AdvancedTable(tableentry['sql'],database = self)
+        return self._getcachedadvancedtable(tableentry['tbl_name'], Table.AdvancedTable)
 
     @update_row_factory
     def getadvancedtable(self,tablename):
@@ -240,8 +355,21 @@ class Database(Connection):
         tableclass = self.table_constructor(tablename)
         if not issubclass(tableclass, Table.AdvancedTable):
             raise TypeError(f"Invalid Table Constructor: requires AdvancedTable subclass, {tableclass} received")
-        table = self.gettable(tablename).to_advancedtable(self, tableclass)
-        return table
+        return self._getcachedadvancedtable(tablename, tableclass)
+
+    def _getcachedadvancedtable(self, tablename, tableclass):
+        """ Returns a copy of the cached AdvancedTable of type tableclass for the given tablename, creating it if necessary.
+
+            Note that this method does not set the AdvancedTable's row_factory (see getadvancedtable).
+        """
+        cache = self.checkschemacache()
+        key = (str(tablename), tableclass)
+        if key not in cache.advancedtables:
+            table = self.gettable(tablename).to_advancedtable(self, tableclass)
+            ## gettable may have reset the cache
+            cache = self.schemacache
+            cache.advancedtables[key] = table
+        return cache.advancedtables[key].copy_table()
 
     def gettablestats(self,tablename):
         """ Returns the information stored in sqlite_master as a dict for the given table """
@@ -261,29 +389,48 @@ class Database(Connection):
         if any(not isinstance(table,(Table.Table,Table.TableConstructor)) for table in tables):
             raise TypeError("All tables must be Table or TableConstructors")
         success,fail = list(),list()
+        ## Adding tables changes the schema
+        self.clearschemacache()
 
         for table in tables:
             ## Check if table is in Database
             try:
                 self.gettable(table.name)
-            ## If it's not, add it
             except:
-                try:
-                    self.execute(table.definition)
-                ## On Error, add to failure
-                except:
+                exists = False
+            else:
+                exists = True
+                ## Tables which already exist are only successful if existsok
+                if not table.existsok:
                     fail.append(table)
-                ## Otherwise, add to success
-                else:
-                    success.append(table)
-            ## If table exists, check if existok
+                    continue
+            ## The table and any of its missing indexes are created together, so that if any of them fail none are left behind
+            self.execute("""SAVEPOINT addtables;""")
+            try:
+                if not exists: self.execute(table.definition)
+                self._addtableindexes(table)
+            ## Any exception (including non-sqlite ones, e.g.- from an incomplete Index) undoes the table
+            except BaseException as e:
+                self.execute("""ROLLBACK TO addtables;""")
+                self.execute("""RELEASE addtables;""")
+                self.clearschemacache()
+                ## On Error, add to failure
+                if not isinstance(e,Error): raise
+                fail.append(table)
+            ## Otherwise, add to success
             else:
-                ## Existsok == Successful
-                if table.existsok:
-                    success.append(table)
-                else: fail.append(table)
-
+                self.execute("""RELEASE addtables;""")
+                success.append(table)
         return success,fail
+
+    def _addtableindexes(self,table):
+        """ Creates the table's declared indexes which do not already exist in the Database """
+        if not table.indexes: return
+        existing = Index.getindexes(self,table.name)
+        for index in table.indexes:
+            if index.name.lower() in [other.name.lower() for other in existing]: continue
+            self.execute(index.definition)
+        self.clearschemacache()
     
 
     def addandvalidatetables(self,*tables):
@@ -312,9 +459,50 @@ class Database(Connection):
 
         return success,fail
 
+    def getindexes(self,tablename = None):
+        """ Returns a list of Index objects for the explicitly-created Indexes in the Database (or on the given table) """
+        if isinstance(tablename,(Table.Table,Table.TableConstructor)):
+            tablename = tablename.name
+        return Index.getindexes(self,tablename)
+
+    def addindex(self,index):
+        """ Creates the given Index in the Database. index should be an Index object or a "CREATE INDEX" statement. Returns the Index """
+        if isinstance(index,str): index = Index.Index.from_definition(index)
+        if not isinstance(index,Index.Index):
+            raise TypeError("index should be an Index object or a CREATE INDEX statement")
+        self.execute(index.definition)
+        self.clearschemacache()
+        return index
+
+    def removeindex(self,indexname):
+        """ Removes an Index from the Database. indexname can be a string representing the Index's name, or an Index object """
+        if isinstance(indexname,Index.Index):
+            indexname = indexname.fullname
+        if not isinstance(indexname,str):
+            raise TypeError("indexname should be a string or Index instance")
+        self.execute(f"""DROP INDEX IF EXISTS {indexname};""")
+        self.clearschemacache()
+    def dropindex(self,indexname):
+        """ Alias for removeindex """
+        return self.removeindex(indexname)
+
+    def startindexadvisor(self):
+        """ Starts recording the shapes of quick-queries on the Database's AdvancedTables and returns the IndexAdvisor they are recorded to.
+
+            See Index.IndexAdvisor for more information.
+        """
+        self.indexadvisor = Index.IndexAdvisor(self)
+        return self.indexadvisor
+
+    def stopindexadvisor(self):
+        """ Stops recording quick-query shapes and returns the IndexAdvisor that was in use (or None) """
+        advisor,self.indexadvisor = self.indexadvisor,None
+        return advisor
+
     def removetable(self,tablename):
         """ Removes a table from the database. tablename can be a string representing the table's name, or a Table object """
         Table.removetable(self,tablename)
+        self.clearschemacache()
     def droptable(self,tablename):
         """ Alias for removetable """
         return self.removetable(tablename)
@@ -360,3 +548,212 @@ class Database(Connection):
         """
         self._contextcommit = True
         return self
+
+
+
+############################################
+"""
+                 CONNECTION POOL
+                                         """
+############################################
+
+class PoolTimeout(OperationalError):
+    """ Raised when a DatabasePool cannot supply a connection before its timeout """
+
+class PoolStats():
+    """ Wait metrics for one side (readers or writer) of a DatabasePool.
+
+        acquisitions is the number of times a connection was handed out, waits is the number of
+        those which had to wait for another thread to release a connection, waittime is the total
+        time (in seconds) spent waiting, maxwait is the longest single wait and timeouts is the
+        number of requests which were abandoned.
+    """
+    def __init__(self):
+        self.acquisitions = 0
+        self.waits = 0
+        self.waittime = 0.0
+        self.maxwait = 0.0
+        self.timeouts = 0
+
+    def record(self,waited):
+        """ Records a single acquisition which waited the given number of seconds (or None if it did not wait) """
+        self.acquisitions += 1
+        if waited is None: return
+        self.waits += 1
+        self.waittime += waited
+        self.maxwait = max(self.maxwait,waited)
+
+    def asdict(self):
+        return dict(acquisitions = self.acquisitions, waits = self.waits, waittime = self.waittime,
+                    maxwait = self.maxwait, timeouts = self.timeouts)
+
+class _PooledConnection():
+    """ Context Manager returned by DatabasePool.reader and DatabasePool.writer """
+    def __init__(self,pool,write,timeout):
+        self.pool = pool
+        self.write = write
+        self.timeout = timeout
+        self.db = None
+
+    def __enter__(self):
+        self.db = self.pool.acquire(write = self.write, timeout = self.timeout)
+        return self.db
+
+    def __exit__(self,exc,*args):
+        db,self.db = self.db,None
+        try:
+            if self.write and exc is None: db.commit()
+        finally:
+            self.pool.release(db)
+
+class DatabasePool():
+    """ A pool of Database connections to a single database file which uses a single writer and multiple readers.
+
+        The database is put into WAL journal mode so that the readers can continue to query the file
+        while the writer has an open transaction. Reader connections are opened with "PRAGMA query_only"
+        so that they cannot accidentally write to the database.
+
+        Each connection is a separate Database (or Database subclass, per databaseclass) and therefore has
+        its own row_factory and schema cache. When a connection is returned to the pool its row_factory is
+        reset to the one the pool was created with and any open transaction is rolled back.
+
+        Example Usage:
+            pool = DatabasePool("example.db", readers = 4, row_factory = advancedrow_factory)
+            with pool.reader() as db:
+                db.getadvancedtable("mytable").selectall()
+            with pool.writer() as db:
+                ## Commits on exit, unless an Exception is raised
+                db.getadvancedtable("mytable").addrow(name = "Hello")
+    """
+    def __init__(self, file, readers = 4, databaseclass = Database, row_factory = None, timeout = None, **kw):
+        """ Creates a new DatabasePool.
+
+            file is the database file and cannot be ":memory:" (each in-memory connection is its own database).
+            readers is the number of reader connections in the pool.
+            databaseclass is the Database class (or subclass) used to open each connection.
+            row_factory is the row_factory of each connection.
+            timeout is the default number of seconds to wait for a connection (None waits indefinitely).
+            Additional keyword arguments are passed to databaseclass.
+        """
+        if str(file) == ":memory:" or not str(file):
+            raise ValueError("DatabasePool requires a database file")
+        if not isinstance(readers,int) or readers < 1:
+            raise ValueError("DatabasePool requires at least one reader")
+        self.file = file
+        self.databaseclass = databaseclass
+        self.row_factory = row_factory
+        self.timeout = timeout
+        self.kw = kw
+        self.readerstats = PoolStats()
+        self.writerstats = PoolStats()
+        self._statslock = threading.Lock()
+        self._writerlock = threading.Lock()
+        self._readers = queue.LifoQueue(maxsize = readers)
+        self._connections = []
+        self.closed = False
+
+        self._writer = self._connect()
+        self._writer.execute("""PRAGMA journal_mode=WAL;""")
+        for i in range(readers):
+            db = self._connect()
+            db.execute("""PRAGMA query_only=ON;""")
+            self._readers.put(db)
+
+    @property
+    def size(self):
+        """ The number of reader connections in the pool """
+        return self._readers.maxsize
+
+    def _connect(self):
+        """ Opens a new connection for the pool """
+        kw = dict(self.kw)
+        if self.row_factory is not None: kw['row_factory'] = self.row_factory
+        db = self.databaseclass(self.file, **kw)
+        ## Adopt the databaseclass's default row_factory
+        if self.row_factory is None: self.row_factory = db.row_factory
+        self._connections.append(db)
+        return db
+
+    def _record(self,stats,waited = None, timedout = False):
+        with self._statslock:
+            if timedout: stats.timeouts += 1
+            else: stats.record(waited)
+
+    def acquire(self, write = False, timeout = False):
+        """ Removes a connection from the pool and returns it. The connection must be returned with release().
+
+            If write is True, the writer connection is returned, otherwise a reader is returned.
+            timeout is the number of seconds to wait for a connection; if not supplied, the pool's timeout is used.
+            Raises PoolTimeout if no connection becomes available in time.
+        """
+        if self.closed: raise ProgrammingError("Cannot operate on a closed DatabasePool")
+        if timeout is False: timeout = self.timeout
+        if write:
+            stats = self.writerstats
+            if self._writerlock.acquire(blocking = False):
+                self._record(stats)
+                return self._writer
+            start = time.perf_counter()
+            if not self._writerlock.acquire(timeout = -1 if timeout is None else timeout):
+                self._record(stats, timedout = True)
+                raise PoolTimeout("Timed out waiting for the DatabasePool's writer")
+            self._record(stats,time.perf_counter() - start)
+            return self._writer
+
+        stats = self.readerstats
+        try:
+            db = self._readers.get_nowait()
+            self._record(stats)
+            return db
+        except queue.Empty: pass
+        start = time.perf_counter()
+        try: db = self._readers.get(timeout = timeout)
+        except queue.Empty:
+            self._record(stats, timedout = True)
+            raise PoolTimeout("Timed out waiting for a DatabasePool reader")
+        self._record(stats,time.perf_counter() - start)
+        return db
+
+    def release(self,db):
+        """ Returns a connection acquired with acquire() to the pool.
+
+            Raises a ValueError if the connection was not opened by this pool.
+        """
+        if not any(db is connection for connection in self._connections):
+            raise ValueError("Connection does not belong to this DatabasePool")
+        if db.in_transaction: db.rollback()
+        db.row_factory = self.row_factory
+        if db is self._writer:
+            self._writerlock.release()
+        else:
+            self._readers.put_nowait(db)
+
+    def reader(self, timeout = False):
+        """ Returns a Context Manager which supplies a reader connection and returns it to the pool afterwards """
+        return _PooledConnection(self, False, timeout)
+
+    def writer(self, timeout = False):
+        """ Returns a Context Manager which supplies the writer connection, commits on a successful exit, and returns it to the pool afterwards """
+        return _PooledConnection(self, True, timeout)
+
+    def stats(self):
+        """ Returns a dict containing the pool's wait metrics for its readers and writer (see PoolStats) """
+        with self._statslock:
+            return dict(readers = self.readerstats.asdict(), writer = self.writerstats.asdict())
+
+    def resetstats(self):
+        """ Resets the pool's wait metrics """
+        with self._statslock:
+            self.readerstats = PoolStats()
+            self.writerstats = PoolStats()
+
+    def close(self):
+        """ Closes all connections in the pool """
+        self.closed = True
+        for db in self._connections: db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        self.close()
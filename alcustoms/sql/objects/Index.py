@@ -0,0 +1,286 @@
+"""                 alcustoms.sql.objects.Index
+
+    Index objects and an Index Advisor for AdvancedTable "quick" queries.
+
+    Indexes can be declared alongside Tables (see TableConstructor.addindex and the indexes
+    argument of Table) so that they are created by Database.addtables and checked by
+    Database.validatetable. Indexes which already exist in a Database are parsed from
+    sqlite_master and are available as Table.indexes (or via Database.getindexes).
+
+    The IndexAdvisor (see Database.startindexadvisor) records the column/operator shapes used
+    with quickselect, iquickselect, quickupdate and quickdelete. IndexAdvisor.suggest uses
+    EXPLAIN QUERY PLAN to find shapes which are resolved with a full table scan and suggests
+    Indexes for their filter columns; IndexAdvisor.apply creates them.
+"""
+
+## This Module
+from alcustoms.sql import objects
+
+## Builtin
+import collections
+import re
+import sqlite3
+import threading
+
+__all__ = ["Index","IndexedColumn","IndexAdvisor","IndexSuggestion","getindexes",]
+
+############################################
+"""
+             UTILITY FUNCTIONS
+                                         """
+############################################
+
+def getindexes(conn,tablename = None):
+    """ Returns a list of Index objects for the explicitly-created Indexes in the database.
+
+        If tablename is supplied, only the Indexes on that table are returned. Indexes which sqlite
+        creates automatically (for UNIQUE and PRIMARY KEY constraints) do not have a definition and
+        are not included.
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    if tablename is None:
+        rows = cursor.execute("""SELECT sql FROM sqlite_master WHERE type='index' AND sql IS NOT NULL;""").fetchall()
+    else:
+        rows = cursor.execute("""SELECT sql FROM sqlite_master WHERE type='index' AND sql IS NOT NULL AND tbl_name = ?;""",(str(tablename),)).fetchall()
+    return [Index.from_definition(row[0]) for row in rows]
+
+IDENTIFIERRE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+def _quote(name):
+    """ Quotes the name if it is not a plain identifier """
+    if IDENTIFIERRE.fullmatch(name): return name
+    return objects.Identifier.quotestring(name)
+
+def _normalizeexpression(expression):
+    if expression is None: return None
+    return " ".join(str(expression).split()).lower()
+
+############################################
+"""
+                   OBJECTS
+                                         """
+############################################
+
+class IndexedColumn(collections.namedtuple("IndexedColumn",["name","collation","order"], defaults = [None,None])):
+    """ A column (or expression) in an Index with an optional collation and sort order (ASC or DESC) """
+    @property
+    def definition(self):
+        definition = str(self.name)
+        if self.collation: definition += f" COLLATE {self.collation}"
+        if self.order: definition += f" {self.order}"
+        return definition
+
+    def _key(self):
+        name = str(self.name)
+        if name[:1] in objects.QUOTECHARS: name = objects.Identifier.stripquotes(name)
+        collation = self.collation.upper() if self.collation else None
+        ## ASC is the default sort order
+        order = (self.order or "ASC").upper()
+        return (_normalizeexpression(name), collation, order)
+
+    def __eq__(self,other):
+        if isinstance(other,str): other = IndexedColumn(other)
+        if isinstance(other,IndexedColumn):
+            return self._key() == other._key()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._key())
+
+class Index():
+    """ An Object version of an Index.
+
+        Like TableConstructor, an Index can be constructed from its components and provides
+        the equivalent sql via Index.definition. Indexes can also be created from a
+        "CREATE INDEX" statement via Index.from_definition.
+    """
+    @staticmethod
+    def from_definition(definition, _parser = None):
+        """ Parses a "CREATE INDEX" statement and returns an Index """
+        if _parser is None: _parser = objects.PARSER
+        index = _parser(definition).obj
+        if not isinstance(index,Index):
+            raise ValueError("Definition is not an Index Creation statement")
+        return index
+
+    def __init__(self, name, table = None, columns = None, unique = False, where = None, existsok = False, schema = None):
+        """ Creates a new Index.
+
+            name is the Index's name and table is the name of the table it indexes (if the Index is added
+            to a TableConstructor or Table, table is set automatically).
+            columns should be a list of column names, Column instances, or IndexedColumns.
+            unique creates a UNIQUE Index and where, if supplied, should be an sql expression which makes the Index partial.
+        """
+        if not name: raise AttributeError("Index must have a name")
+        self.name = str(name)
+        self.table = None if table is None else str(table)
+        self.columns = list()
+        if columns is None: columns = list()
+        if isinstance(columns,(str,objects.Column,IndexedColumn)): columns = [columns,]
+        for column in columns: self.addcolumn(column)
+        self.unique = bool(unique)
+        self.where = where
+        self.existsok = bool(existsok)
+        self.schema = schema
+
+    def addcolumn(self, column, collation = None, order = None):
+        """ Adds a column to the Index. column can be a column name, a Column, or an IndexedColumn """
+        if isinstance(column,objects.Column): column = str(column.name)
+        if isinstance(column,str): column = IndexedColumn(column,collation,order)
+        if not isinstance(column,IndexedColumn):
+            raise TypeError("Index columns must be column names, Columns or IndexedColumns")
+        if column.order and column.order.upper() not in ("ASC","DESC"):
+            raise ValueError(f"Invalid sort order: {column.order}")
+        self.columns.append(column)
+        return column
+
+    @property
+    def fullname(self):
+        """ Returns the index's full name (schema.indexname) quoted """
+        if not self.schema: return _quote(self.name)
+        return f'"{self.schema}"."{self.name}"'
+
+    @property
+    def definition(self):
+        """ Generates an sqlite-compliant string representing the Index's definition. """
+        if not self.table:
+            raise AttributeError("Index must have a Table")
+        if not self.columns:
+            raise AttributeError("Cannot create an Index without Columns.")
+        unique = "" if not self.unique else "UNIQUE "
+        exist = "" if not self.existsok else "IF NOT EXISTS "
+        columns = ", ".join(column.definition for column in self.columns)
+        where = "" if not self.where else f" WHERE {self.where}"
+        return f"""CREATE {unique}INDEX {exist}{self.fullname} ON {_quote(self.table)} ({columns}){where};"""
+
+    def __eq__(self,other):
+        ## NOTE! Like Tables, existsok is not saved by the database and is not compared
+        if isinstance(other,str): return self.name.lower() == other.lower()
+        if not isinstance(other,Index): return NotImplemented
+        return self.name.lower() == other.name.lower()\
+            and (self.table or "").lower() == (other.table or "").lower()\
+            and self.unique == other.unique\
+            and self.columns == other.columns\
+            and _normalizeexpression(self.where) == _normalizeexpression(other.where)
+
+    def __hash__(self):
+        return hash(self.name.lower())
+
+    def __repr__(self):
+        return f"{self.__class__.__name__} Object: {self.name}"
+
+############################################
+"""
+                INDEX ADVISOR
+                                         """
+############################################
+
+## Options which can be resolved by an Index, sorted by whether they are equality or range constraints
+EQUALITYOPTIONS = (None,"eq","in")
+RANGEOPTIONS = ("lt","lte","gt","gte")
+SCANRE = re.compile(r"^SCAN (?:TABLE )?(?P<table>\S+)(?!.*\bINDEX\b)")
+
+IndexSuggestion = collections.namedtuple("IndexSuggestion",["index","count","plan"])
+IndexSuggestion.__doc__ = """ An Index suggested by IndexAdvisor.suggest. count is the number of queries recorded with the shape which
+    the Index was suggested for and plan is the EXPLAIN QUERY PLAN (as a list of strings) of the most recent of those queries. """
+
+class IndexAdvisor():
+    """ Records the shapes of quick-queries run against a Database's AdvancedTables and suggests Indexes for them.
+
+        A shape is the table name and the (column, option) pairs of the keyword arguments (e.g.- quickselect(name = "Hello", value__gt = 1)
+        has the shape ("testtable", (("name",None),("value","gt")))). The most recent statement for each shape is stored so
+        that its EXPLAIN QUERY PLAN can be checked by suggest.
+    """
+    def __init__(self, database):
+        self.database = database
+        self.shapes = collections.Counter()
+        self.samples = dict()
+        self.lock = threading.Lock()
+
+    def record(self, table, kw, query, replacements):
+        """ Records the shape of a quick-query on table (called by AdvancedTable) """
+        shape = []
+        pk = str(table.pk) if table.pk else None
+        for key,value in kw.items():
+            ## Q expressions may contain OR and NOT conditions, which are not considered
+            if isinstance(value,objects.Q): continue
+            ## Keywords which traverse Foreign Keys are resolved as "{column} IN (subquery)" (see objects.traversal)
+            if objects.istraversal(table,key): key = key.split("__",1)[0] + "__in"
+            research = objects.UNDERSCORERE.search(key)
+            if not research: continue
+            column,option = research.group("column"),research.group("option")
+            if column == "pk": column = pk
+            if column is None: continue
+            ## "x = None" is resolved with "IS NULL", which can also use an index
+            shape.append((column,option))
+        if not shape: return
+        shape = (str(table.fullname),tuple(sorted(shape, key = lambda item: (item[0],item[1] or ""))))
+        with self.lock:
+            self.shapes[shape] += 1
+            self.samples[shape] = (f"""SELECT * FROM {table.fullname} WHERE {query};""",replacements)
+
+    def clear(self):
+        """ Removes all recorded shapes """
+        with self.lock:
+            self.shapes.clear()
+            self.samples.clear()
+
+    def explain(self, shape):
+        """ Returns the EXPLAIN QUERY PLAN for the most recent statement recorded with the given shape """
+        sql,replacements = self.samples[shape]
+        cursor = self.database.cursor()
+        cursor.row_factory = None
+        return [row[-1] for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql}",replacements).fetchall()]
+
+    def suggest(self, minimum = 1):
+        """ Returns a list of IndexSuggestions for the recorded shapes which are resolved with a full table scan.
+
+            Only shapes which have been recorded at least minimum times are considered. The suggested Index
+            contains the shape's equality columns (column = value, __eq, __in, and "IS NULL") followed by
+            one range column (__lt, __lte, __gt, __gte), which is the order in which sqlite can use them.
+            Columns which an Index cannot help with (e.g.- __ne, __like) and the table's rowid are excluded.
+            Suggestions are sorted by count (most common first) and duplicate Indexes are only suggested once.
+        """
+        with self.lock:
+            shapes = [(shape,count) for shape,count in self.shapes.most_common() if count >= minimum]
+        output = list()
+        seen = set()
+        for shape,count in shapes:
+            tablename,columns = shape
+            try: plan = self.explain(shape)
+            except sqlite3.Error: continue
+            ## Plans refer to tables by name only
+            name = self.database.gettable(tablename).name
+            scans = [SCANRE.match(line) for line in plan]
+            if not any(scan and scan.group("table") == name for scan in scans): continue
+            index = self.shapeindex(shape)
+            if index is None: continue
+            key = (tablename,tuple(index.columns))
+            if key in seen: continue
+            seen.add(key)
+            output.append(IndexSuggestion(index,count,plan))
+        return output
+
+    def shapeindex(self, shape):
+        """ Returns the Index suggested for the given shape (or None if the shape cannot use an index).
+
+            The suggestion is a filter Index: it only contains the columns which the shape filters on (see suggest) and
+            not the columns which are selected, so it is not a covering Index (quick-queries normally select every column).
+        """
+        tablename,columns = shape
+        table = self.database.gettable(tablename)
+        rowid = str(table.rowid) if table.rowid else None
+        equality = [column for column,option in columns if option in EQUALITYOPTIONS and column != rowid]
+        ranges = [column for column,option in columns if option in RANGEOPTIONS and column != rowid and column not in equality]
+        indexcolumns = list(dict.fromkeys(equality))
+        if ranges: indexcolumns.append(ranges[0])
+        if not indexcolumns: return None
+        name = f"""{table.name}_{'_'.join(indexcolumns)}_idx"""
+        schema = str(table.schema.name) if table.schema else None
+        return Index(name, table = table.name, columns = indexcolumns, existsok = True, schema = schema)
+
+    def apply(self, minimum = 1):
+        """ Creates the Indexes returned by suggest(minimum) and returns them """
+        indexes = [suggestion.index for suggestion in self.suggest(minimum = minimum)]
+        for index in indexes: self.database.addindex(index)
+        return indexes
@@ -0,0 +1,298 @@
+""" alcustoms.sql.objects.Instrumentation
+
+    Opt-in query instrumentation for Database.
+
+    When a Database is instrumented (see Database.instrument) every cursor it creates is an
+    InstrumentedCursor which times each statement, counts the rows it returns (or modifies),
+    and determines which alcustoms.sql method issued it (e.g.- "AdvancedTable.quickselect").
+    Statements are aggregated in a QueryLog by their normalized sql (literals, parameters and
+    "IN" lists are replaced with placeholders), so that all queries generated by the same code
+    path share a single QueryStats entry.
+
+    Example Usage:
+        log = db.instrument(threshold = 0.01, explain = True)
+        ## Run queries
+        log.dump()
+        for stats in log.scans(): print(stats.sql, stats.plan)
+        db.uninstrument()
+"""
+
+## Builtin
+import collections
+import inspect
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+__all__ = ["QueryLog","QueryStats","QueryRecord","InstrumentedCursor","normalizesql",]
+
+############################################
+"""
+             UTILITY FUNCTIONS
+                                         """
+############################################
+
+WHITESPACERE = re.compile(r"\s+")
+STRINGRE = re.compile(r"'(?:[^']|'')*'")
+NUMBERRE = re.compile(r"(?<![\w:$@?])-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b")
+PARAMETERRE = re.compile(r"[:$@]\w+|\?\d*")
+INLISTRE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+## Statements which can be passed to EXPLAIN QUERY PLAN
+EXPLAINRE = re.compile(r"\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b", re.IGNORECASE)
+
+def normalizesql(sql):
+    """ Returns a normalized version of sql so that statements which only differ by their values can be grouped together.
+
+        Whitespace is collapsed, string and numeric literals and parameters are replaced with "?",
+        and lists of parameters (as used by "IN" statements) are replaced with "(...)".
+    """
+    sql = WHITESPACERE.sub(" ",sql).strip()
+    sql = STRINGRE.sub("?",sql)
+    sql = PARAMETERRE.sub("?",sql)
+    sql = NUMBERRE.sub("?",sql)
+    return INLISTRE.sub("(...)",sql)
+
+def qualname(frame):
+    """ Returns the qualified name of the function being executed in frame (e.g.- "AdvancedTable.quickselect").
+
+        code.co_qualname is only available from Python 3.11: on earlier versions the class is determined
+        from the frame's "self" or "cls" argument by finding the class in its mro which defines the function.
+        Functions which are not methods (and methods whose class cannot be found) return their bare name.
+    """
+    name = getattr(frame.f_code,"co_qualname",None)
+    if name is not None: return name
+    return _methodname(frame)
+
+def _methodname(frame):
+    """ Determines the qualified name of the function being executed in frame from its "self" or "cls" argument (see qualname) """
+    code = frame.f_code
+    name = code.co_name
+    ## Functions defined inside other functions (i.e.- decorator wrappers) are marked as such, as they would be by co_qualname
+    if code.co_flags & inspect.CO_NESTED: return f"<locals>.{name}"
+    if not code.co_argcount: return name
+    owner = frame.f_locals.get(code.co_varnames[0])
+    if code.co_varnames[0] == "self": owner = type(owner)
+    elif code.co_varnames[0] != "cls" or not isinstance(owner,type): return name
+    for cls in owner.__mro__:
+        attr = cls.__dict__.get(name)
+        ## Unwrap classmethods, staticmethods and properties
+        attr = getattr(attr,"__func__",getattr(attr,"fget",attr))
+        ## Unwrap decorated methods (see functools.wraps)
+        while attr is not None:
+            if getattr(attr,"__code__",None) is code: return f"{cls.__qualname__}.{name}"
+            attr = getattr(attr,"__wrapped__",None)
+    return name
+
+def getcaller(frame):
+    """ Returns the qualified name of the outermost public alcustoms.sql function in the call stack starting at frame.
+
+        Private functions (starting with an underscore) and decorator wrappers are skipped, so the result is the
+        method which was called from outside of alcustoms.sql (e.g.- "AdvancedTable.quickselect").
+        Returns None if there is no such function.
+    """
+    api = None
+    while frame is not None:
+        module = frame.f_globals.get("__name__","")
+        if not module.startswith("alcustoms.sql") or module.startswith("alcustoms.sql.tests"): break
+        if not frame.f_code.co_name.startswith("_"):
+            name = qualname(frame)
+            if "<" not in name: api = name
+        frame = frame.f_back
+    return api
+
+############################################
+"""
+                   OBJECTS
+                                         """
+############################################
+
+QueryRecord = collections.namedtuple("QueryRecord",["sql","normalized","parameters","api","elapsed","rows","plan"])
+QueryRecord.__doc__ = """ A single statement executed by an InstrumentedCursor.
+
+    elapsed is the time (in seconds) taken to execute the statement. rows is the number of rows modified
+    by the statement (for SELECT statements, rows are counted as they are fetched, so rows is None).
+    plan is the statement's EXPLAIN QUERY PLAN (as a list of strings) if it was captured, otherwise None.
+"""
+
+class QueryStats():
+    """ Aggregated statistics for all statements which share the same normalized sql.
+
+        count is the number of times a statement was executed, totaltime is the total time spent executing
+        statements and fetching their rows, maxtime is the longest single execution, rows is the total number of
+        rows returned (or modified), apis counts the alcustoms.sql methods which issued the statements, sql is the
+        last statement executed and plan is the EXPLAIN QUERY PLAN captured for it (if any).
+    """
+    def __init__(self,normalized):
+        self.normalized = normalized
+        self.sql = None
+        self.count = 0
+        self.totaltime = 0.0
+        self.maxtime = 0.0
+        self.rows = 0
+        self.apis = collections.Counter()
+        self.plan = None
+
+    @property
+    def averagetime(self):
+        if not self.count: return 0.0
+        return self.totaltime / self.count
+
+    @property
+    def isscan(self):
+        """ Whether the captured plan includes a full table scan """
+        if not self.plan: return False
+        return any(line.startswith("SCAN") for line in self.plan)
+
+    def asdict(self):
+        return dict(normalized = self.normalized, sql = self.sql, count = self.count, totaltime = self.totaltime, maxtime = self.maxtime,
+                    averagetime = self.averagetime, rows = self.rows, apis = dict(self.apis), plan = self.plan)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.normalized!r}, count = {self.count}, totaltime = {self.totaltime:.6f})"
+
+class QueryLog():
+    """ Collects statistics from InstrumentedCursors.
+
+        threshold is the time (in seconds) after which a statement is considered slow: slow statements
+        have their EXPLAIN QUERY PLAN captured (if explain is True) and are passed to callback.
+        If threshold is None, every statement is considered slow.
+        callback, if supplied, is called with a QueryRecord for each slow statement.
+    """
+    def __init__(self, threshold = None, explain = False, callback = None):
+        self.threshold = threshold
+        self.explain = explain
+        self.callback = callback
+        self.stats = dict()
+        self.lock = threading.Lock()
+
+    def _getstats(self,sql):
+        normalized = normalizesql(sql)
+        stats = self.stats.get(normalized)
+        if stats is None:
+            stats = self.stats[normalized] = QueryStats(normalized)
+        return stats
+
+    def record(self, cursor, sql, parameters, elapsed, api):
+        """ Records the execution of a statement and returns its QueryStats """
+        rows = None
+        if cursor.description is None and cursor.rowcount >= 0: rows = cursor.rowcount
+        with self.lock:
+            stats = self._getstats(sql)
+            stats.sql = sql
+            stats.count += 1
+            stats.totaltime += elapsed
+            stats.maxtime = max(stats.maxtime,elapsed)
+            if rows: stats.rows += rows
+            if api: stats.apis[api] += 1
+        slow = self.threshold is None or elapsed >= self.threshold
+        if not slow: return stats
+        plan = None
+        if self.explain:
+            plan = explain(cursor.connection, sql, parameters)
+            if plan is not None: stats.plan = plan
+        if self.callback:
+            self.callback(QueryRecord(sql, stats.normalized, parameters, api, elapsed, rows, plan))
+        return stats
+
+    def fetched(self, stats, rows, elapsed):
+        """ Records rows fetched from a statement """
+        with self.lock:
+            stats.rows += rows
+            stats.totaltime += elapsed
+
+    def clear(self):
+        """ Removes all collected statistics """
+        with self.lock:
+            self.stats.clear()
+
+    def scans(self):
+        """ Returns a list of QueryStats whose captured plan includes a full table scan """
+        with self.lock:
+            return [stats for stats in self.stats.values() if stats.isscan]
+
+    def sorted(self, key = "totaltime"):
+        """ Returns a list of QueryStats sorted by the given attribute (highest first) """
+        with self.lock:
+            return sorted(self.stats.values(), key = lambda stats: getattr(stats,key), reverse = True)
+
+    def asdict(self):
+        """ Returns all collected statistics as a dict of {normalized sql: QueryStats.asdict()} """
+        with self.lock:
+            return {normalized:stats.asdict() for normalized,stats in self.stats.items()}
+
+    def dump(self, file = None, key = "totaltime"):
+        """ Writes a summary of the collected statistics to file (default sys.stdout), sorted by key (see sorted) """
+        if file is None: file = sys.stdout
+        for stats in self.sorted(key = key):
+            apis = ", ".join(f"{api} ({count})" for api,count in stats.apis.most_common())
+            file.write(f"{stats.count:>6} calls {stats.totaltime*1000:>10.3f}ms total {stats.maxtime*1000:>10.3f}ms max {stats.rows:>8} rows  {stats.normalized}\n")
+            if apis: file.write(f"{'':>6} from: {apis}\n")
+            if stats.plan: file.write("".join(f"{'':>6} plan: {line}\n" for line in stats.plan))
+
+def explain(connection, sql, parameters = ()):
+    """ Returns the EXPLAIN QUERY PLAN for the given sql as a list of strings (or None if the plan could not be determined).
+
+        A plain sqlite3.Cursor is used so that the result is unaffected by the connection's row_factory
+        and is not itself recorded.
+    """
+    if not EXPLAINRE.match(sql): return None
+    cursor = sqlite3.Cursor(connection)
+    cursor.row_factory = None
+    try:
+        rows = cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except sqlite3.Error:
+        return None
+    finally:
+        cursor.close()
+    return [row[-1] for row in rows]
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """ A Cursor which records its statements to a QueryLog. Created by Database.cursor() while the Database is instrumented. """
+    querylog = None
+    _stats = None
+
+    def execute(self, sql, parameters = ()):
+        api = getcaller(sys._getframe(1))
+        start = time.perf_counter()
+        result = super().execute(sql, parameters)
+        elapsed = time.perf_counter() - start
+        self._stats = self.querylog.record(self, sql, parameters, elapsed, api)
+        return result
+
+    def executemany(self, sql, parameters):
+        api = getcaller(sys._getframe(1))
+        start = time.perf_counter()
+        result = super().executemany(sql, parameters)
+        elapsed = time.perf_counter() - start
+        self._stats = self.querylog.record(self, sql, (), elapsed, api)
+        return result
+
+    def _fetched(self, rows, start):
+        if self._stats is not None:
+            self.querylog.fetched(self._stats, rows, time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(0 if row is None else 1, start)
+        return row
+
+    def fetchmany(self, *args, **kw):
+        start = time.perf_counter()
+        rows = super().fetchmany(*args, **kw)
+        self._fetched(len(rows), start)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(len(rows), start)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        row = super().__next__()
+        self._fetched(1, start)
+        return row
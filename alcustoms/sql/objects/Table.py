@@ -1,10 +1,12 @@
 
+import sqlite3
 from sqlite3 import OperationalError
 ## This Module
 from alcustoms.sql import constants,objects
-from alcustoms.sql.objects import Connection, Utilities
+from alcustoms.sql.objects import Connection, Utilities, Index, View
 ## Builtin
 from collections import OrderedDict
+import contextlib
 
 __all__ = ["TableExistsError","TableConstructor","Table","AdvancedTable",]
 
@@ -61,6 +63,19 @@ def removetable(conn,tablename):
                             texists=texists)
                         ).with_traceback(sys.exc_info()[2])
 
+def toindex(index,tablename):
+    """ Converts index to an Index (parsing it if it is a string) and sets its table to tablename if it does not have one.
+
+        Raises a ValueError if the Index belongs to a different table.
+    """
+    if isinstance(index,str): index = Index.Index.from_definition(index)
+    if not isinstance(index,Index.Index):
+        raise TypeError("Indexes must be Index objects or CREATE INDEX statements")
+    if index.table is None: index.table = str(tablename)
+    elif index.table.lower() != str(tablename).lower():
+        raise ValueError(f"Index {index.name} is for a different table: {index.table}")
+    return index
+
 def tableexists(conn,tablename):
     """ Returns whether a table exists in a Database"""
     if isinstance(tablename,Table):
@@ -78,10 +93,11 @@ class TableConstructor():
     Does not support any Database interactions and exists as an easy alternative for writing Table sql.
     Can be converted after initialization to a Table via the to_table method.
     """
-    def __init__(self, name, columns = None, tableconstraints = None, temporary = False, existsok = False, schema = None, norowid = False):
+    def __init__(self, name, columns = None, tableconstraints = None, temporary = False, existsok = False, schema = None, norowid = False, indexes = None):
         """ A constructor for building a new Table that might not already exist in the database.
         
         Columns should be a dict of column-name,(Column objects or sql-valid strings) items or a list of the same.
+        indexes should be a list of Index objects or "CREATE INDEX" statements (see addindex).
         """
 
         self.name = name
@@ -94,6 +110,9 @@ class TableConstructor():
         self.existsok = bool(existsok)
         self.schema = schema
         self.norowid = norowid
+        self.indexes = list()
+        if indexes:
+            for index in indexes: self.addindex(index)
 
     @property
     def istemporary(self):
@@ -202,6 +221,15 @@ class TableConstructor():
         self.columns.update(columns)
         return columns
 
+    def addindex(self,index):
+        """ Adds an Index to be created alongside the Table. index should be an Index object or a "CREATE INDEX" statement.
+
+            If the Index does not declare a table, it is set to this Table. It is an error to add an Index for a different table.
+        """
+        index = toindex(index,self.name)
+        self.indexes.append(index)
+        return index
+
     def to_table(self, database = None):
         """ Creates a Table Object based on the Table Constructor. Accepts a database connection as an argument. """
         return Table.from_constructor(self,database = database)
@@ -225,14 +253,15 @@ class Table():
 
         database is optional and should be a Connection instance if supplied.
         """
-        return Table(tableconstructor.definition,database = database, _parser = parser)
+        return Table(tableconstructor.definition,database = database, _parser = parser, indexes = tableconstructor.indexes)
 
-    def __init__(self,definition, database = None, _parser = None):
+    def __init__(self,definition, database = None, _parser = None, indexes = None):
         """ Creates a new Table Instance.
        
         definition should be the SQL-string used to create the Table in a database.
         database is optional, but should be a Connection-type instance if supplied (Database-type
         instance is prefered but not necessary).
+        indexes is optional and should be a list of Index objects or "CREATE INDEX" statements for the Table.
         """
         self._set_None()
         self._definition = definition
@@ -244,6 +273,8 @@ class Table():
 
         if _parser:
             self._parse_definition()
+        if indexes:
+            self._indexes = [toindex(index,self.name) for index in indexes]
 
     def _parse_definition(self):
         self._parser(self)
@@ -257,6 +288,7 @@ class Table():
         self._norowid =False
         self._columns = OrderedDict()
         self._tableconstraints = list()
+        self._indexes = list()
         self._comments = list()
         self._regex_result = None
         self._database = None
@@ -329,6 +361,11 @@ class Table():
     def tableconstraints(self):
         return list(self._tableconstraints)
 
+    @property
+    def indexes(self):
+        """ The Table's explicitly-created Indexes. For Tables retrieved from a Database, these are parsed from sqlite_master """
+        return list(self._indexes)
+
     @property
     def comments(self):
         return list(self._comments)
@@ -393,7 +430,7 @@ class Table():
 
         This is useful for making change to the Table, as its definition is immutable. """
         return TableConstructor(name = self.name, columns = self.columns, tableconstraints = self.tableconstraints,
-                         temporary = self.istemporary, existsok = self.existsok, schema = self.schema, norowid = self.norowid)
+                         temporary = self.istemporary, existsok = self.existsok, schema = self.schema, norowid = self.norowid, indexes = self.indexes)
 
     def to_advancedtable(self, database = None, tableclass = None):
         """ Returns an AdvancedTable instance representation of the Table.
@@ -420,6 +457,7 @@ class Table():
         other._columns = self._columns.copy()
         other._comments = self._comments
         other._tableconstraints = self._tableconstraints
+        other._indexes = list(self._indexes)
 
     def __repr__(self):
         return f"{self.__class__.__name__} Object: {self.name}"
@@ -444,6 +482,8 @@ class AdvancedTable(Table):
     execute simple interactions.
     Can be created from a Table class using the from_table method.
     """
+    ## Whether quick-query and select statements should be cached (see objects.QUERYCACHE)
+    usequerycache = True
 
     @classmethod
     def from_table(cls,table, database = None):
@@ -468,7 +508,9 @@ class AdvancedTable(Table):
             except: raise ValueError("Table not in Database.")
             ## Always revert the Table's original db attribute
             finally: table.database = olddb
-        return cls(table._definition, database,_parser = table._parser)
+        advancedtable = cls(table._definition, database,_parser = table._parser)
+        advancedtable._indexes = list(table._indexes)
+        return advancedtable
 
     def __init__(self, definition, database, row_factory = None, _parser = None):
         """ Initializes a new AdvancedTable
@@ -524,11 +566,11 @@ class AdvancedTable(Table):
         """
         return self.select(rowid=rowid)
 
-    def quickselect(self,*,rowid = False, limit = False, distinct = False, columns = None, **kw):
+    def quickselect(self,*expressions, rowid = False, limit = False, distinct = False, columns = None, prefetch = None, rows = None, **kw):
         """ A Django-style filter method
 
         Uses the Table's Factory.
-        columns, rowid, limit, and distinct function like AdvancedTable.select.
+        columns, rowid, limit, distinct, prefetch, and rows function like AdvancedTable.select.
         Create an AND-joined select statement from the AdvancedTable's columns with optional extentions.
         Returns a list of like factory.
         advancedtable.quickselect([key-word args]):
@@ -540,16 +582,190 @@ class AdvancedTable(Table):
         Any other options raise a NotImplementedError.
         Note that underscores are double-underscores and all options should be lowercase.
         To query via the Table's primary key, use "pk" instead of rowid: rowid is already an argument of this function.
+        in/notin lists which would exceed constants.REPLACEMENT_LIMIT placeholders are supported: see AdvancedTable._largefilters.
+        Foreign Keys can be traversed by following a Foreign Key column with columns of the referenced table: e.g.-
+        comments.quickselect(pid__userid__fname = "John") returns the comments on posts by users named John (see objects._advancedqueryparser).
+        OR and NOT conditions can be supplied as positional Q expressions (see objects.Q), which are AND-joined with the keywords:
+        e.g.- quickselect(Q(name = "Hello") | Q(value__gt = 1)).
         """
-        
-        querystrings, replacementdict = objects._selectqueryparser(self.rowid,list(self.columns),rowid = self.rowid,**kw)
+        kw = objects.addexpressions(kw, expressions)
+        large = self._largefilters(kw)
+        if large:
+            chunks = self._inchunks(kw, large, distinct = distinct)
+            if chunks:
+                key,chunks = chunks
+                result = objects.QueryResult()
+                for chunk in chunks:
+                    result.extend(self.quickselect(rowid = rowid, limit = limit - len(result) if limit else limit, columns = columns, rows = rows, **dict(kw, **{key:chunk})))
+                    if limit and len(result) >= limit: break
+                if prefetch: self.prefetch(result,*prefetch)
+                return result
+            with self._templists(kw, large) as (querystring, replacementdict, counter):
+                return self.select(query = querystring, replacements = replacementdict, rowid = rowid, limit = limit, distinct = distinct, columns = columns, prefetch = prefetch, rows = rows)
+
+        querystring, replacementdict = self._quickquery(kw)
+        self._adviseindex(kw, querystring, replacementdict)
+        return self.select(query = querystring, replacements = replacementdict, rowid = rowid, limit = limit, distinct = distinct, columns = columns, prefetch = prefetch, rows = rows)
+
+    def iquickselect(self,*expressions, rowid = False, limit = False, distinct = False, columns = None, batch_size = constants.BATCHSIZE, rows = None, **kw):
+        """ A generator version of quickselect.
+
+        Accepts the same arguments as quickselect; batch_size functions like AdvancedTable.iselect.
+        """
+        kw = objects.addexpressions(kw, expressions)
+        large = self._largefilters(kw)
+        if large:
+            return self._largeiquickselect(kw, large, rowid = rowid, limit = limit, distinct = distinct, columns = columns, batch_size = batch_size, rows = rows)
+        querystring, replacementdict = self._quickquery(kw)
+        self._adviseindex(kw, querystring, replacementdict)
+        return self.iselect(query = querystring, replacements = replacementdict, rowid = rowid, limit = limit, distinct = distinct, columns = columns, batch_size = batch_size, rows = rows)
+
+    def _largeiquickselect(self, kw, large, rowid = False, limit = False, distinct = False, columns = None, batch_size = constants.BATCHSIZE, rows = None):
+        """ The generator used by iquickselect for large in/notin lists (see AdvancedTable._largefilters).
+
+            Unlike iquickselect, the query is not executed until the first row is requested. Temporary tables are
+            dropped once the generator is exhausted or closed.
+        """
+        chunks = self._inchunks(kw, large, distinct = distinct)
+        if chunks:
+            key,chunks = chunks
+            count = 0
+            for chunk in chunks:
+                for row in self.iquickselect(rowid = rowid, limit = limit - count if limit else limit, columns = columns, batch_size = batch_size, rows = rows, **dict(kw, **{key:chunk})):
+                    count += 1
+                    yield row
+                if limit and count >= limit: return
+            return
+        with self._templists(kw, large) as (querystring, replacementdict, counter):
+            yield from self.iselect(query = querystring, replacements = replacementdict, rowid = rowid, limit = limit, distinct = distinct, columns = columns, batch_size = batch_size, rows = rows)
+
+    def _largefilters(self, kw):
+        """ Returns a list of the in/notin keywords which need to be handled separately in order to keep the query under
+            constants.REPLACEMENT_LIMIT placeholders (or None if the query can be executed normally).
+
+            The keywords with the longest lists are selected until the remaining placeholders fit within the limit.
+            Depending on their size, the selected keywords are either split across multiple queries (see AdvancedTable._inchunks)
+            or are loaded into temporary tables and replaced with subqueries (see AdvancedTable._templists).
+        """
+        total,lists = 0,[]
+        for k,v in kw.items():
+            if isinstance(v,objects.Q):
+                ## Q expressions are always compiled normally
+                total += sum(len(v) if isinstance(v,(list,tuple)) else 1 for leaf,v in v.leaves())
+            elif isinstance(v,(list,tuple)):
+                total += len(v)
+                if objects.splitquery(k)[1] in ("in","notin"): lists.append((len(v),k))
+            else: total += 1
+        if total <= constants.REPLACEMENT_LIMIT: return None
+        large = []
+        for length,k in sorted(lists, reverse = True):
+            large.append(k)
+            total -= length
+            if total <= constants.REPLACEMENT_LIMIT: break
+        return large
+
+    def _inchunks(self, kw, large, distinct = False):
+        """ Determines whether a large query can be split into multiple queries whose results are concatenated.
+
+            This is only the case for a single "in" list of up to constants.LARGEIN_CHUNKLIMIT (hashable) values when distinct is False.
+            The values are deduplicated so that no row is returned by more than one query.
+            Returns the keyword and a list of its chunks, or None if temporary tables should be used instead.
+        """
+        if distinct or len(large) != 1: return None
+        key = large[0]
+        values = kw[key]
+        if objects.splitquery(key)[1] != "in": return None
+        try: values = list(dict.fromkeys(values))
+        except TypeError: return None
+        if len(values) > constants.LARGEIN_CHUNKLIMIT: return None
+        size = constants.REPLACEMENT_LIMIT - sum(len(v) if isinstance(v,(list,tuple)) else 1 for k,v in objects.queryleaves(kw) if k != key)
+        if size < 1: return None
+        return key,[values[i:i+size] for i in range(0,len(values),size)]
+
+    @contextlib.contextmanager
+    def _templists(self, kw, large):
+        """ Loads the values of the given in/notin keywords into temporary tables (see Utilities.templist) and yields the
+            querystring, replacements, and final ReplacementFactory counter for the quick-query keywords.
+
+            The large keywords are replaced with "{column} [NOT] IN (SELECT value FROM {temporary table})" subqueries.
+        """
+        rest = {k:v for k,v in kw.items() if k not in large}
+        compiled = self._compiledquery(rest)
+        querystrings = list(compiled.querystrings)
+        replacementdict = compiled.bind(rest)
+        for k in large:
+            ## Keywords which traverse Foreign Keys filter the final table (see objects.traversal)
+            prefix,suffix,table,key = objects.traversal(self,k)
+            research = objects.UNDERSCORERE.search(key)
+            column = research.group("column")
+            if column not in table._columns:
+                if column != "pk": raise ValueError("Given column is not a column of this table.")
+                column = table.rowid
+            operator = "IN" if research.group("option") == "in" else "NOT IN"
+            querystrings.append((prefix+f"{column} {operator} (SELECT value FROM ",")"+suffix,k))
+        with contextlib.ExitStack() as stack:
+            querystrings = [q if isinstance(q,str) else f"{q[0]}{stack.enter_context(Utilities.templist(self.database, kw[q[2]]))}{q[1]}"
+                            for q in querystrings]
+            yield " AND ".join(querystrings), replacementdict, compiled.counter
+
+    @contextlib.contextmanager
+    def _filterquery(self, kw):
+        """ Yields the querystring and replacements for quick-query keywords used by statements which only read from the database.
+
+            Large in/notin lists are loaded into temporary tables (see AdvancedTable._templists).
+        """
+        large = self._largefilters(kw)
+        if large:
+            with self._templists(kw, large) as (querystring, replacementdict, counter):
+                yield querystring, replacementdict
+            return
+        querystring, replacementdict = self._quickquery(kw)
+        self._adviseindex(kw, querystring, replacementdict)
+        yield querystring, replacementdict
+
+    def _querycache(self, kw):
+        """ Returns the QueryCache to use for the given quick-query keywords (or None if they should not be cached).
+
+            Queries which traverse Foreign Keys (see objects._advancedqueryparser) depend on the definitions of other
+            tables, so they are cached in the Database's schemacache (which is cleared whenever the schema changes)
+            instead of objects.QUERYCACHE.
+        """
+        if not self.usequerycache: return None
+        if not any(objects.istraversal(self,k) for k,v in objects.queryleaves(kw)): return objects.QUERYCACHE
+        if not hasattr(self.database,"checkschemacache"): return None
+        return self.database.checkschemacache().queries
 
-        querystring = " AND ".join(querystrings)
-        return self.select(query = querystring, replacements = replacementdict, rowid = rowid, limit = limit, distinct = distinct, columns = columns)
+    def _filterparser(self, _replacer = None, **kw):
+        """ Parses quick-query keywords for the Table (see objects._advancedqueryparser) """
+        return objects._advancedqueryparser(self, _replacer = _replacer, **kw)
+
+    def _compiledquery(self, kw):
+        """ Returns the CompiledQuery for the given quick-query keywords.
+
+            Compiled queries are cached by the Table's definition and the shape of the keywords (see objects.queryshape
+            and AdvancedTable._querycache), so each shape is only parsed and validated once.
+        """
+        shape = objects.queryshape(kw)
+        key = ("where",self._definition,self.fullname,shape)
+        cache = self._querycache(kw)
+        compiled = cache.get(key) if cache is not None else None
+        if compiled is None:
+            compiled = objects.compilequery(self.rowid,list(self._columns),shape, rowid = self.rowid, _parser = self._filterparser)
+            if cache is not None: cache.set(key,compiled)
+        return compiled
+
+    def _quickquery(self, kw):
+        """ Returns the querystring and replacements for the given quick-query keywords (see quickselect) """
+        compiled = self._compiledquery(kw)
+        return compiled.querystring, compiled.bind(kw)
+
+    def _adviseindex(self, kw, query, replacements):
+        """ Records the shape of a quick-query with the Database's IndexAdvisor (if it has one) """
+        advisor = getattr(self.database,"indexadvisor",None)
+        if advisor is not None: advisor.record(self, kw, query, replacements)
 
     @objects.queryresult
-    @objects.advancedtablefactory
-    def select(self, query = "", replacements = None, rowid = False, columns = None, limit = False, distinct = False):
+    def select(self, query = "", replacements = None, rowid = False, columns = None, limit = False, distinct = False, prefetch = None, rows = None):
         """ Performs a basic "SELECT {columns} [...] WHERE {query}" statement from the Table.
 
         Uses the Table's factory.
@@ -560,12 +776,132 @@ class AdvancedTable(Table):
         If limit is an integer, the output will be limited to the number.
         If distinct is True, DISTINCT will be added to the query.
         By default, returns all columns (Selects *). If columns is supplied, columns should be a list of column name strings in this table.
+        prefetch may be a list of Foreign Key column names: see AdvancedTable.prefetch.
+        rows can be one of constants.ROWMODES to return plain tuples, namedtuples, or sqlite3.Rows instead of using the Table's
+        factory: this is faster for large reads which only need the values. The Table's rowid is then only selected if rowid is True,
+        and prefetch cannot be used.
         """
-        if isinstance(self.row_factory,objects.AdvancedRow_Factory):
+        cursor = self._selectcursor(query = query, replacements = replacements, rowid = rowid, columns = columns, limit = limit, distinct = distinct, rows = rows)
+        try: result = cursor.fetchall()
+        finally: cursor.close()
+        if prefetch:
+            if rows is not None: raise ValueError("prefetch cannot be used with rows")
+            self.prefetch(result,*prefetch)
+        return result
+
+    def prefetch(self, rows, *columns):
+        """ Retrieves the Foreign Key rows referenced by the given columns for all of the given rows.
+
+        rows should be a list of AdvancedRows from this Table (other rows are ignored) and columns should be
+        names of Foreign Key columns in this Table.
+        Rather than querying the foreign table each time the Foreign Key attribute is accessed on a row,
+        the distinct values for each column are queried using "IN" statements (up to constants.REPLACEMENT_LIMIT
+        values per query) and the results are stored on the rows. Rows whose values cannot be matched to a
+        result will continue to query the database when the attribute is accessed.
+        Returns rows.
+        """
+        for column in columns:
+            if not isinstance(column,str) or column not in self._columns:
+                raise AttributeError(f"Column does not exist in table: {column}")
+            if not self._columns[column].isforeignkey:
+                raise ValueError(f"Column is not a Foreign Key: {column}")
+
+        rows = [row for row in rows if isinstance(row,objects.AdvancedRow)]
+        if not rows: return rows
+        conn = self.database
+        for column in columns:
+            ftable,fcolumn = objects.getreference(self._columns[column])
+            values = list(set(row._getvalue(column) for row in rows if row._hasvalue(column)))
+            if None in values: values.remove(None)
+
+            ## Make sure that we replicate the type of row_factory used to create the rows
+            with Utilities.temp_row_factory(conn,rows[0].row_factory):
+                ftable = conn.getadvancedtable(ftable)
+            ## A NULL Foreign Key can only be resolved without querying if it references the primary key
+            pkreference = fcolumn is None or str(fcolumn) == str(ftable.pk)
+            if fcolumn is None:
+                q = "pk__in"
+                fcolumn = ftable.pk
+            else: q = f"{fcolumn}__in"
+            fcolumn = str(fcolumn)
+
+            lookup = dict()
+            with Utilities.temp_row_factory(ftable,objects.advancedrow_factory):
+                for i in range(0,len(values),constants.REPLACEMENT_LIMIT):
+                    for result in ftable.quickselect(**{q:values[i:i+constants.REPLACEMENT_LIMIT]}):
+                        ## Like the normal attribute lookup, the first matching row is used
+                        lookup.setdefault(result._getvalue(fcolumn),result)
+
+            for row in rows:
+                if not row._hasvalue(column): continue
+                value = row._getvalue(column)
+                if value is None:
+                    if not pkreference: continue
+                elif value not in lookup: continue
+                if row._prefetched is None: row._prefetched = dict()
+                row._prefetched[column] = lookup.get(value)
+        return rows
+
+    def join(self, addition, jointype = None, oncolumns = None, alias = None):
+        """ Returns a Join between this Table and addition, which can be another Table or the name of a table in this Table's Database.
+
+        If oncolumns is not supplied, the ON clause is inferred from the Foreign Keys between the tables. See View.Join for more information.
+        Example:
+            rows = posts.join("users", alias = "author").select(author__fname__like = "J%")
+            rows[0]['posts'].post, rows[0]['author'].email
+        """
+        return View.Join(self, addition, jointype = jointype, oncolumns = oncolumns, alias = alias)
+
+    def iselect(self, query = "", replacements = None, rowid = False, columns = None, limit = False, distinct = False, batch_size = constants.BATCHSIZE, rows = None):
+        """ A generator version of AdvancedTable.select.
+
+        Accepts the same arguments as select. Rather than fetching all rows at once, rows are fetched from the
+        database batch_size rows at a time (default constants.BATCHSIZE) and yielded individually.
+        The query is executed immediately; the rows are created (using the Table's factory) as they are yielded.
+        """
+        if not isinstance(batch_size,int) or batch_size < 1: raise ValueError("batch_size should be a positive integer")
+        cursor = self._selectcursor(query = query, replacements = replacements, rowid = rowid, columns = columns, limit = limit, distinct = distinct, rows = rows)
+        return Utilities.iterbatches(cursor,batch_size)
+
+    def _selectcursor(self, rows = None, **kw):
+        """ Executes the select statement for select and iselect and returns the cursor.
+        
+        The cursor retains the row_factory that was in place when it was created (i.e.- the Table's factory).
+        If rows is supplied (see AdvancedTable.select), the cursor's row_factory is set directly and the Table's factory is not used.
+        """
+        if rows is None: return self._factorycursor(**kw)
+        sql,replacements = self._selectstatement(rows = rows, **kw)
+        cursor = self.database.cursor()
+        cursor.row_factory = sqlite3.Row if rows == "row" else None
+        cursor.execute(sql,replacements)
+        if rows == "namedtuple": cursor.row_factory = objects.namedtuple_factory(cursor)
+        return cursor
+
+    @objects.advancedtablefactory
+    def _factorycursor(self, **kw):
+        return self.database.execute(*self._selectstatement(**kw))
+
+    def _selectstatement(self, query = "", replacements = None, rowid = False, columns = None, limit = False, distinct = False, orderby = None, rows = None):
+        """ Validates the arguments for select and iselect and returns the sql string and replacements.
+
+            orderby is an (unvalidated) sql ORDER BY clause, without "ORDER BY" (used by paginate).
+            rows is the rows argument of select, which determines whether the Table's factory will be used.
+        """
+        if rows is not None:
+            if rows not in constants.ROWMODES: raise ValueError(f"rows should be one of: {', '.join(constants.ROWMODES)}")
+        elif isinstance(self.row_factory,objects.AdvancedRow_Factory):
             rowid = True
         if replacements is None: replacements = dict()
         if not isinstance(replacements,(list,tuple,dict)): raise ValueError("Replacements should be a List/Tuple or Dict if supplied (whichever is appropriate for your query).")
 
+        ## Statements are cached once they have been validated
+        key = None
+        if self.usequerycache and isinstance(query,str) and isinstance(limit,int) and (columns is None or isinstance(columns,(list,tuple))):
+            key = ("select",self._definition,self.fullname,query,bool(rowid),columns if columns is None else tuple(columns),limit,bool(distinct),orderby)
+            try: sql = objects.QUERYCACHE.get(key)
+            except TypeError: key = sql = None
+            if sql is not None: return sql,replacements
+
         columnnames = list(self._columns)
         if columns is None:
             getcolumns = [f"*",]
@@ -602,12 +938,283 @@ class AdvancedTable(Table):
         if distinct:
             dist = " DISTINCT"
 
-        return self.database.execute(f"""SELECT{dist} {getcolumns} FROM {self.fullname}{query}{lim};""",replacements).fetchall()
+        order = ""
+        if orderby:
+            order = f" ORDER BY {orderby}"
+
+        sql = f"""SELECT{dist} {getcolumns} FROM {self.fullname}{query}{order}{lim};"""
+        if key is not None: objects.QUERYCACHE.set(key,sql)
+        return sql,replacements
+
+    def paginate(self, page_size, *expressions, after = None, order_by = None, columns = None, prefetch = None, rows = None, **kw):
+        """ Returns a single page of rows using keyset pagination.
+
+        Rather than skipping rows with an OFFSET (which requires sqlite to step over every previous row), each page
+        starts immediately after the last row of the previous page. If the ordering can use an index (the primary key
+        always can), the cost of each page is independent of how deep into the table it is.
+        page_size is the maximum number of rows on the page.
+        after is the key of the row which the page should start after (None for the first page): this is normally the
+        after attribute of the previous page. When ordering by the primary key, after can also be the row's pk (or the
+        AdvancedRow itself); when ordering by another column, a pk or AdvancedRow can still be supplied, but the row's
+        value for that column has to be looked up if it is not available.
+        order_by is a column name, or "pk" (the default); prefix it with a "-" to sort in descending order. Rows with the same
+        value are ordered by their primary key. Like sqlite, NULL values are sorted before other values (after them if descending).
+        Additional arguments are filters with the same syntax as quickselect (including Q expressions). columns, prefetch, and rows
+        function like AdvancedTable.select; the Table's primary key and the order_by column are always selected.
+        Returns a Page (a QueryResult with after and hasmore attributes).
+        """
+        kw = objects.addexpressions(kw, expressions)
+        if not isinstance(page_size,int) or page_size < 1: raise ValueError("page_size should be a positive integer")
+        column,key,descending = self._pageorder(order_by)
+        if columns is not None:
+            columns = list(columns)
+            if column is not None and column not in columns: columns.append(column)
+
+        querystring, replacementdict = self._quickquery(kw)
+        querystrings = [querystring,] if querystring else []
+        if after is not None:
+            pagevalue = None
+            if column is not None and isinstance(after,tuple):
+                pagevalue,pagekey = after
+            else:
+                pagekey = objects._checkvalue(after)
+                if column is not None:
+                    if isinstance(after,objects.AdvancedRow) and after._hasvalue(column):
+                        pagevalue = after._getvalue(column)
+                    else:
+                        cursor = self.database.cursor()
+                        cursor.row_factory = None
+                        result = cursor.execute(f"""SELECT {column} FROM {self.fullname} WHERE {key} = ?;""",(pagekey,)).fetchone()
+                        cursor.close()
+                        if result is None: raise ValueError(f"Table {self.fullname} has no row: {pagekey}")
+                        pagevalue = result[0]
+            querystrings.append(self._keyset(column,key,descending,pagevalue is None))
+            replacementdict['pagekey'] = pagekey
+            if column is not None and pagevalue is not None: replacementdict['pagevalue'] = pagevalue
+
+        direction = "DESC" if descending else "ASC"
+        orderby = f"{key} {direction}" if column is None else f"{column} {direction}, {key} {direction}"
+        ## One additional row is fetched to determine whether there is another page
+        cursor = self._selectcursor(query = " AND ".join(querystrings), replacements = replacementdict, rowid = True, columns = columns, limit = page_size + 1, orderby = orderby, rows = rows)
+        ## Rows are fetched as tuples so that the key of the last row can be found regardless of the row_factory
+        factory = cursor.row_factory
+        cursor.row_factory = None
+        try:
+            result = cursor.fetchall()
+            hasmore = len(result) > page_size
+            result = result[:page_size]
+            nextafter = None
+            if result:
+                names = [description[0] for description in cursor.description]
+                last = result[-1]
+                nextafter = last[names.index(key)]
+                if column is not None: nextafter = (last[names.index(column)],nextafter)
+            if factory is not None: result = [factory(cursor,row) for row in result]
+        finally:
+            cursor.close()
+        page = objects.Page(result, after = nextafter, hasmore = hasmore)
+        if prefetch:
+            if rows is not None: raise ValueError("prefetch cannot be used with rows")
+            self.prefetch(page,*prefetch)
+        return page
+
+    def iterpages(self, page_size = constants.BATCHSIZE, *expressions, after = None, order_by = None, **kw):
+        """ A generator which yields successive Pages (see paginate) until all matching rows have been returned.
+
+        Accepts the same arguments as paginate. Each page is queried when it is requested, so rows which are added
+        or changed while iterating will be included if they sort after the current page.
+        """
+        while True:
+            page = self.paginate(page_size, *expressions, after = after, order_by = order_by, **kw)
+            if page: yield page
+            if not page.hasmore: return
+            after = page.after
+
+    def _pageorder(self, order_by):
+        """ Validates paginate's order_by argument and returns the column (None for the primary key), the primary key, and whether the order is descending """
+        key = self.rowid
+        if key is None: raise ValueError("Tables without a rowid cannot be paginated")
+        if order_by is None: order_by = "pk"
+        if not isinstance(order_by,str): raise ValueError("order_by should be a column name")
+        descending = order_by.startswith("-")
+        if descending: order_by = order_by[1:]
+        if order_by in ("pk","rowid",key): return None,key,descending
+        if order_by not in self._columns: raise AttributeError(f"Column does not exist in table: {order_by}")
+        return order_by,key,descending
+
+    def _keyset(self, column, key, descending, null):
+        """ Returns the condition for paginate which selects the rows after :pagekey (and :pagevalue, if ordering by a column).
+
+            null indicates that the previous row's value was NULL (NULL sorts before all other values).
+        """
+        if column is None:
+            return f"{key} < :pagekey" if descending else f"{key} > :pagekey"
+        if descending:
+            if null: return f"({column} IS NULL AND {key} < :pagekey)"
+            return f"(({column}, {key}) < (:pagevalue, :pagekey) OR {column} IS NULL)"
+        if null: return f"(({column} IS NULL AND {key} > :pagekey) OR {column} IS NOT NULL)"
+        return f"({column}, {key}) > (:pagevalue, :pagekey)"
+
+    def count(self, *expressions, **kw):
+        """ Returns the number of rows which match the given filters.
+
+        Filters use the same syntax as quickselect; without filters, all rows in the Table are counted.
+        """
+        return self._aggregatequery(["COUNT(*)",], objects.addexpressions(kw, expressions))[0][0]
+
+    def aggregate(self, WHERE = None, **aggregates):
+        """ Computes aggregate functions over the rows which match the given filters and returns the results as a dict.
+
+        WHERE should be a dictionary with the same options as quickselect or a Q expression.
+        All other keyword arguments should be aggregate functions (see constants.AGGREGATEFUNCTIONS) with a column name
+        (or "pk") as their value; count also accepts "*". The value can also be a list of column names, in which case the
+        result for that function is a tuple of values in the same order.
+        Example:
+            advtable.aggregate(WHERE = dict(name__like = "H%"), sum = "value", max = ["value","name"])
+            ## > {"sum": 3, "max": (2, "Hello")}
+        """
+        if not aggregates: raise TypeError("aggregate requires at least one aggregate function")
+        selects,keys = self._aggregatecolumns(aggregates)
+        return self._aggregateresult(keys,self._aggregatequery(selects, WHERE)[0])
+
+    def group_by(self, columns, WHERE = None, **aggregates):
+        """ Groups the rows which match the given filters by the given columns and computes aggregate functions for each group.
+
+        columns should be a column name or a list of column names.
+        WHERE and aggregates function like AdvancedTable.aggregate.
+        Returns a list of dicts (one per group, sorted by the group columns) containing the group's value for each column
+        and the result of each aggregate function.
+        Example:
+            advtable.group_by("name", count = "*", sum = "value")
+            ## > [{"name": "Hello", "count": 1, "sum": 1}, {"name": "World", "count": 1, "sum": 2}]
+        """
+        if isinstance(columns,str): columns = [columns,]
+        if not isinstance(columns,(list,tuple)) or not columns: raise ValueError("group_by requires a column name or a list of column names")
+        groupcolumns = [self._aggregatecolumn(column) for column in columns]
+        selects,keys = self._aggregatecolumns(aggregates)
+        groupby = ", ".join(groupcolumns)
+        rows = self._aggregatequery(groupcolumns + selects, WHERE, groupby = groupby)
+        n = len(columns)
+        return [dict(zip(columns,row[:n]), **self._aggregateresult(keys,row[n:])) for row in rows]
+
+    def _aggregatecolumn(self, column, function = None):
+        """ Validates a column name for aggregate and group_by and returns it ("pk" is converted to the Table's rowid) """
+        if column == "*" and function == "count": return column
+        if not isinstance(column,str): raise ValueError("Aggregate columns should be column names")
+        if column == "pk": return self.rowid
+        if column not in self._columns: raise AttributeError(f"Column does not exist in table: {column}")
+        return column
+
+    def _aggregatecolumns(self, aggregates):
+        """ Validates aggregate keyword arguments and returns the sql for each aggregate and a list of (function, single) keys for _aggregateresult """
+        selects,keys = list(),list()
+        for function,columns in aggregates.items():
+            if function not in constants.AGGREGATEFUNCTIONS: raise ValueError(f"Invalid aggregate function: {function}")
+            single = isinstance(columns,str)
+            if single: columns = [columns,]
+            if not isinstance(columns,(list,tuple)) or not columns: raise ValueError("Aggregates should be a column name or a list of column names")
+            for column in columns:
+                selects.append(f"{function.upper()}({self._aggregatecolumn(column, function)})")
+            keys.append((function,None if single else len(columns)))
+        return selects,keys
+
+    def _aggregateresult(self, keys, row):
+        """ Converts the aggregate values in row into a dict using the keys returned by _aggregatecolumns """
+        result,i = dict(),0
+        for function,length in keys:
+            if length is None:
+                result[function] = row[i]
+                i += 1
+            else:
+                result[function] = tuple(row[i:i+length])
+                i += length
+        return result
+
+    def _aggregatequery(self, selects, kw, groupby = None):
+        """ Executes a select statement for the given sql columns (using the given quick-query filters) and returns the rows as tuples """
+        kw = objects.queryfilters(kw)
+        with self._filterquery(kw) as (querystring, replacementdict):
+            where = f" WHERE {querystring}" if querystring else ""
+            group = f" GROUP BY {groupby} ORDER BY {groupby}" if groupby else ""
+            cursor = self.database.cursor()
+            cursor.row_factory = None
+            try:
+                return cursor.execute(f"""SELECT {", ".join(selects)} FROM {self.fullname}{where}{group};""", replacementdict).fetchall()
+            finally:
+                cursor.close()
+
+    def to_columns(self, columns, *expressions, usenumpy = None, batch_size = constants.BATCHSIZE, **kw):
+        """ Returns the values of the given columns for the rows which match the given filters as typed arrays.
+
+        columns should be a column name (or "pk") or a list of column names. The remaining arguments are filters with
+        the same syntax as quickselect.
+        Rows are fetched batch_size rows at a time as tuples (the Table's factory is not used) and written directly into
+        a buffer for each column, which is preallocated using the number of matching rows. The type of each buffer is
+        determined by the column's affinity: see Utilities.ColumnBuffer.
+        If usenumpy is None (the default), numpy arrays are returned if numpy is installed; otherwise integer and real
+        columns are returned as array.arrays and other columns as lists. usenumpy can be True or False to require or
+        disable numpy.
+        Returns a dict of {column name: array}.
+        Example:
+            advtable.to_columns(["name","value"], value__gt = 1)
+            ## > {"name": array(['World'], dtype=object), "value": array([2])}
+        """
+        names,selects,affinities = self._columnexport(columns)
+        size = self.count(*expressions, **kw)
+        buffers = [Utilities.ColumnBuffer(affinity, size, usenumpy = usenumpy) for affinity in affinities]
+        for batch in self._columnbatches(selects, objects.addexpressions(kw, expressions), batch_size):
+            for buffer,values in zip(buffers,batch): buffer.write(values)
+        return dict(zip(names,(buffer.result() for buffer in buffers)))
+
+    def iter_columns(self, columns, *expressions, usenumpy = None, batch_size = constants.COLUMNBATCHSIZE, **kw):
+        """ A generator version of to_columns for results which are too large to hold in memory at once.
+
+        Accepts the same arguments as to_columns. Yields dicts of {column name: array} with up to batch_size values each
+        (the type of a column may differ between batches if it contains values which do not match its affinity).
+        The query is executed when the first batch is requested.
+        """
+        names,selects,affinities = self._columnexport(columns)
+        for batch in self._columnbatches(selects, objects.addexpressions(kw, expressions), batch_size):
+            output = dict()
+            for name,affinity,values in zip(names,affinities,batch):
+                buffer = Utilities.ColumnBuffer(affinity, len(values), usenumpy = usenumpy)
+                buffer.write(values)
+                output[name] = buffer.result()
+            yield output
+
+    def _columnexport(self, columns):
+        """ Validates the columns for to_columns and iter_columns and returns their names, sql, and affinities """
+        if isinstance(columns,str): columns = [columns,]
+        if not isinstance(columns,(list,tuple)) or not columns: raise ValueError("columns should be a column name or a list of column names")
+        selects = [str(self._aggregatecolumn(column)) for column in columns]
+        affinities = ["INTEGER" if column not in self._columns else self._columns[column].affinity for column in selects]
+        return list(columns),selects,affinities
+
+    def _columnbatches(self, selects, kw, batch_size):
+        """ A generator which executes a select statement for the given sql columns (using the given quick-query filters) and yields
+            batches of up to batch_size rows transposed into a tuple of values for each column.
+        """
+        if not isinstance(batch_size,int) or batch_size < 1: raise ValueError("batch_size should be a positive integer")
+        with self._filterquery(kw) as (querystring, replacementdict):
+            where = f" WHERE {querystring}" if querystring else ""
+            cursor = self.database.cursor()
+            cursor.row_factory = None
+            try:
+                cursor.execute(f"""SELECT {", ".join(selects)} FROM {self.fullname}{where};""", replacementdict)
+                rows = cursor.fetchmany(batch_size)
+                while rows:
+                    yield tuple(zip(*rows))
+                    rows = cursor.fetchmany(batch_size)
+            finally:
+                cursor.close()
 
     def advancedselect(self, distinct = False, limit = False, rowid = False,**kw):
-        """ A more powerful version of quickselect currently being developed and likely to replace the code for quickselect """
+        """ A version of quickselect which does not use compiled queries (see objects._advancedqueryparser).
 
-        querystrings, replacementdict = _advancedqueryparser(self.connection,**kw)
+            Kept for backwards compatibility: quickselect supports the same keywords.
+        """
+
+        querystrings, replacementdict = objects._advancedqueryparser(self,**kw)
 
         querystring = " AND ".join(querystrings)
         return self.select(query = querystring, replacements = replacementdict, rowid = rowid, limit = limit, distinct = distinct)
@@ -674,7 +1281,7 @@ class AdvancedTable(Table):
         """ Alias for addrow """
         return self.addrow(*args,**kw)
 
-    def addmultiple(self,*rows, grouping = True):
+    def addmultiple(self,*rows, grouping = True, rowids = True):
         """ Inserts multiple rows into the Table.
 
         rows should be dictionaries or objects. If a row is a dictionary, then it will be validated
@@ -689,7 +1296,7 @@ class AdvancedTable(Table):
             {column3 : 3}
             {column1 : 4, column2: 4, column3: 4}
 
-        addmultiple would result in the following database executions:
+        addmultiple would insert the rows in the following order:
             INSERT INTO example (column1,column2,column3) VALUES (1,1,1),(4,4,4)
             INSERT INTO example (column2, column3) VALUES (2,2)
             INSERT INTO example (column3) VALUES (3)
@@ -697,158 +1304,338 @@ class AdvancedTable(Table):
         This means that insertion order is not garaunteed to be identical to the order that rows are
         passed to addmultiple. If the order is important, then either set grouping to False or ensure
         that all rows include identical sets of columns.
-        If grouping is False, each row will be passed to addrow individually.
-
-        Groups will be further broken down if the number of substitutions would exceed the global
-        limit (900, to be safe).
-
-        Returns the rowids of the rows in the order that they were passed to addmultiple (ergo, if
-        grouping is uses, the rowids may not be in ascending order).
+        If grouping is False, rows are inserted in the order they are passed (consecutive rows which
+        declare the same columns are still inserted together).
+
+        Each group is inserted using a single statement with positional placeholders (so that
+        sqlite only has to prepare it once) and all groups are inserted in the same transaction.
+        If the Database is in autocommit mode (isolation_level is None) the transaction is committed
+        afterwards; otherwise, committing is left to the caller as it is for addrow.
+
+        If rowids is True (default), returns the rowids of the rows in the order that they were passed to
+        addmultiple (ergo, if grouping is used, the rowids may not be in ascending order). Where supported by
+        sqlite (3.35.0+), each group is inserted with multi-row "INSERT ... RETURNING" statements of up to
+        constants.REPLACEMENT_LIMIT values each (see AdvancedTable._canreturnrowids); otherwise, each row is
+        inserted individually and its rowid is read from the cursor. If rowids is False, each group is passed
+        to executemany and None is returned.
         """
         if not rows: return
-        if len(rows) == 1:
-            return [self.addrow(**rows[0]),]
-        objs,dicts = list(),list()
-        ## Sort based on processing necessity
-        for i,row in enumerate(rows):
-            if isinstance(row,dict): dicts.append((i,row))
-            else: objs.append((i,row))
-
-        ## Objects need to be parsed into dicts
-        for i,obj in objs:
-            dicts.append((i,self.parseobject(obj)))
-
-        ## Resort by original order
-        dicts = sorted(dicts, key = lambda dic: dic[0])
-
-        ## Grouping is a bit complicated
-        if grouping:
-
-            ## Have to use replacer to ensure all rows have unique placeholders
-            replacer = objects.ReplacementFactory()
-
-            ## Parse out
-            dicts = [(i,self._addrowparser(_replacer = replacer, **row)) for i,row in dicts]
-
-            ## To gather and resort rowids to align with the rows argument order
-            rowids = list()
-
-            ## Grouping Loop
-            while dicts:
-                ## Take the first row to work off of
-                first = dicts.pop(0)
-                index,(groupcolumns,sql,replacement) = first
-                ## Get a list of matching rows (by comparing columns)
-                lookup = [(i,(col,sq,rep)) for i,(col,sq,rep) in dicts if col == groupcolumns]
-                ## Remove matches from results
-                for row in lookup: dicts.remove(row)
-
-                ## Combine rows
-                lookup.insert(0,first)
-                
-                indices, stats = zip(*lookup)
-                insertstrings = []
-                allreplacements = dict()
-
-                for (columns,sql,replacement) in stats:
-                    ## Put all insertion strings in parens
-                    insertstrings.append(f"({sql})")
-                    ## Add replacements to finalized dict
-                    allreplacements.update(replacement)
-                    ## Don't need to do anything with columns, since they should all be the same
-
-                ## Each row will insert groupcolumns- number of replacements,
-                ## which must be split per the REPLACEMENT_LIMIT
-                batchlimiter = constants.REPLACEMENT_LIMIT // len(groupcolumns)
-                ## Batch Insert Strings if necessary
-                while insertstrings:
-                    inserts,insertstrings = insertstrings[:batchlimiter],insertstrings[batchlimiter:]
-                    ## Combine insert strings
-                    insertstring = ", ".join(inserts)
-
-                    ## Note that columns is available from the inner scope (also, that it is only technically the same as columns at the top of the loop)
-                    ## Insert
-                    cursor = self.database.execute(f"""INSERT INTO {self.fullname} ({columns}) VALUES {insertstring};""",allreplacements)
-                
-                    ## Extrapolate rowids
-                    lastrowid = cursor.lastrowid
-                    ## Difference is one less than length because lastrowid includes/is the last row inserted
-                    startrowid = lastrowid - (len(indices) - 1)
-                    ## Conversely, range is non-inclusive on the top end, so need to add one
-                    rowids.extend(list(zip(indices,range(startrowid,lastrowid+1))))
-
-            ## Sort and return rowids only
-            return [rowid for index,rowid in sorted(rowids,key = lambda ind: ind[0])]
-        
-        ## Grouping = False
-        else:
-            ## For output
-            rowids = []
+        if len(rows) == 1 and rowids:
+            row = rows[0]
+            if isinstance(row,dict): return [self.addrow(**row),]
+            return [self.addrow(object = row),]
+
+        runs = self._grouprows(rows, grouping = grouping)
+        output = [None for row in rows] if rowids else None
+
+        returning = rowids and self._canreturnrowids()
+        rowidcolumn = str(self.rowid)
+        with Utilities.transaction(self.database) as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            for columns,group in runs:
+                placeholders = f"""({", ".join("?" for column in columns)})"""
+                query = f"""INSERT INTO {self.fullname} ({", ".join(columns)}) VALUES {placeholders};"""
+                values = (tuple(objects._checkvalue(row[column]) for column in columns) for i,row in group)
+                if not rowids:
+                    cursor.executemany(query,values)
+                    continue
+                if returning and rowidcolumn not in columns:
+                    ## New rowids are assigned in ascending order, but RETURNING does not guarantee the order of its rows
+                    size = max(1,constants.REPLACEMENT_LIMIT // len(columns))
+                    values = list(values)
+                    for start in range(0,len(group),size):
+                        chunk = values[start:start+size]
+                        query = f"""INSERT INTO {self.fullname} ({", ".join(columns)}) VALUES {", ".join(placeholders for value in chunk)} RETURNING {rowidcolumn};"""
+                        results = sorted(result[0] for result in cursor.execute(query,[v for value in chunk for v in value]).fetchall())
+                        for (i,row),rowid in zip(group[start:start+size],results): output[i] = rowid
+                    continue
+                for (i,row),value in zip(group,values):
+                    cursor.execute(query,value)
+                    output[i] = cursor.lastrowid
+
+        if not rowids: return
+        ## Rows inserted individually (grouping = False) return Advanced_RowIDs like addrow
+        if not grouping: return [objects.Advanced_RowID(rowid,self) for rowid in output]
+        return output
 
-            ## Just use addrow
-            for i,row in dicts:
-                ## addrow returns the rowid
-                rowids.append(self.addrow(**row))
+    def _canreturnrowids(self):
+        """ Returns whether addmultiple can insert groups of rows with a single "INSERT ... RETURNING" statement and match the
+            returned rowids to the rows by sorting them.
 
-            ## Rowids should already be in order
-            return rowids
+            This requires sqlite 3.35.0+ and a rowid table in which every inserted row receives a new, ascending rowid:
+            the Table cannot have ON CONFLICT IGNORE constraints or triggers (which could skip or add rows). Groups which
+            supply the rowid themselves are always inserted individually.
+        """
+        if sqlite3.sqlite_version_info < (3,35,0) or not self.rowid or self._norowid: return False
+        constraints = [constraint for column in self._columns.values() for constraint in column.constraints] + list(self._tableconstraints)
+        if any(getattr(constraint,"conflictclause",None) and str(constraint.conflictclause.resolution).upper() == "IGNORE" for constraint in constraints): return False
+        cursor = self.database.cursor()
+        cursor.row_factory = None
+        try:
+            return not cursor.execute("""SELECT 1 FROM sqlite_master WHERE type='trigger' AND tbl_name = ? LIMIT 1;""",(str(self.name),)).fetchone()
+        finally:
+            cursor.close()
+
+    def _grouprows(self, rows, grouping = True):
+        """ Validates the rows for addmultiple and upsert_many and groups them by the columns they declare.
+
+        rows should be dictionaries or objects (which will be parsed using parseobject).
+        If grouping is True, all rows with the same columns are grouped together (groups are ordered by their
+        first row). Otherwise, only consecutive rows with the same columns are grouped.
+        Returns a list of (columns, [(index, row dict), ...]) tuples, where columns is a tuple of column names
+        in the Table's column order and index is the row's index in rows.
+        """
+        ## Lookup for ordering columns (which also works as a validator)
+        order = {column:i for i,column in enumerate(self._columns)}
+        ## Rows will most likely declare their columns in the same order, so the ordered columns are cached
+        columnorders = dict()
+
+        groups = dict()
+        runs = list()
+        for i,row in enumerate(rows):
+            if not isinstance(row,dict): row = self.parseobject(row)
+            key = tuple(row)
+            columns = columnorders.get(key)
+            if columns is None:
+                if not key: raise ValueError("addrow did not receive a row to add.")
+                try: columns = tuple(sorted(key, key = order.__getitem__))
+                except KeyError: raise AttributeError("addrow received an invalid column")
+                columnorders[key] = columns
+            if grouping:
+                group = groups.get(columns)
+                if group is None:
+                    group = groups[columns] = list()
+                    runs.append((columns,group))
+                group.append((i,row))
+            else:
+                ## Only consecutive rows are grouped
+                if runs and runs[-1][0] == columns: runs[-1][1].append((i,row))
+                else: runs.append((columns,[(i,row),]))
+        return runs
 
     def insertmany(self,*args,**kw):
         """ Alias for addmultiple """
         return self.addmultiple(*args,**kw)
 
+    def uniquecolumns(self):
+        """ Returns a list of tuples of column names which are constrained to be unique (by PRIMARY KEY or UNIQUE constraints
+            or by UNIQUE Indexes in the Database).
+
+            Partial Indexes (with a WHERE clause) and Indexes on expressions or with a COLLATE clause are not included, as
+            they cannot be used as an "ON CONFLICT" target by column names alone.
+        """
+        out = list()
+        for name,column in self._columns.items():
+            if any(constraint.constraint in ("PRIMARY KEY","UNIQUE") for constraint in column.constraints):
+                out.append((name,))
+        for constraint in self._tableconstraints:
+            if isinstance(constraint,(objects.UniqueTableConstraint,objects.TablePrimaryKeyConstraint)):
+                out.append(tuple(str(column.name) for column in constraint.columns))
+        for index in Index.getindexes(self.database,self.name):
+            if not index.unique or index.where: continue
+            if any(column.name not in self._columns or column.collation for column in index.columns): continue
+            columns = tuple(column.name for column in index.columns)
+            if columns not in out: out.append(columns)
+        return out
+
+    def upsert_many(self, rows, conflict, update = None, rowids = True):
+        """ Inserts multiple rows into the Table, updating (or ignoring) rows which conflict with existing rows.
+
+        rows should be a list of dictionaries or objects (as with addmultiple).
+        conflict should be a list of column names which are constrained to be unique: either by a column's
+        PRIMARY KEY or UNIQUE constraint or by a Table PRIMARY KEY or UNIQUE constraint (see uniquecolumns).
+        update should be a list of column names. If a row conflicts with an existing row, the existing row's
+        update columns are set to the row's values ("ON CONFLICT ({conflict}) DO UPDATE SET {column} = excluded.{column}").
+        If update is not supplied, conflicting rows are ignored ("ON CONFLICT ({conflict}) DO NOTHING").
+        All rows must supply the conflict and update columns.
+
+        Rows are grouped and inserted like addmultiple (in a single transaction, one statement per group of columns).
+        If rowids is True (default), returns the rowids of the inserted or updated rows in the order that the rows
+        were passed (rows which were ignored have a rowid of None). Each group is then upserted with multi-row
+        statements of up to constants.REPLACEMENT_LIMIT values, after which the rowids of the whole statement are
+        looked up by their conflict columns in a single query; when ignoring rows, the inserted rowids are collected
+        via "RETURNING" (sqlite 3.35.0+). Rows with NULL conflict values, and ignored rows on older versions of sqlite,
+        are upserted individually. If rowids is False, each group is passed to executemany and None is returned.
+        """
+        if isinstance(conflict,str): conflict = [conflict,]
+        if isinstance(update,str): update = [update,]
+        if not conflict or not isinstance(conflict,(list,tuple)):
+            raise ValueError("upsert_many requires a list of conflict columns")
+        if update is None: update = []
+        for column in list(conflict)+list(update):
+            if column not in self._columns: raise AttributeError(f"Column does not exist in table: {column}")
+        if set(conflict) not in [set(columns) for columns in self.uniquecolumns()]:
+            raise ValueError(f"Conflict columns are not constrained to be unique: {', '.join(conflict)}")
+        if rowids and not self.rowid:
+            raise ValueError("Tables WITHOUT ROWID do not have rowids: use rowids = False")
+        rows = list(rows)
+        if not rows: return [] if rowids else None
+
+        runs = self._grouprows(rows)
+
+        returning = sqlite3.sqlite_version_info >= (3,35,0)
+        target = ", ".join(conflict)
+        if update:
+            onconflict = f"""ON CONFLICT ({target}) DO UPDATE SET {", ".join(f"{column} = excluded.{column}" for column in update)}"""
+        else:
+            onconflict = f"""ON CONFLICT ({target}) DO NOTHING"""
+
+        output = [None for row in rows] if rowids else None
+        with Utilities.transaction(self.database) as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            for columns,group in runs:
+                missing = [column for column in list(conflict)+list(update) if column not in columns]
+                if missing: raise ValueError(f"upsert_many rows must supply all conflict and update columns: {', '.join(missing)}")
+                placeholders = f"""({", ".join("?" for column in columns)})"""
+                query = f"""INSERT INTO {self.fullname} ({", ".join(columns)}) VALUES {placeholders} {onconflict}"""
+                values = (tuple(objects._checkvalue(row[column]) for column in columns) for i,row in group)
+                if not rowids:
+                    cursor.executemany(query+";",values)
+                    continue
+                values = list(values)
+                ## Each chunk needs parameters for its values and for the (index, conflict columns) of each row in _upsertlookup
+                size = max(1,constants.REPLACEMENT_LIMIT // (len(columns) + len(conflict) + 1))
+                for start in range(0,len(group),size):
+                    chunk,chunkvalues = group[start:start+size],values[start:start+size]
+                    keys = [[objects._checkvalue(row[column]) for column in conflict] for i,row in chunk]
+                    ## Rows with NULL conflict values never conflict and cannot be looked up, and without RETURNING
+                    ## there is no way to tell which rows were ignored by DO NOTHING
+                    if any(value is None for key in keys for value in key) or (not update and not returning):
+                        self._upsertrows(cursor, query, conflict, chunk, chunkvalues, keys, returning, output)
+                        continue
+                    statement = f"""INSERT INTO {self.fullname} ({", ".join(columns)}) VALUES {", ".join(placeholders for value in chunkvalues)} {onconflict}"""
+                    parameters = [v for value in chunkvalues for v in value]
+                    if update:
+                        cursor.execute(statement+";",parameters)
+                        for (i,row),rowid in zip(chunk,self._upsertlookup(cursor, conflict, keys)): output[i] = rowid
+                        continue
+                    inserted = {result[0] for result in cursor.execute(statement+f" RETURNING {self.rowid};",parameters).fetchall()}
+                    ## Only the first row with a given key can have been inserted: later rows with the same key were ignored
+                    for (i,row),rowid in zip(chunk,self._upsertlookup(cursor, conflict, keys)):
+                        if rowid in inserted:
+                            output[i] = rowid
+                            inserted.remove(rowid)
+        return output
+
+    def _upsertlookup(self, cursor, conflict, keys):
+        """ Returns the rowids of the rows with the given conflict column values (keys) for upsert_many, in the same order as keys.
+
+            All keys are looked up in a single statement which joins the Table to a "VALUES" list of the keys so that
+            sqlite compares them using the conflict columns' own affinity and collation (as "ON CONFLICT" does).
+        """
+        names = [f"key{i}" for i in range(len(conflict))]
+        placeholders = f"""({", ".join("?" for column in range(len(conflict)+1))})"""
+        query = f"""WITH upsert_keys (keyindex, {", ".join(names)}) AS (VALUES {", ".join(placeholders for key in keys)})
+SELECT upsert_keys.keyindex, {self.fullname}.{self.rowid} FROM upsert_keys JOIN {self.fullname}
+ON {" AND ".join(f"{self.fullname}.{column} = upsert_keys.{name}" for column,name in zip(conflict,names))};"""
+        results = dict(cursor.execute(query,[v for i,key in enumerate(keys) for v in [i,]+key]).fetchall())
+        return [results.get(i) for i in range(len(keys))]
+
+    def _upsertrows(self, cursor, query, conflict, group, values, keys, returning, output):
+        """ Upserts each row individually for upsert_many, setting each row's rowid in output """
+        if returning:
+            query += f" RETURNING {self.rowid};"
+            for (i,row),value in zip(group,values):
+                result = cursor.execute(query,value).fetchone()
+                if result: output[i] = result[0]
+            return
+        lookup = f"""SELECT {self.rowid} FROM {self.fullname} WHERE {" AND ".join(f"{column} = ?" for column in conflict)};"""
+        for (i,row),value,key in zip(group,values,keys):
+            cursor.execute(query+";",value)
+            ## Ignored rows do not change the database
+            if not cursor.rowcount: continue
+            result = cursor.execute(lookup,key).fetchone()
+            if result: output[i] = result[0]
+
     def quickupdate(self, *, WHERE = None, **kwargs):
         """ Updates the database with the given values under simple constraints.
 
-        WHERE should be a dictionary with the same options as quickselect.
+        WHERE should be a dictionary with the same options as quickselect or a Q expression.
         All other keyword arguements should be columnname keywords with values appropriate for the Table.
         NOTE! This function currently does not validate any of the selection values; for example:
         quickupdate(column__like = "%") => "WHERE column LIKE %" => UPDATE EVERYTHING!
         """
         if not WHERE and not kwargs: return
-        if WHERE is None: WHERE = dict()
-        elif not isinstance(WHERE,dict): raise ValueError("constriants must be a dict of valid keywords")
+        WHERE = objects.queryfilters(WHERE)
+        large = self._largefilters(WHERE)
+        if large:
+            with self._templists(WHERE, large) as (where, replacementdict, counter):
+                setcolumns,sql = self._updatestatement(where, counter, kwargs)
+                for column,repl in setcolumns:
+                    replacementdict[repl] = objects._checkvalue(kwargs[column])
+                self.database.execute(sql, replacementdict)
+            return
+        shape = objects.queryshape(WHERE)
+        key = ("update",self._definition,self.fullname,shape,tuple(kwargs))
+        cache = self._querycache(WHERE)
+        compiled = cache.get(key) if cache is not None else None
+        if compiled is None:
+            compiled = self._compileupdate(shape,kwargs)
+            if cache is not None: cache.set(key,compiled)
+        where,setcolumns,sql = compiled
+
+        replacementdict = where.bind(WHERE)
+        ## There may not be constraints
+        if where.querystrings:
+            self._adviseindex(WHERE, where.querystring, replacementdict)
+        for column,repl in setcolumns:
+            replacementdict[repl] = objects._checkvalue(kwargs[column])
+
+        self.database.execute(sql, replacementdict)
+
+    def _compileupdate(self, shape, kwargs):
+        """ Validates and compiles a quickupdate statement, returning the CompiledQuery for its WHERE clause, the (column, placeholder) pairs for its SET clause, and its sql """
+        where = objects.compilequery(self.rowid,list(self.columns),shape, rowid = self.rowid, _parser = self._filterparser)
+        setcolumns,sql = self._updatestatement(where.querystring, where.counter, kwargs)
+        return where,setcolumns,sql
+
+    def _updatestatement(self, where, counter, kwargs):
+        """ Validates the SET columns for quickupdate and returns the (column, placeholder) pairs for its SET clause and its sql.
+
+            where is the sql for the WHERE clause (if any) and counter is the ReplacementFactory counter after it was parsed.
+        """
         replacer = objects.ReplacementFactory()
-        selstrings,selreplacements = objects._selectqueryparser(self.rowid,list(self.columns),_replacer = replacer, rowid = self.rowid, **WHERE)
+        replacer.counter = counter
 
         columnnames = list(self._columns)
         for k,v in kwargs.items():
             if k not in columnnames: raise ValueError(f"Table does not have a column: {k}")
 
         setcolumns,setreplacements = self._queryparser(_replacer = replacer, **kwargs)
-        
-        replacementdict = dict()
-        
-        ## There may not be constraints
+
         selectstring = ""
-        if selstrings:
-            selectstring = " AND ".join(selstrings)
-            selectstring = f" WHERE {selectstring}"
-        replacementdict.update(selreplacements)
+        if where:
+            selectstring = f" WHERE {where}"
 
         setstrings = [f"{column} = :{repl}" for column,repl in setcolumns]
         setstring = ", ".join(setstrings)
-        replacementdict.update(setreplacements)
 
-        self.database.execute(f"""UPDATE {self.fullname} SET {setstring}{selectstring};""", replacementdict)
+        return tuple(setcolumns),f"""UPDATE {self.fullname} SET {setstring}{selectstring};"""
 
     def deleteall(self):
         """ Deletes all rows from the Table. Obviously, be very careful with this method. """
         self.database.execute(f""" DELETE FROM {self.fullname};""")
 
-    def quickdelete(self, **kwargs):
+    def quickdelete(self, *expressions, **kwargs):
         """ Deletes rows from the database given certain constraints.
 
         It is an error to call this method without kwargs: use advancedtable.deleteall() instead.
-        Keyword arguments follow the same syntax as quickselect.
+        Arguments follow the same syntax as quickselect (including Q expressions).
         NOTE! This function currently does not validate any of the selection values; for example:
         quickdelete(column__like = "%") => "WHERE column LIKE %" => DELETE EVERYTHING!
         """
+        kwargs = objects.addexpressions(kwargs, expressions)
         if not kwargs: raise TypeError("quickdelete requires valid keyword arguments")
+        large = self._largefilters(kwargs)
+        if large:
+            with self._templists(kwargs, large) as (selectstring, selreplacements, counter):
+                self.database.execute(f"""DELETE FROM {self.fullname} WHERE {selectstring};""",selreplacements)
+            return
         ## Functions off of selectqueryparser
-        selstrings,selreplacements = objects._selectqueryparser(self.rowid,list(self.columns), rowid = self.rowid, **kwargs)
-
-        selectstring = " AND ".join(selstrings)
+        selectstring,selreplacements = self._quickquery(kwargs)
+        self._adviseindex(kwargs, selectstring, selreplacements)
 
         self.database.execute(f"""DELETE FROM {self.fullname} WHERE {selectstring};""",selreplacements)
 
@@ -901,6 +1688,7 @@ class AdvancedTable(Table):
         self._columns.update(col)
         for column in col.values():
             self.database.execute(f""" ALTER TABLE {self.fullname} ADD COLUMN {column.definition}""");
+        self.database.clearschemacache()
 
     def remove(self):
         """ Drops the table from it's database """
@@ -1,7 +1,14 @@
 ## Builtin
+import array
 import functools
+import itertools
+## Third Party
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
-__all__ = ["temp_row_factory","temp_row_decorator","generate_dropcolumn"]
+__all__ = ["temp_row_factory","temp_row_decorator","transaction","templist","iterbatches","ColumnBuffer","generate_dropcolumn"]
 
 class temp_row_factory():
     """ A Context Manager for temporarily changing the row_factory of a connection or AdvancedTable instance
@@ -60,6 +67,190 @@ def temp_row_decorator(row_factory):
         return inner
     return deco
 
+class transaction():
+    """ A Context Manager which ensures that a series of statements are executed in a single transaction.
+
+        If the connection is in autocommit mode (isolation_level is None) and is not already in a transaction,
+        a transaction is started on entering and is committed on exit (or rolled back if an exception was raised).
+        Otherwise, sqlite3 will already have (implicitly) started a transaction and committing is left to the
+        caller, so this context manager does nothing.
+
+        Example Usage:
+            with transaction(mydatabase):
+                mydatabase.execute(" INSERT INTO mytable (myvalue) VALUES (1);")
+                mydatabase.execute(" INSERT INTO mytable (myvalue) VALUES (2);")
+    """
+    def __init__(self,connection):
+        self.connection = connection
+        self.began = False
+
+    def __enter__(self):
+        self.began = self.connection.isolation_level is None and not self.connection.in_transaction
+        if self.began: self.connection.execute("BEGIN;")
+        return self.connection
+
+    def __exit__(self,exc_type,*errors):
+        if not self.began: return
+        self.began = False
+        if exc_type is None: self.connection.commit()
+        else: self.connection.rollback()
+
+class templist():
+    """ A Context Manager which stores a list of values in a temporary table so that the values can be used in
+        "IN (SELECT value FROM ...)" and "NOT IN (SELECT value FROM ...)" statements, which are not limited by the
+        number of placeholders sqlite accepts.
+
+        The temporary table has a single column named "value". Its (schema-qualified) name is returned on entering
+        and the table is dropped on exit. Temporary tables are private to the connection, so they can also be created
+        on connections which are otherwise read-only (i.e.- DatabasePool readers, which use "PRAGMA query_only").
+        The table is created and filled inside of a SAVEPOINT which is released before the name is returned: if the
+        connection was not already in a transaction, the temporary table is committed on its own and the connection is
+        left as it was found. Statements executed inside of the context manager are therefore never committed by it
+        (this is important for generators, where the caller's code runs between yields).
+        Dropping the table on exit does not commit either: if the caller has begun a transaction in the meantime, the
+        table is dropped as part of it.
+
+        Example Usage:
+            with templist(mydatabase, ids) as name:
+                rows = mydatabase.execute(f" SELECT * FROM mytable WHERE id NOT IN (SELECT value FROM {name});").fetchall()
+    """
+    counter = itertools.count(1)
+
+    def __init__(self,connection,values):
+        self.connection = connection
+        self.values = values
+        self.name = None
+
+    def _execute(self,*statements,values = None):
+        """ Executes the sql statements with query_only temporarily disabled (if necessary).
+
+            If values is supplied, it is used to executemany the last statement.
+        """
+        cursor = self.connection.cursor()
+        cursor.row_factory = None
+        queryonly = cursor.execute("PRAGMA query_only;").fetchone()[0]
+        if queryonly: cursor.execute("PRAGMA query_only = OFF;")
+        try:
+            for i,sql in enumerate(statements,start = 1):
+                if values is None or i < len(statements): cursor.execute(sql)
+                else: cursor.executemany(sql,values)
+        finally:
+            if queryonly: cursor.execute("PRAGMA query_only = ON;")
+            cursor.close()
+
+    def __enter__(self):
+        savepoint = f"alcustoms_templist_{next(templist.counter)}"
+        name = f"temp.{savepoint}"
+        self._execute(f"SAVEPOINT {savepoint};")
+        try:
+            self._execute(f"CREATE TABLE {name} (value);", f"INSERT INTO {name} (value) VALUES (?);",
+                          values = ((value,) for value in self.values))
+        except:
+            self._execute(f"ROLLBACK TO {savepoint};", f"RELEASE {savepoint};")
+            raise
+        self._execute(f"RELEASE {savepoint};")
+        self.name = name
+        return self.name
+
+    def __exit__(self,*errors):
+        if self.name is None: return
+        self._execute(f"DROP TABLE IF EXISTS {self.name};")
+        self.name = None
+
+def iterbatches(cursor, batchsize):
+    """ A generator which fetches rows from an executed cursor batchsize rows at a time and yields them individually.
+
+        The cursor is closed once it is exhausted (or when the generator is closed).
+    """
+    try:
+        rows = cursor.fetchmany(batchsize)
+        while rows:
+            yield from rows
+            rows = cursor.fetchmany(batchsize)
+    finally:
+        cursor.close()
+
+class ColumnBuffer():
+    """ A typed buffer which a column of query results is written to in batches (see AdvancedTable.to_columns).
+
+        The buffer's type is determined by the column's affinity (see Column.affinity): INTEGER columns are stored as
+        64-bit integers and REAL and NUMERIC columns as doubles; TEXT and BLOB columns are stored as Python objects.
+        Since sqlite does not enforce column types, the buffer is converted if a value does not fit: integer buffers
+        become doubles if a NULL or a float is written (NULL is stored as NaN), and numeric buffers become objects if
+        any other value is written.
+        If usenumpy is True, the buffer is a numpy array; otherwise integers and doubles are stored in an array.array
+        and objects in a list. size preallocates space for that number of values (the buffer grows as necessary).
+        result() returns the buffer trimmed to the number of values written.
+    """
+    TYPECODES = dict(INTEGER = "q", REAL = "d", NUMERIC = "d")
+    DTYPES = dict(q = "int64", d = "float64")
+
+    def __init__(self, affinity, size = 0, usenumpy = None):
+        if usenumpy is None: usenumpy = numpy is not None
+        elif usenumpy and numpy is None: raise ImportError("numpy is not installed")
+        self.usenumpy = usenumpy
+        ## None is used for objects
+        self.typecode = ColumnBuffer.TYPECODES.get(affinity)
+        self.length = 0
+        self.data = self._allocate(self.typecode, size)
+
+    def _allocate(self, typecode, size):
+        if self.usenumpy:
+            return numpy.empty(size, dtype = ColumnBuffer.DTYPES.get(typecode, object))
+        if typecode is None: return [None,]*size
+        return array.array(typecode, bytes(array.array(typecode).itemsize * size))
+
+    def _convert(self, typecode):
+        """ Converts the buffer (and the values that have already been written) to the given typecode """
+        self.typecode = typecode
+        if self.usenumpy:
+            self.data = self.data.astype(ColumnBuffer.DTYPES.get(typecode, object))
+        elif typecode is None: self.data = list(self.data)
+        else: self.data = array.array(typecode, self.data)
+
+    def _values(self, values):
+        """ Converts values to the buffer's type (converting the buffer if necessary) """
+        if self.typecode is None:
+            if not self.usenumpy: return values
+            output = numpy.empty(len(values), dtype = object)
+            output[:] = values
+            return output
+        if self.usenumpy:
+            output = numpy.array(values)
+            kind = output.dtype.kind
+            if self.typecode == "q" and kind in "iu": return output
+            if kind in "iuf":
+                if self.typecode == "q": self._convert("d")
+                return output
+        else:
+            try: return array.array(self.typecode, values)
+            except (TypeError, OverflowError): pass
+        if all(value is None or isinstance(value,(int,float)) for value in values):
+            self._convert("d")
+            values = [float("nan") if value is None else value for value in values]
+            return numpy.array(values, dtype = "float64") if self.usenumpy else array.array("d", values)
+        self._convert(None)
+        return self._values(values)
+
+    def write(self, values):
+        """ Writes a sequence of values to the end of the buffer """
+        values = self._values(values)
+        end = self.length + len(values)
+        if end > len(self.data):
+            ## Grow the buffer
+            extra = self._allocate(self.typecode, max(end, 2 * len(self.data)) - len(self.data))
+            self.data = numpy.concatenate([self.data, extra]) if self.usenumpy else self.data + extra
+        self.data[self.length:end] = values
+        self.length = end
+
+    def result(self):
+        """ Returns the buffer trimmed to the values which have been written """
+        if self.usenumpy:
+            if self.length == len(self.data): return self.data
+            return self.data[:self.length].copy()
+        del self.data[self.length:]
+        return self.data
+
 def generate_dropcolumn(table,*columns):
     """ Generates a script to emulate the DROP COLUMN (which at the moment is not implemented in sqlite).
    
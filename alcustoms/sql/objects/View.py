@@ -5,14 +5,16 @@ NOTE: THIS MODULE IS STILL *HEAVILY* UNDER DEVELOPMENT AND SHOULD
 """
 
 ## This Module
-from .. import objects
+from .. import constants, objects
 from . import Table
 from sqlite3 import OperationalError
 
 ## Builtin
 from collections import OrderedDict
+import contextlib
+import re
 
-__all__ = []
+__all__ = ["Join","LEFTJOIN","INNERJOIN","CROSSJOIN","LEFTOUTERJOIN",]
 
 def getalltables(conn):
     """ Returns a list of Tables from a Database """
@@ -91,72 +93,329 @@ In the case of duplicate select names (SELECT table1.column1, table2.column1), d
 If not enough colnames are supplied for the select statement, the view will be created, but Selections from it will throw an error.
 """
 
+def _tablename(name):
+    """ Normalizes a table name (string or Identifier) for comparison """
+    if isinstance(name,objects.Identifier): name = name.name
+    name = str(name)
+    if name[:1] in constants.QUOTECHARS: name = objects.Identifier.stripquotes(name)
+    return name.lower()
+
+def getjoincolumns(base, basealias, addition, additionalias):
+    """ Returns a list of ((basealias, column), (additionalias, column)) pairs for each Foreign Key between base and addition.
+
+        Foreign Keys in either Table which reference the other Table are included; Foreign Keys which do not
+        specify a column are paired with the referenced Table's rowid.
+    """
+    pairs = list()
+    for column in addition._columns.values():
+        if not column.isforeignkey: continue
+        ftable,fcolumn = objects.getreference(column)
+        if _tablename(ftable) == _tablename(base.name):
+            pairs.append(((basealias,str(fcolumn) if fcolumn else base.rowid),(additionalias,str(column.name))))
+    for column in base._columns.values():
+        if not column.isforeignkey: continue
+        ftable,fcolumn = objects.getreference(column)
+        if _tablename(ftable) == _tablename(addition.name):
+            pairs.append(((basealias,str(column.name)),(additionalias,str(fcolumn) if fcolumn else addition.rowid)))
+    return pairs
+
 class Join():
+    """ A JOIN between a Table (or Join) and another Table (or Join).
+
+        Joins are normally created via AdvancedTable.join and extended with Join.join:
+            posts.join("users", alias = "author", jointype = "INNER").join("comments", oncolumns = "pid")
+
+        Each Table in the Join is referred to by its name, or by its alias if it was given one (aliases are
+        required to join the same Table more than once). If oncolumns is not supplied, the ON clause is inferred
+        from the Foreign Keys between the Tables: oncolumns can also be the name of a Foreign Key column in order
+        to choose between multiple Foreign Keys.
+        Join.select returns each result row split into the rows of each Table, so that an object graph can be read
+        with a single query.
+    """
     JOINTYPE = "LEFT"
-    def __init__(self, base, addition, jointype = None, oncolumns = None):
-        """ Creates a new Join between two targets """
+    def __init__(self, base, addition, jointype = None, oncolumns = None, alias = None):
+        """ Creates a new Join between two targets.
+
+            base should be a Table or Join. addition should be a Table, Join or, if base belongs to a Database, the name
+            of a table in that Database. alias is an optional alias for addition (if it is a Table).
+            jointype should be one of constants.JOINTYPES (the default is the class's JOINTYPE).
+            oncolumns should be a list of (base column, addition column) pairs, where each column is a column name
+            or "{table name or alias}.{column}", or a string: see Join.
+        """
         if jointype is None: jointype = self.__class__.JOINTYPE
         if not isinstance(base,(Table.Table,Join)):
             raise AttributeError("Base must be Table or Join")
+        if isinstance(addition,str):
+            if base.database is None: raise AttributeError("Addition can only be a table name if base belongs to a Database")
+            addition = base.database.getadvancedtable(addition)
         if not isinstance(addition,(Table.Table,Join)):
             raise AttributeError("Addition must be Table or Join")
-        if not isinstance(jointype,str) or not jointype.upper() in JOINTYPES:
+        if not isinstance(jointype,str) or not jointype.upper() in constants.JOINTYPES:
             raise AttributeError("Join Type must be one of the acceptable join types.")
+        if alias is not None and (not isinstance(alias,str) or isinstance(addition,Join)):
+            raise AttributeError("alias should be a string and can only be used when addition is a Table")
         self.base = base
         self.addition = addition
-        self.jointype = jointype
-        if "NATURAL" in jointype and not oncolumns is None:
+        self.jointype = jointype.upper()
+        self.alias = alias
+
+        basetables,additiontables = self._tables(base),self._tables(addition,alias)
+        duplicates = set(map(str.lower,basetables)) & set(map(str.lower,additiontables))
+        if duplicates:
+            raise ValueError(f"Tables in a Join must have unique names (use alias): {', '.join(sorted(duplicates))}")
+
+        if "NATURAL" in self.jointype and not oncolumns is None:
             raise ValueError("If Jointype is Natural, oncolumns cannot be declared")
         self.oncolumns = list()
-        if oncolumns:
-            if not isinstance(oncolumns,(list,tuple)) or any(not isinstance(pair,(list,tuple)) for pair in columns) or any(len(pair) != 2 for pair in columns):
-                raise AttributeError("oncolumns must be a list of length-2 lists")
-            for (column1,column2) in oncolumns:
-                if not self.base.hascolumn(column1) or not self.addition.hascolumn(column2):
-                    raise AttributeError("oncolumns must be columns in base and addition")
-                self.oncolumns.append([column1,column2])
-        else:
-            allcols1 = base.columns.values()
-            allcols2 = addition.columns.values()
-            for col in allcols2:
-                if col.isforeignkey:
-                    foreigncon = col.getforeignkeys()
-                    for constraint in foreigncon:
-                        pass
+        if "NATURAL" in self.jointype or (self.jointype == "CROSS" and oncolumns is None): return
+        if oncolumns is None or isinstance(oncolumns,str):
+            pairs = [pair for balias,btable in basetables.items() for aalias,atable in additiontables.items() for pair in getjoincolumns(btable,balias,atable,aalias)]
+            if isinstance(oncolumns,str):
+                pairs = [pair for pair in pairs if oncolumns in (pair[0][1],pair[1][1])]
+            if not pairs:
+                raise AttributeError("Could not determine which columns to join on: oncolumns must be supplied")
+            if len(pairs) > 1:
+                raise ValueError(f"Multiple Foreign Keys could be used to join the tables: oncolumns must be supplied ({', '.join(f'{a}.{b} = {c}.{d}' for (a,b),(c,d) in pairs)})")
+            (balias,bcolumn),(aalias,acolumn) = pairs[0]
+            self.oncolumns.append([f"{balias}.{bcolumn}",f"{aalias}.{acolumn}"])
+            return
+        if not isinstance(oncolumns,(list,tuple)) or any(not isinstance(pair,(list,tuple)) for pair in oncolumns) or any(len(pair) != 2 for pair in oncolumns):
+            raise AttributeError("oncolumns must be a list of length-2 lists")
+        for (column1,column2) in oncolumns:
+            self.oncolumns.append([self._resolvecolumn(basetables,column1),self._resolvecolumn(additiontables,column2)])
+
+    @staticmethod
+    def _tables(target, alias = None):
+        """ Returns an OrderedDict of {name or alias: Table} for a Table or Join """
+        if isinstance(target,Join): return target.tables
+        return OrderedDict([(alias or target.name,target),])
+
+    @staticmethod
+    def _resolvecolumn(tables, column):
+        """ Returns the qualified name ("{alias}.{column}") of the given column in the given tables (see Join._tables).
+
+            column can be a Column, a column name (which must be unique among the tables) or "{alias}.{column}".
+            Raises an AttributeError if the column cannot be found.
+        """
+        column = str(column.name) if isinstance(column,objects.Column) else str(column)
+        if "." in column:
+            alias,name = column.split(".",1)
+            for key,table in tables.items():
+                if key.lower() == alias.lower() and (name in table._columns or name in ("rowid",table.rowid)):
+                    return f"{key}.{name}"
+            raise AttributeError(f"Column does not exist in Join: {column}")
+        found = [key for key,table in tables.items() if column in table._columns]
+        if not found: raise AttributeError(f"Column does not exist in Join: {column}")
+        if len(found) > 1: raise AttributeError(f"Column is ambiguous (prefix it with a table name): {column}")
+        return f"{found[0]}.{column}"
+
+    @property
+    def tables(self):
+        """ An OrderedDict of {name or alias: Table} for all Tables in the Join """
+        tables = self._tables(self.base)
+        tables.update(self._tables(self.addition,self.alias))
+        return tables
+
+    @property
+    def database(self):
+        return self.base.database
 
     @property
     def columns(self):
-        cols = OrderedDict()
-        cols.update(self.base.columns)
-        cols.update(self.addition.columns)
-        return cols
+        """ An OrderedDict of {"{alias}.{column}": Column} for all columns in the Join """
+        return OrderedDict((f"{alias}.{name}",column) for alias,table in self.tables.items() for name,column in table._columns.items())
 
     def hascolumn(self,column):
         """ Checks if either of the tables/joins that make up this join include the given column """
-        column = checkcolumn(column)
-        return self.base.hascolumn(column) or self.addition.hascolumn(column)
+        try: self._resolvecolumn(self.tables,column)
+        except AttributeError: return False
+        return True
+
+    def join(self, addition, jointype = None, oncolumns = None, alias = None):
+        """ Returns a new Join between this Join and addition (see Join) """
+        return Join(self, addition, jointype = jointype, oncolumns = oncolumns, alias = alias)
+
+    @staticmethod
+    def _targetsql(target, alias = None):
+        if isinstance(target,Join): return f"({target.sql()})"
+        if alias and alias != target.name: return f"{target.fullname} AS {alias}"
+        return target.fullname
 
     def additionsql(self):
         """ Returns the SQL representing this Join's additions' JOIN statement """
         cols = ""
         if self.oncolumns:
             cols = " ON " + " AND ".join(" = ".join(cols) for cols in self.oncolumns)
-        if isinstance(addition,Table.Table):
-            addition = addition.fullname
-        else:
-            addition = f"({addition.sql()})"
-        return f"{self.jointype} {addition}{cols}"
+        jointype = f"{self.jointype} " if self.jointype else ""
+        return f"{jointype}JOIN {self._targetsql(self.addition,self.alias)}{cols}"
     
     def sql(self):
         """ Returns the SQL representation of the entirety of this Join """
-        addition = self.additionsql()
-        if isinstance(self.base,Table.Table):
-            base = self.base.fullname
+        ## Joins are evaluated left-to-right, so a base Join does not need to be parenthesized
+        base = self.base.sql() if isinstance(self.base,Join) else self._targetsql(self.base)
+        return f"{base} {self.additionsql()}"
+
+    def _layout(self, columns = None):
+        """ Returns a list of (alias, table, columns) for each table which has selected columns.
+
+            columns should be None (all columns) or a list of column names, "{alias}.{column}" or "{alias}.*" strings.
+            The table's rowid is always the first column (if the table has one).
+        """
+        tables = self.tables
+        selected = OrderedDict((alias,list()) for alias in tables)
+        if columns is None:
+            for alias,table in tables.items(): selected[alias].extend(table._columns)
         else:
-            base = f"({self.base.sql()})"
-        return f"{base} {addition}"
-            
+            if not isinstance(columns,(list,tuple)): raise ValueError("If supplied, columns must be a list of column names as strings.")
+            for column in columns:
+                if isinstance(column,str) and column.endswith(".*"):
+                    alias = column[:-2]
+                    matches = [key for key in tables if key.lower() == alias.lower()]
+                    if not matches: raise AttributeError(f"Table does not exist in Join: {alias}")
+                    selected[matches[0]].extend(tables[matches[0]]._columns)
+                    continue
+                alias,name = self._resolvecolumn(tables,column).split(".",1)
+                selected[alias].append(name)
+        layout = list()
+        for alias,names in selected.items():
+            if not names: continue
+            table = tables[alias]
+            names = list(OrderedDict.fromkeys(names))
+            if table.rowid and table.rowid in names: names.remove(table.rowid)
+            if table.rowid: names.insert(0,table.rowid)
+            layout.append((alias,table,names))
+        return layout
+
+    def _splitfilters(self, kw):
+        """ Assigns each of the given quickselect-style keywords to a table in the Join and returns an OrderedDict of {alias: keywords}.
+
+            Keywords for the base table can use its column names directly (e.g.- "name__like"); keywords for any table can
+            be prefixed with the table's name or alias (e.g.- "author__name__like"). Q expressions stored by objects.addexpressions
+            filter the base table and Q expressions passed as the name or alias of a table filter that table.
+        """
+        tables = self.tables
+        base = next(iter(tables))
+        filters = OrderedDict()
+        for k,v in kw.items():
+            alias,key = base,k
+            if isinstance(v,objects.Q):
+                match = [name for name in tables if name.lower() == k.lower()]
+                if match: alias = match[0]
+            else:
+                prefix,_,rest = k.partition("__")
+                match = [name for name in tables if name.lower() == prefix.lower()]
+                if rest and match:
+                    column = objects.UNDERSCORERE.search(rest).group("column")
+                    if column == "pk" or column in tables[match[0]]._columns or column not in tables[base]._columns:
+                        alias,key = match[0],rest
+            filters.setdefault(alias,OrderedDict())[key] = v
+        return filters
+
+    @staticmethod
+    def _issimplefilter(table, kw):
+        """ Returns whether the keywords for a table in the Join can be compiled directly against the table's alias.
+
+            Q expressions, keywords which traverse Foreign Keys and in/notin lists which exceed constants.REPLACEMENT_LIMIT
+            are instead compiled by the table's quick-query machinery (see Join._queryparser).
+        """
+        if any(isinstance(v,objects.Q) or objects.istraversal(table,k) for k,v in kw.items()): return False
+        return not isinstance(table,Table.AdvancedTable) or table._largefilters(kw) is None
+
+    def _queryparser(self, kw, stack, _replacer = None):
+        """ Parses quickselect-style keywords for the Join (see Join._splitfilters) and returns the querystrings and replacements.
+
+            Simple keywords are compiled against the table's alias. Otherwise the table's keywords are compiled the same
+            way that AdvancedTable.quickselect would compile them and the table is filtered with
+            "{alias}.{rowid} IN (SELECT {rowid} FROM {table} WHERE ...)": this requires an AdvancedTable with a rowid.
+            stack is a contextlib.ExitStack which holds any temporary tables (see AdvancedTable._templists) until the query has run.
+        """
+        if _replacer is None: _replacer = objects.ReplacementFactory()
+        tables = self.tables
+        querystrings,replacementdict = list(),dict()
+        for i,(alias,filters) in enumerate(self._splitfilters(kw).items()):
+            table = tables[alias]
+            if not self._issimplefilter(table,filters):
+                if not isinstance(table,Table.AdvancedTable) or not table.rowid:
+                    raise ValueError(f"Q expressions, Foreign Key traversal and large in/notin lists require an AdvancedTable with a rowid: {alias}")
+                querystring,replacements = stack.enter_context(table._filterquery(filters))
+                ## Each table's replacements are numbered independently, so they are prefixed to keep them unique
+                if replacements:
+                    querystring = re.sub(":("+"|".join(map(re.escape,replacements))+r")\b",lambda match: f":join{i}_{match.group(1)}",querystring)
+                    replacementdict.update((f"join{i}_{k}",v) for k,v in replacements.items())
+                querystrings.append(f"{alias}.{table.rowid} IN (SELECT {table.rowid} FROM {table.fullname} WHERE {querystring})")
+                continue
+            for key,v in filters.items():
+                research = objects.UNDERSCORERE.search(key)
+                column,option = research.group("column"),research.group("option")
+                if column == "pk": column = table.rowid
+                if column not in table._columns and column != "rowid":
+                    raise ValueError(f"Given column is not a column of {alias}: {column}")
+                qualified = f"{alias}.{column}"
+                if option: qualified += f"__{option}"
+                qs,replacements = objects._selectqueryparser(None,[f"{alias}.{column}",], _replacer = _replacer, **{qualified:v})
+                querystrings.extend(qs)
+                replacementdict.update(replacements)
+        return querystrings,replacementdict
+
+    @staticmethod
+    def _rowbuilder(table):
+        """ Returns the AdvancedRow class (or subclass) which the table's row_factory creates, or None if the table's rows should be dicts """
+        factory = table.row_factory
+        if not isinstance(table,Table.AdvancedTable) or not isinstance(factory,objects.AdvancedRow_Factory): return None
+        if isinstance(factory._class,type) and issubclass(factory._class,objects.AdvancedRow): return factory._class
+        return None
 
+    def select(self, *expressions, columns = None, limit = False, distinct = False, **kw):
+        """ Selects rows from the Join and returns a QueryResult with a dict of {alias: row} for each result row.
+
+            columns is an optional list of columns to select (see Join._layout); tables without any selected columns
+            are not included in the results. Each table's rowid is always selected.
+            Keyword arguments are filters which use the same syntax as quickselect (including Foreign Key traversal and
+            large in/notin lists); prefix a column with its table's name or alias to filter on a joined table
+            (e.g.- author__name__like = "J%"). Positional Q expressions filter the base table; pass a Q expression as the
+            name or alias of a joined table to filter that table (e.g.- author = Q(fname = "Jane") | Q(fname = "John")).
+            Each table's row is created by the table's row_factory if it is an AdvancedRow_Factory of AdvancedRows (or a
+            subclass, such as graphdb.Node) and is a dict otherwise.
+            If a LEFT JOIN did not match a row, the table's row is None.
+        """
+        if self.database is None: raise AttributeError("Join's tables do not belong to a Database")
+        kw = objects.addexpressions(kw, expressions)
+        layout = self._layout(columns)
+        selects = [f"{alias}.{name}" for alias,table,names in layout for name in names]
+        lim = ""
+        if limit:
+            if not isinstance(limit,int): raise ValueError("Limit should be an integer")
+            lim = f" LIMIT {limit}"
+        dist = " DISTINCT" if distinct else ""
+
+        with contextlib.ExitStack() as stack:
+            querystrings,replacementdict = self._queryparser(kw, stack)
+            where = f" WHERE {' AND '.join(querystrings)}" if querystrings else ""
+            cursor = self.database.cursor()
+            cursor.row_factory = None
+            try:
+                rows = cursor.execute(f"""SELECT{dist} {", ".join(selects)} FROM {self.sql()}{where}{lim};""",replacementdict).fetchall()
+            finally:
+                cursor.close()
+
+        builders,start = list(),0
+        for alias,table,names in layout:
+            builders.append((alias,table,self._rowbuilder(table),start,start+len(names),OrderedDict((name,i) for i,name in enumerate(names)),bool(table.rowid)))
+            start += len(names)
+        output = objects.QueryResult()
+        for row in rows:
+            result = dict()
+            for alias,table,builder,start,end,index,haskey in builders:
+                values = row[start:end]
+                ## A LEFT JOIN which did not match (the rowid can only be NULL in that case)
+                if (values[0] is None) if haskey else all(value is None for value in values):
+                    result[alias] = None
+                elif builder is not None:
+                    result[alias] = builder(table,cursor,values,columnindex = index)
+                else:
+                    result[alias] = dict(zip(index,values))
+            output.append(result)
+        return output
 
 class LEFTJOIN(Join): JOINTYPE = "LEFT"
 class RIGHTJOIN(Join): JOINTYPE = "RIGHT"
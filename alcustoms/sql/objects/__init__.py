@@ -1,9 +1,10 @@
 
 ## Builtin
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
 import functools
 import re
 import string
+import threading
 import warnings
 
 from sqlite3 import Row
@@ -13,7 +14,7 @@ from alcustoms.methods import isiterable
 ## This Module
 from alcustoms.sql.constants import *
 
-__all__ = ["QueryResult","dict_factory","object_to_factory","SQLColumn","AdvancedRow","advancedrow_factory","Advanced_RowID","Comment","MultilineComment","ColumnReference","Column","AdvancedColumn",]
+__all__ = ["QueryResult","Page","Q","dict_factory","namedtuple_factory","object_to_factory","SQLColumn","getcolumnindex","getreference","AdvancedRow","advancedrow_factory","Advanced_RowID","Comment","MultilineComment","ColumnReference","Column","AdvancedColumn",]
 
 """ To enable parsing, set PARSER at the module-level (PARSER is set automatically to .NewParser.Parser """
 PARSER = None
@@ -112,7 +113,7 @@ def _checkvalue(v):
     ## Convert AdvancedRow to row's pk
     if isinstance(v,AdvancedRow):
         ## .pk should be a Identifier, so have to cast it to str
-        v = v.row[str(v.table.pk)]
+        v = v._getvalue(str(v.table.pk))
     return v
 
 UNDERSCORERE = re.compile("""(?P<column>(?:(?!__).)+)(?:__(?P<option>.*))?""")
@@ -214,9 +215,282 @@ def _selectqueryparser(primarykey, columnnames,*, _replacer = None, UNDERSCORERE
         ## 
         return querystrings, replacementdict
 
-AUNDERSCORERE = re.compile("""(?P<traversal>(?P<parent>[a-zA-Z0-9]+)_(?P<child>[a-zA-Z0-9]+))|(?P<operation>(?P<column>[a-zA-Z0-9]+)__(?P<operator>[a-zA-Z0-9]+))""",re.IGNORECASE)
-def _advancedqueryparser(table, replacer = None, **kw):
-    """ New Version of _selectqueryparser """
+class QueryCache():
+    """ A thread-safe Least-Recently-Used cache of compiled queries (see CompiledQuery and AdvancedTable._compiledquery) """
+    def __init__(self, maxsize = QUERYCACHE_SIZE):
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self,key):
+        """ Returns the cached value for key, or None if it is not cached """
+        with self.lock:
+            value = self.cache.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self,key,value):
+        """ Caches the value for key, removing the least-recently-used value if the cache is full """
+        with self.lock:
+            self.cache[key] = value
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.maxsize:
+                self.cache.popitem(last = False)
+
+    def clear(self):
+        """ Empties the cache """
+        with self.lock:
+            self.cache.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self.cache)
+
+QUERYCACHE = QueryCache()
+
+class Q():
+    """ A composable quick-query expression.
+
+        Q accepts the same keywords as quickselect, which are AND-joined. Q objects can be combined with "|" (OR) and
+        "&" (AND) and negated with "~" (NOT), and are passed as positional arguments to the quick-query methods (or as
+        the WHERE argument of the methods which accept one). The expression is compiled into the statement's WHERE clause
+        (AND-joined with any other keywords), so the result is a single query.
+        Example:
+            advtable.quickselect(Q(name = "Hello") | ~Q(value__lt = 2), value__ne = None)
+            ## > "WHERE ((name = :rep1) OR (NOT (value < :rep2))) AND value IS NOT NULL"
+        Note that, like sql, NOT does not match NULL values: ~Q(value = 1) does not return rows where value is NULL.
+    """
+    AND = "AND"
+    OR = "OR"
+
+    def __init__(self, *expressions, **kw):
+        for expression in expressions:
+            if not isinstance(expression,Q): raise TypeError("Q positional arguments should be Q objects")
+        self.children = list(expressions) + list(kw.items())
+        self.connector = Q.AND
+        self.negated = False
+
+    def _new(self, children, connector, negated = False):
+        q = Q()
+        q.children = children
+        q.connector = connector
+        q.negated = negated
+        return q
+
+    def _combine(self, other, connector):
+        if not isinstance(other,Q): return NotImplemented
+        children = list()
+        for q in (self,other):
+            ## Flatten expressions which use the same connector
+            if q.connector == connector and not q.negated: children.extend(q.children)
+            else: children.append(q)
+        return self._new(children, connector)
+
+    def __and__(self, other):
+        return self._combine(other, Q.AND)
+
+    def __or__(self, other):
+        return self._combine(other, Q.OR)
+
+    def __invert__(self):
+        return self._new(list(self.children), self.connector, not self.negated)
+
+    def leaves(self):
+        """ Yields the (keyword, value) pairs in the expression (depth-first) """
+        for child in self.children:
+            if isinstance(child,Q): yield from child.leaves()
+            else: yield child
+
+    def shape(self):
+        """ Returns a hashable representation of the expression (see queryshape) """
+        return (self.connector, self.negated, tuple(child.shape() if isinstance(child,Q) else (child[0],_valuekind(child[1])) for child in self.children))
+
+    def __repr__(self):
+        children = ", ".join(repr(child) if isinstance(child,Q) else f"{child[0]}={child[1]!r}" for child in self.children)
+        return f"{'~' if self.negated else ''}Q<{self.connector}>({children})"
+
+def addexpressions(kw, expressions):
+    """ Adds Q expressions to a dict of quick-query keywords.
+
+        Expressions are stored under keys which cannot be keyword arguments and are recognized by their values.
+        Returns kw if there are no expressions, otherwise a new dict.
+    """
+    if not expressions: return kw
+    for expression in expressions:
+        if not isinstance(expression,Q): raise TypeError("Quick-query positional arguments should be Q objects")
+    return dict(kw, **{f"(Q{i})":expression for i,expression in enumerate(expressions)})
+
+def queryfilters(where):
+    """ Converts the WHERE argument of the quick-query methods which accept one (a dict of keywords, a Q expression, or None) into a dict of keywords """
+    if where is None: return dict()
+    if isinstance(where,Q): return addexpressions(dict(),(where,))
+    if not isinstance(where,dict): raise ValueError("WHERE must be a dict of valid keywords or a Q expression")
+    return where
+
+def queryleaves(kw):
+    """ Yields the (keyword, value) pairs of a dict of quick-query keywords, including those of any Q expressions in it """
+    for k,v in kw.items():
+        if isinstance(v,Q): yield from v.leaves()
+        else: yield k,v
+
+def _valuekind(v):
+    """ Returns the kind of a quick-query value for queryshape """
+    v = _checkvalue(v)
+    if v is None: return None
+    if isinstance(v,(list,tuple)): return len(v)
+    return True
+
+def queryshape(kw):
+    """ Returns a hashable representation of a set of quick-query keywords which determines the sql generated by _selectqueryparser.
+
+        The shape consists of each keyword (in order) and the kind of its value: None (which produces "IS [NOT] NULL"),
+        the length of a list or tuple (which determines the number of "IN" placeholders), or True for any other value.
+        The kind of a Q expression is its own shape (see Q.shape).
+    """
+    return tuple((k,v.shape() if isinstance(v,Q) else _valuekind(v)) for k,v in kw.items())
+
+class CompiledQuery():
+    """ The sql generated by _selectqueryparser for a query shape (see queryshape) and the placeholder names used by each keyword.
+
+        bind() creates the replacement dict for a new set of keywords with the same shape without parsing them again.
+        counter is the value of the ReplacementFactory after the query was compiled (so that subsequent placeholders
+        are named identically).
+    """
+    __slots__ = ("querystrings","querystring","binders","counter")
+    PLAIN,LIKEANY,LIST,EXPRESSION = range(4)
+
+    def __init__(self, querystrings, binders, counter):
+        self.querystrings = querystrings
+        self.querystring = " AND ".join(querystrings)
+        self.binders = binders
+        self.counter = counter
+
+    def bind(self,kw):
+        """ Returns the replacement dict for the given keywords (which should have the same shape as the compiled query) """
+        replacementdict = dict()
+        for k,names,mode in self.binders:
+            if not names: continue
+            if mode == CompiledQuery.EXPRESSION:
+                ## names is a tuple of (names, mode) for each of the expression's leaves
+                for (leafnames,leafmode),(leaf,v) in zip(names,kw[k].leaves()):
+                    if leafnames: self._bind(replacementdict,leafnames,leafmode,v)
+            else:
+                self._bind(replacementdict,names,mode,kw[k])
+        return replacementdict
+
+    def _bind(self, replacementdict, names, mode, v):
+        if mode == CompiledQuery.LIST:
+            replacementdict.update(zip(names,v))
+            return
+        v = _checkvalue(v)
+        if mode == CompiledQuery.LIKEANY: v = f"%{v}%"
+        replacementdict[names[0]] = v
+
+def compilequery(primarykey, columnnames, shape, *, _replacer = None, rowid = "rowid", _parser = None):
+    """ Compiles the given query shape (see queryshape) via _selectqueryparser and returns a CompiledQuery.
+
+        Each keyword is parsed with a placeholder value of the appropriate kind using a shared ReplacementFactory,
+        so the resulting sql is identical to the sql _selectqueryparser produces for the same keywords.
+        _parser can be supplied to use a different parser with the same signature as _advancedqueryparser (without
+        the table argument, e.g.- AdvancedTable._filterparser); primarykey and columnnames are then ignored.
+        Raises the same errors as the parser.
+    """
+    if _replacer is None: _replacer = ReplacementFactory()
+    if _parser is None:
+        _parser = lambda _replacer, **kw: _selectqueryparser(primarykey,columnnames, _replacer = _replacer, rowid = rowid, **kw)
+    querystrings,binders = list(),list()
+    for k,kind in shape:
+        if isinstance(kind,tuple):
+            q,names = _compileexpression(kind, _parser, _replacer)
+            querystrings.append(f"({q})")
+            binders.append((k,names,CompiledQuery.EXPRESSION))
+            continue
+        qs,names,mode = _compilekeyword(k, kind, _parser, _replacer)
+        querystrings.extend(qs)
+        binders.append((k,names,mode))
+    return CompiledQuery(querystrings,tuple(binders),_replacer.counter)
+
+def _compilekeyword(k, kind, _parser, _replacer):
+    """ Parses a single keyword with a placeholder value of the given kind for compilequery and returns its sql strings, placeholder names, and CompiledQuery mode """
+    if kind is None: v = None
+    elif kind is True: v = 0
+    else: v = [0,]*kind
+    qs,replacements = _parser(_replacer = _replacer, **{k:v})
+    option = splitquery(k)[1]
+    if option in ("in","notin"): mode = CompiledQuery.LIST
+    elif option == "likeany": mode = CompiledQuery.LIKEANY
+    else: mode = CompiledQuery.PLAIN
+    return qs,tuple(replacements),mode
+
+def _compileexpression(shape, _parser, _replacer):
+    """ Compiles the shape of a Q expression (see Q.shape) for compilequery.
+
+        Returns the expression's sql and a tuple of (placeholder names, mode) for each of its leaves (in the order of Q.leaves).
+    """
+    connector,negated,children = shape
+    parts,names = list(),list()
+    for child in children:
+        if len(child) == 3:
+            q,childnames = _compileexpression(child, _parser, _replacer)
+            parts.append(q)
+            names.extend(childnames)
+        else:
+            qs,replacements,mode = _compilekeyword(*child, _parser, _replacer)
+            parts.append(" AND ".join(qs))
+            names.append((replacements,mode))
+    if not parts:
+        ## Empty expressions match everything (or nothing, if they are negated)
+        q = "1" if connector == Q.AND else "0"
+    elif len(parts) == 1: q = parts[0]
+    else: q = f" {connector} ".join(f"({part})" for part in parts)
+    if negated: q = f"NOT ({q})"
+    return q,tuple(names)
+
+## Options accepted by _selectqueryparser
+QUERYOPTIONS = ("like","likeany","eq","ne","lt","lte","gt","gte","in","notin")
+
+def splitquery(key):
+    """ Splits a quick-query keyword into its path of column names and its option.
+
+        Example:
+            splitquery("author__country__name__like")
+            ## > (["author","country","name"], "like")
+            splitquery("name")
+            ## > (["name"], None)
+    """
+    path = key.split("__")
+    option = None
+    if len(path) > 1 and path[-1] in QUERYOPTIONS: option = path.pop()
+    return path,option
+
+def istraversal(table, key):
+    """ Returns whether the given quick-query keyword traverses one of the table's Foreign Keys (see _advancedqueryparser) """
+    if "__" not in key: return False
+    path,option = splitquery(key)
+    if len(path) < 2: return False
+    column = table._columns.get(path[0])
+    return column is not None and column.isforeignkey
+
+def _advancedqueryparser(table, _replacer = None, **kw):
+    """ An extension of _selectqueryparser which supports traversing Foreign Keys.
+
+        In addition to the syntax accepted by _selectqueryparser, the first column of a keyword can be a Foreign Key
+        column of table followed by a column of the referenced table (which can itself be a Foreign Key), ending with
+        an optional option. For example, if posts.author references users and users.country references countries:
+            posts.quickselect(author__country__name = "Italy")
+        is equivalent to:
+            "WHERE author IN (SELECT userid FROM users WHERE country IN (SELECT countryid FROM countries WHERE name = :rep1))"
+        The "IN" subqueries are semi-joins: each row is returned at most once, and the statement remains a single-table
+        statement, so the same keywords can be used with quickupdate and quickdelete.
+        The referenced tables are retrieved from the table's Database.
+        Returns a list of sql strings with placeholders and a dictionary to use with those placeholders, like _selectqueryparser.
+    """
     if not isinstance(table,Table.AdvancedTable):
         raise ValueError("AdvancedTable object required")
 
@@ -226,70 +500,41 @@ def _advancedqueryparser(table, replacer = None, **kw):
     if _replacer is None: _replacer = ReplacementFactory()
 
     for k,v in kw.items():
-        qstring,rdict = _advancedparsequery(table = table, query = k, value = v, _replacer = _replacer)
-        querystrings.append(qstring)
-        replacementdict.update(rdict)
+        if istraversal(table,k):
+            qs,replacements = _traversalquery(table,k,v,_replacer)
+        else:
+            qs,replacements = _selectqueryparser(table.rowid, list(table._columns), _replacer = _replacer, rowid = table.rowid, **{k:v})
+        querystrings.extend(qs)
+        replacementdict.update(replacements)
         ## _replacer obviously does not need to be manually updated since it's the same object
 
     return querystrings, replacementdict
 
-def _advancedparserquery(table, query,value,_replacer):
-    research = UNDERSCORERE.search(query)
-    if not research: raise ValueError("Could not process quicksearch")
-
-    column = research.group("column")
-
-    if not column: raise ValueError("quicksearch could not determine column.")
-    if column not in columnnames:
-        if column != "pk":
-            raise ValueError("Given column is not a column of this table.")
-        column = primarykey
-
-    replacement = None
-
-    ## Determine operator
-    ## q is for custom output strings if needed (otherwise everything else is handled uniformly)
-    ## replacement is for custom replacements
-    q = None
-    option = research.group("option")
-
-    if not option:
-        operator = "="
-    elif option in ("like","likeany"):
-        operator = "LIKE"
-        if option == "likeany":
-            ## format replacement value
-            v = f"%{v}%"
-    elif option in ("eq","ne","lt","lte","gt","gte"):
-        operator = OPERATORLOOKUP[option]
-    elif option in ("in","notin"):
-        if option == "in": operator = "IN"
-        else: operator = "NOT IN"
-        if not isinstance(v,(list,tuple)): raise ValueError("in/notin options require List or Tuple values")
-        ## have to Craft custom placeholders and query string
-        placeholders = []
-        for item in v:
-            subreplace = _replacer.next()
-            replacementdict[subreplace] = item
-            placeholders.append(f":{subreplace}")
-        placeholders = ",".join(placeholders)
-        replacement = f'({placeholders})'
-    else:
-        raise NotImplementedError("No other quicksearch options have been implemented yet")
-
-    if replacement is None:
-        repl = _replacer.next()
-        replacementdict[repl] = v
-        replacement = f":{repl}"
+def traversal(table, key):
+    """ Follows the Foreign Keys at the start of a quick-query keyword which traverses them (see _advancedqueryparser).
 
-    if q is None:
-        q = f"{column} {operator} {replacement}"
-
-    ## Output
-    querystrings.append(q)
-
-    ## 
-    return querystrings, replacementdict
+        Returns the sql which precedes and follows the filter on the final table, the final AdvancedTable, and the remainder of the keyword.
+        Example (comments.pid references posts and posts.userid references users):
+            traversal(comments, "pid__userid__fname__like")
+            ## > ("pid IN (SELECT postid FROM posts WHERE userid IN (SELECT userid FROM users WHERE ", "))", users, "fname__like")
+    """
+    prefix,suffix = "",""
+    while istraversal(table,key):
+        column,key = key.split("__",1)
+        if table.database is None: raise ValueError("Traversing Foreign Keys requires the Table's Database")
+        ftable,fcolumn = getreference(table._columns[column])
+        ftable = table.database.getadvancedtable(ftable)
+        fcolumn = str(fcolumn) if fcolumn else ftable.rowid
+        prefix += f"{column} IN (SELECT {fcolumn} FROM {ftable.fullname} WHERE "
+        suffix += ")"
+        table = ftable
+    return prefix,suffix,table,key
+
+def _traversalquery(table, key, value, _replacer):
+    """ Compiles a keyword which traverses one of table's Foreign Keys (see _advancedqueryparser) into "IN" subqueries """
+    prefix,suffix,table,key = traversal(table,key)
+    qs,replacements = _selectqueryparser(table.rowid, list(table._columns), _replacer = _replacer, rowid = table.rowid, **{key:value})
+    return [prefix+qs[0]+suffix,], replacements
 
 
 class QueryResult(list):
@@ -303,6 +548,17 @@ class QueryResult(list):
         if not self: return None
         return self[-1]
 
+class Page(QueryResult):
+    """ A QueryResult returned by AdvancedTable.paginate.
+
+        after is the value to pass as paginate's after argument in order to retrieve the next page (None if the page is empty)
+        and hasmore indicates whether there are any rows after this page.
+    """
+    def __init__(self, rows = (), after = None, hasmore = False):
+        super().__init__(rows)
+        self.after = after
+        self.hasmore = hasmore
+
 #########################################################################
 """                           ROW FACTORIES                           """
 #########################################################################
@@ -314,6 +570,26 @@ def dict_factory(cursor, row):
         d[col[0]] = row[i]
     return d
 
+@functools.lru_cache(maxsize = QUERYCACHE_SIZE)
+def _namedtupleclass(names):
+    """ Returns the namedtuple class for the given column names (column names which are not valid field names are renamed to _{index}) """
+    return namedtuple("Row",names, rename = True)
+
+def namedtuple_factory(cursor):
+    """ Returns a row_factory which converts the rows of an executed cursor into namedtuples.
+
+        Unlike dict_factory, cursor.description is only read once: the namedtuple class is created when this function is
+        called (and is reused for any other query with the same column names).
+        Example:
+            cursor = conn.cursor()
+            cursor.execute("SELECT name, value FROM testtable;")
+            cursor.row_factory = namedtuple_factory(cursor)
+            cursor.fetchone()
+            ## > Row(name='Hello', value=1)
+    """
+    make = _namedtupleclass(tuple(description[0] for description in cursor.description))._make
+    return lambda cursor,row: make(row)
+
 def object_to_factory(object, mode = "kwargs"):
     """ A utility method to create row_factories out of Objects.
 
@@ -345,6 +621,33 @@ class SQLColumn():
         self.dflt_value = dflt_value
         self.pk = pk
 
+def getcolumnindex(cursor):
+    """ Returns a dict of the cursor's column names and their index in each row.
+
+        Like dict_factory, if a column name is repeated the last index is used.
+    """
+    return {col[0]:i for i,col in enumerate(cursor.description)}
+
+def getreference(column):
+    """ Returns the foreign table and foreign column referenced by the given Foreign Key Column.
+
+        If the Foreign Key does not specify a column (i.e.- it references the foreign table's
+        primary key), the returned column is None.
+        NOTE: Multiple Reference Constraints per column is not supported
+    """
+    constraint = [constraint for constraint in column.allconstraints if isinstance(constraint,ReferenceConstraint)][0]
+    ftable = constraint.foreigntable
+    fcolumn = constraint.foreigncolumns
+    if isinstance(constraint,ColumnReferenceConstraint):
+        if fcolumn: fcolumn = fcolumn[0]
+    elif isinstance(constraint,TableReferenceConstraint):
+        ## Foreign Key (*columns) References {ftable}(*fcolumns)
+        ## => *columns should be index-paired
+        index = constraint.columns.index(column)
+        fcolumn = fcolumn[index]
+    if not fcolumn: fcolumn = None
+    return ftable,fcolumn
+
 class AdvancedRow():
     """ A row with Django-esque Foreign Key Querying.
     
@@ -361,14 +664,41 @@ class AdvancedRow():
         rows2 = [{name:"Hello",value:0},]
 
         Table1 != Table2 => rows1 != rows2
+
+        AdvancedRows only store the row's values and a reference to a column index
+        (see getcolumnindex) which is shared by all rows from the same query. The row's
+        dict (AdvancedRow.row) is only created when it is requested.
     """
-    def __init__(self,table,cursor,row):
+    __slots__ = ("table","row_factory","_values","_index","_row","_prefetched")
+    def __init__(self,table,cursor,row, columnindex = None):
         if not isinstance(table,Table.AdvancedTable):
             raise AttributeError("table should be an alcustoms.sql.AdvancedTable object")
         self.table = table
         self.row_factory = table.row_factory
-        self.cursor = cursor
-        self.row = dict_factory(cursor,row)
+        if columnindex is None: columnindex = getcolumnindex(cursor)
+        self._index = columnindex
+        self._values = row
+        self._row = None
+        ## Foreign Key rows supplied by AdvancedTable.prefetch
+        self._prefetched = None
+
+    @property
+    def row(self):
+        """ The row as a dict of {column name: value} """
+        if self._row is None:
+            values = self._values
+            self._row = OrderedDict((name,values[i]) for name,i in self._index.items())
+        return self._row
+
+    def _hasvalue(self,name):
+        """ Returns whether the given name is a column in the row """
+        if self._row is not None: return name in self._row
+        return name in self._index
+
+    def _getvalue(self,name):
+        """ Returns the raw value of the column (Foreign Keys are not resolved) """
+        if self._row is not None: return self._row[name]
+        return self._values[self._index[name]]
 
     def drop(self):
         """ Drops the row from it's Table.
@@ -379,52 +709,43 @@ class AdvancedRow():
 
     def __getattribute__(self, name):
         ## Don't hijack reserved names or specific, known attrs (saves a couple steps)
-        if name.startswith("__") or name in ['table','cursor','row']:
-            #print(name,":",super().__getattribute__(name))
+        if name.startswith("__") or name in ['table','row','row_factory','_values','_index','_row','_prefetched','_hasvalue','_getvalue']:
             return super().__getattribute__(name)
         ## Pk is alias for whatever the table's rowid is
         if name == "pk":
             name = str(self.table.pk)
-        if name != "row" and name in self.row:
+        if self._hasvalue(name):
             ## rowid is not (currently) automatically generated for Table Objects
             ## (which irrelevant anyway because the following code-block only cares about foreignkeys)
-            if name in self.table.columns:
-                column = self.table.columns[name]
-                if column.isforeignkey:
-                    ## NOTE: Multiple Reference Constraints per column is not supported
-                    constraint = [constraint for constraint in column.allconstraints if isinstance(constraint,ReferenceConstraint)][0]
-                    ftable = constraint.foreigntable
-                    fcolumn = constraint.foreigncolumns
-                    if isinstance(constraint,ColumnReferenceConstraint):
-                        if fcolumn: fcolumn = fcolumn[0]
-                    elif isinstance(constraint,TableReferenceConstraint):
-                        ## Foreign Key (*columns) References {ftable}(*fcolumns)
-                        ## => *columns should be index-paired
-                        index = constraint.columns.index(column)
-                        fcolumn = fcolumn[index]
-
-                    conn = self.table.database
-                    ## Make sure that you replicate the type of row_factory used to create this object
-                    with Utilities.temp_row_factory(conn,self.row_factory):
-                        ftable = conn.getadvancedtable(ftable)
-
-                    ## Return Row with Corresponding Foreign Key's Value
-                    try:
-                        if not fcolumn: q = "pk"
-                        else: q = f"{fcolumn}__eq"
-                        with temp_row_factory(ftable,advancedrow_factory):
-                            result = ftable.quickselect(**{q:self.row[name]})
-                    except Exception as e:
-                        #print(fcolumn, ftable)
-                        raise e
-                    if result: return result[0]
-                    return None
-            return self.row[name]
+            column = self.table._columns.get(name)
+            if column is not None and column.isforeignkey:
+                prefetched = self._prefetched
+                if prefetched is not None and name in prefetched:
+                    return prefetched[name]
+                ftable,fcolumn = getreference(column)
+
+                conn = self.table.database
+                ## Make sure that you replicate the type of row_factory used to create this object
+                with Utilities.temp_row_factory(conn,self.row_factory):
+                    ftable = conn.getadvancedtable(ftable)
+
+                ## Return Row with Corresponding Foreign Key's Value
+                if not fcolumn: q = "pk"
+                else: q = f"{fcolumn}__eq"
+                with temp_row_factory(ftable,advancedrow_factory):
+                    result = ftable.quickselect(**{q:self._getvalue(name)})
+                if result: return result[0]
+                return None
+            return self._getvalue(name)
         return super().__getattribute__(name)
 
     def __eq__(self,other):
         if isinstance(other, AdvancedRow):
-            return self.table == other.table and self.row == other.row
+            if self.table != other.table: return False
+            ## Rows from the same query can be compared without creating their dicts
+            if self._index is other._index and self._row is None and other._row is None:
+                return self._values == other._values
+            return self.row == other.row
         if isinstance(other,dict):
             return self.row == other
 
@@ -441,11 +762,14 @@ class AdvancedRow_Factory():
             When this instanced is called by a Connection object (subsequent of
             sql execution), it will pass it's parent to the target class, along
             with the cursor and the row (parent, cursor, and row are passed as
-            positional arguments).
+            positional arguments). If _class is an AdvancedRow subclass, the
+            column index for the cursor is also supplied (as the columnindex keyword);
+            the column index is only computed once per query.
         """
         self._class = _class
         self._parent = None
         self.parent = parent
+        self._indexcache = (None,None)
     @property
     def parent(self):
         return self._parent
@@ -459,9 +783,20 @@ class AdvancedRow_Factory():
         self._parent = value
     def new(self,parent = None):
         return self.__class__(_class = self._class, parent = parent)
+    def columnindex(self,cursor):
+        """ Returns the column index for the cursor's current query """
+        description = cursor.description
+        ## description and index are stored together so that the pair is always consistent
+        cached,index = self._indexcache
+        if cached is not description:
+            index = getcolumnindex(cursor)
+            self._indexcache = (description,index)
+        return index
     def __call__(self,cursor,row):
         if not self.parent or not self._class:
             raise AttributeError("AdvancedRow Factory's parent or class is not set")
+        if isinstance(self._class,type) and issubclass(self._class,AdvancedRow):
+            return self._class(self.parent,cursor,row, columnindex = self.columnindex(cursor))
         return self._class(self.parent,cursor,row)
     def __repr__(self):
         return f"AdvancedRow_Factory({self._class.__name__}) Object"
@@ -781,6 +1116,16 @@ class Column():
     def datatype(self,value):
         self._datatype = value
 
+    @property
+    def affinity(self):
+        """ Returns the column's type affinity ("INTEGER", "TEXT", "BLOB", "REAL", or "NUMERIC"), determined from its datatype using sqlite's rules """
+        datatype = str(self._datatype or "").upper()
+        if "INT" in datatype: return "INTEGER"
+        if any(name in datatype for name in ("CHAR","CLOB","TEXT")): return "TEXT"
+        if not datatype or "BLOB" in datatype: return "BLOB"
+        if any(name in datatype for name in ("REAL","FLOA","DOUB")): return "REAL"
+        return "NUMERIC"
+
     @property
     def definition(self):
         if self._definition: return self._definition
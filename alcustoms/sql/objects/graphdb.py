@@ -39,7 +39,9 @@
     When the GraphDB object is initialized on a Database file it creates a Table called
     graphdb_edges (assuming the table does not already exist). This table maps rowids and
     their corresponding tableids together, along with an optional relation from each row
-    to the other.
+    to the other. Tableids are integers assigned to each table name by the graphdb_tables
+    Table (see GraphDB.tableid), and graphdb_edges is indexed on (tableid, rowid, relation)
+    for both nodes so that the edges of a node can be found without scanning the table.
     These rows are referred to as Nodes and their relations are called Edges. The GraphDB
     Object automatically uses a special rowfactory which returns Node objects instead of
     rows. It also has additional functions for querying the database for Edges, which are
@@ -52,15 +54,51 @@
     [Pizza Node, Pasta Node]. Additionally, if there are edges saying a Person Nodes
     "Lives In" (node relation) the a given Country, then Italy.lives_in__this (double
     underscore before "this") returns a list of Nodes that have the "Lives In" relation
-    to Italy. 
+    to Italy. Relations are compared using a normalized key (see normalizerelation) which is
+    stored alongside each relation, so Italy.National_Dishes and Italy.national_dishes are the
+    same attribute. GraphDB remembers which relations exist, so attributes which are not
+    relations are rejected without querying graphdb_edges.
+
+    GraphDB can also walk the graph inside of sqlite using recursive queries: traverse returns
+    the Nodes within a number of Edges of a given Node (grouped by how many Edges away they are),
+    reachable returns every Node connected to it, and shortest_path returns the Nodes along the
+    shortest chain of Edges between two Nodes. All three can be limited to certain relations and
+    to following Edges in a single direction.
 """
 
 ## This Module
+from alcustoms.sql import constants
 from alcustoms.sql.objects.Connection import Database
-from alcustoms.sql.objects import advancedrow_factory, AdvancedRow_Factory, AdvancedRow
-from alcustoms.sql.objects.Utilities import temp_row_factory
+from alcustoms.sql.objects import advancedrow_factory, AdvancedRow_Factory, AdvancedRow, QueryResult
+from alcustoms.sql.objects.Table import Table
+from alcustoms.sql.objects.Utilities import temp_row_factory, transaction
+
+## Builtin
+import array
+import collections
+import sqlite3
+
+__all__ = ["GraphDB","AdjacencyCache","Edge","Node","normalizerelation",]
+
+## The directions accepted by GraphDB's traversal methods (see GraphDB._traversalstep)
+TRAVERSALDIRECTIONS = ["both","out","in"]
+## The tables, indexes and triggers created by GraphDB
+SCHEMAOBJECTS = ["graphdb_tables","graphdb_edges","graphdb_auto_edges","graphdb_edges_node1","graphdb_edges_node2","graphdb_edges_insertkeys","graphdb_edges_updatekeys"]
+## The columns of graphdb_edges (and the rowid)
+EDGECOLUMNS = ["rowid","node1table","node1row","node1relation","node2table","node2row","node2relation","node1key","node2key"]
+## Lowercases ASCII letters only, the same as sqlite's lower function
+_ASCIILOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ","abcdefghijklmnopqrstuvwxyz")
+## The sql equivalent of normalizerelation (used by the graphdb_edges triggers)
+RELATIONKEYSQL = "lower(replace({relation}, '_', ' '))"
+
+def normalizerelation(relation):
+    """ Returns the key stored for relation in graphdb_edges (node1key/node2key).
 
-__all__ = ["GraphDB","Edge","Node",]
+        Underscores are replaced with spaces and ASCII letters are lowercased (in the same way as sqlite's lower function,
+        so that the key can also be computed in sql: see RELATIONKEYSQL). Returns None if relation is None.
+    """
+    if relation is None: return None
+    return relation.replace("_"," ").translate(_ASCIILOWER)
 
 class GraphDB(Database):
     """ An python/sqlite implementation of a Graph-structured database.
@@ -80,7 +118,65 @@ node1row INT,
 node1relation TEXT,
 node2table INT,
 node2row INT,
-node2relation TEXT);""")
+node2relation TEXT,
+node1key TEXT,
+node2key TEXT);""")
+
+    def _create_tablestable(db):
+        """ Initializes the graphdb_tables table, which assigns an integer id to each table name used in graphdb_edges """
+        db.execute("""CREATE TABLE graphdb_tables (
+tableid INTEGER PRIMARY KEY,
+name TEXT NOT NULL UNIQUE);""")
+
+    def _create_edgeindexes(db):
+        """ Creates the indexes used to look up the edges of a node (if they do not already exist) """
+        for node in ("node1","node2"):
+            db.execute(f"""CREATE INDEX IF NOT EXISTS graphdb_edges_{node} ON graphdb_edges ({node}table, {node}row, {node}key);""")
+
+    def _create_edgetriggers(db):
+        """ Creates the triggers which keep node1key and node2key up to date for edges which are not added by create_edge (if they do not already exist) """
+        keys = {node:RELATIONKEYSQL.format(relation = f"NEW.{node}relation") for node in ("node1","node2")}
+        when = f"""NEW.node1key IS NOT {keys['node1']} OR NEW.node2key IS NOT {keys['node2']}"""
+        update = f"""UPDATE graphdb_edges SET node1key = {keys['node1']}, node2key = {keys['node2']} WHERE rowid = NEW.rowid;"""
+        db.execute(f"""CREATE TRIGGER IF NOT EXISTS graphdb_edges_insertkeys AFTER INSERT ON graphdb_edges
+WHEN {when} BEGIN {update} END;""")
+        db.execute(f"""CREATE TRIGGER IF NOT EXISTS graphdb_edges_updatekeys AFTER UPDATE OF node1relation, node2relation, node1key, node2key ON graphdb_edges
+WHEN {when} BEGIN {update} END;""")
+
+    def _migrate_relationkeys(db):
+        """ Adds node1key and node2key to graphdb_edges tables created before they existed (replacing the old relation indexes) """
+        cursor = db.cursor()
+        cursor.row_factory = None
+        try:
+            columns = [row[1] for row in cursor.execute("""PRAGMA table_info(graphdb_edges);""")]
+        finally:
+            cursor.close()
+        if "node1key" in columns: return
+        for node in ("node1","node2"):
+            db.execute(f"""ALTER TABLE graphdb_edges ADD COLUMN {node}key TEXT;""")
+            db.execute(f"""UPDATE graphdb_edges SET {node}key = {RELATIONKEYSQL.format(relation = f"{node}relation")};""")
+            db.execute(f"""DROP INDEX IF EXISTS graphdb_edges_{node};""")
+
+    def _migrate_edgetable(db):
+        """ Converts graphdb_edges tables created before graphdb_tables existed (which stored table names instead of tableids) in place """
+        db.execute("""INSERT OR IGNORE INTO graphdb_tables (name)
+SELECT node1table FROM graphdb_edges WHERE typeof(node1table) = 'text'
+UNION SELECT node2table FROM graphdb_edges WHERE typeof(node2table) = 'text';""")
+        for node in ("node1","node2"):
+            db.execute(f"""UPDATE graphdb_edges SET {node}table = (SELECT tableid FROM graphdb_tables WHERE name = graphdb_edges.{node}table)
+WHERE typeof({node}table) = 'text';""")
+
+    def _schemaready(db):
+        """ Returns whether all of the tables, indexes and triggers used by GraphDB exist and graphdb_edges does not need to be migrated """
+        cursor = db.cursor()
+        cursor.row_factory = None
+        try:
+            names = {row[0] for row in cursor.execute(f"""SELECT name FROM sqlite_master WHERE name IN ({", ".join("?" for name in SCHEMAOBJECTS)});""",SCHEMAOBJECTS)}
+            if names != set(SCHEMAOBJECTS): return False
+            columns = [row[1] for row in cursor.execute("""PRAGMA table_info(graphdb_edges);""")]
+        finally:
+            cursor.close()
+        return "node1key" in columns
 
     def _create_autoedgetable(db):
         """ Initializes the grpahdb_auto_edges table """
@@ -93,11 +189,240 @@ node2relation TEXT);""")
     def __init__(self, file, check_same_thread = False, timeout = 10, _parser = None, row_factory = False, **kw):
         if row_factory is False: row_factory = node_factory
         super().__init__(file, check_same_thread, timeout, _parser, row_factory, **kw)
+        self._tableids = dict()
+        self._tablenames = dict()
+        ## Known relation keys (see isrelation) and the (data_version, total_changes) they were loaded at
+        self._knownrelations = set()
+        self._relationversion = None
+        ## The adjacency cache (see use_adjacency_cache), the (data_version, edge writes) it is current for, and the number
+        ## of rows of graphdb_edges that have been changed by this connection since the cache was enabled
+        self._adjacencyenabled = False
+        self._adjacencycache = None
+        self._adjacencyversion = None
+        self._edgewrites = 0
+        ## The marker written while the adjacency cache reflects an open transaction (see _markadjacency)
+        self._adjacencymarker = None
+        self._adjacencymarkers = 0
 
-        if not self.tableexists("graphdb_edges"):
-            self._create_edgetable()
-        if not self.tableexists("graphdb_auto_edges"):
-            self._create_autoedgetable()
+        ## Only take a write lock if something needs to be created (so that read-only connections can open existing GraphDBs)
+        if self._schemaready(): return
+        with transaction(self):
+            if not self.tableexists("graphdb_tables"):
+                self._create_tablestable()
+                if self.tableexists("graphdb_edges"): self._migrate_edgetable()
+            if not self.tableexists("graphdb_edges"):
+                self._create_edgetable()
+            else:
+                self._migrate_relationkeys()
+            self._create_edgeindexes()
+            self._create_edgetriggers()
+            if not self.tableexists("graphdb_auto_edges"):
+                self._create_autoedgetable()
+        if self.in_transaction: self.commit()
+
+    def tableid(self, table, create = True):
+        """ Returns the integer id used for the given table (a table name, a Table, or an AdvancedRow from the table) in graphdb_edges.
+
+            Ids are assigned the first time a table is used and are cached by the GraphDB. If create is False and the
+            table has not been assigned an id (i.e.- it has no edges), None is returned instead.
+        """
+        if isinstance(table,AdvancedRow): table = table.table
+        if isinstance(table,Table): table = table.name
+        table = str(table)
+        tableid = self._tableids.get(table)
+        if tableid is not None: return tableid
+        table = str(self.getadvancedtable(table).name)
+        cursor = self.cursor()
+        cursor.row_factory = None
+        try:
+            if create: cursor.execute("""INSERT OR IGNORE INTO graphdb_tables (name) VALUES (?);""",(table,))
+            tableid = cursor.execute("""SELECT tableid FROM graphdb_tables WHERE name = ?;""",(table,)).fetchone()
+        finally:
+            cursor.close()
+        if tableid is None: return None
+        tableid = tableid[0]
+        self._cachetable(table,tableid)
+        return tableid
+
+    def _cachetable(self, table, tableid):
+        """ Caches the id of the table, replacing any entries for a previous table with the same id (which is only possible if that table's registration was rolled back) """
+        previous = self._tablenames.get(tableid)
+        if previous is not None and previous != table: self._tableids.pop(previous,None)
+        previous = self._tableids.get(table)
+        if previous is not None and previous != tableid: self._tablenames.pop(previous,None)
+        self._tableids[table] = tableid
+        self._tablenames[tableid] = table
+
+    def _cleartables(self):
+        """ Empties the cache of table ids """
+        self._tableids.clear()
+        self._tablenames.clear()
+
+    def tablename(self, tableid):
+        """ Returns the name of the table with the given id (see tableid) """
+        name = self._tablenames.get(tableid)
+        if name is not None: return name
+        cursor = self.cursor()
+        cursor.row_factory = None
+        try:
+            result = cursor.execute("""SELECT name FROM graphdb_tables WHERE tableid = ?;""",(tableid,)).fetchone()
+        finally:
+            cursor.close()
+        if result is None: raise ValueError(f"Invalid tableid: {tableid}")
+        self._cachetable(result[0],tableid)
+        return result[0]
+
+    def isrelation(self, relation):
+        """ Returns whether any Edge has the given relation (compared using normalizerelation) on either side.
+
+            Known relations are cached by the GraphDB: the cache is only reloaded (with a single query) when a relation
+            is not in it and graphdb_edges may have changed since it was loaded (i.e.- the connection has made changes,
+            or another connection has committed changes according to PRAGMA data_version).
+        """
+        key = normalizerelation(relation)
+        if key in self._knownrelations: return True
+        cursor = self.cursor()
+        cursor.row_factory = None
+        try:
+            version = (cursor.execute("""PRAGMA data_version;""").fetchone()[0],self.total_changes)
+            if version != self._relationversion:
+                rows = cursor.execute("""SELECT node1key FROM graphdb_edges UNION SELECT node2key FROM graphdb_edges;""").fetchall()
+                self._knownrelations = set(row[0] for row in rows if row[0] is not None)
+                self._relationversion = version
+        finally:
+            cursor.close()
+        return key in self._knownrelations
+
+    def use_adjacency_cache(self, enable = True):
+        """ Enables (or disables) the in-memory adjacency cache (see AdjacencyCache).
+
+            When enabled, the cache is loaded from graphdb_edges the first time it is needed and traverse, reachable,
+            shortest_path, incident_edges, and neighbors (and therefore Node.edges) are answered from it without querying
+            graphdb_edges (GraphDB.adjacency returns the up-to-date cache, which can also be used directly to find neighbors
+            by (tableid, rowid) key). create_edge and delete_edge update the cache
+            in place. Any other change to graphdb_edges made by this connection (which is detected by temporary triggers),
+            a rollback, or a commit by another connection (detected with PRAGMA data_version) causes the cache
+            to be reloaded the next time it is used. Rollbacks which bypass GraphDB.rollback ("ROLLBACK" and
+            "ROLLBACK TO" statements) are detected by a marker row in a temporary table (see _markadjacency).
+        """
+        if enable and not self._adjacencyenabled:
+            self.create_function("graphdb_edgeschanged", 0, self._edgeschanged)
+            for event in ("INSERT","UPDATE","DELETE"):
+                self.execute(f"""CREATE TEMP TRIGGER IF NOT EXISTS graphdb_adjacency_{event.lower()} AFTER {event} ON graphdb_edges
+BEGIN SELECT graphdb_edgeschanged(); END;""")
+        elif not enable and self._adjacencyenabled:
+            for event in ("INSERT","UPDATE","DELETE"):
+                self.execute(f"""DROP TRIGGER IF EXISTS temp.graphdb_adjacency_{event.lower()};""")
+        self._adjacencyenabled = bool(enable)
+        self._adjacencycache = None
+        self._adjacencyversion = None
+        self._adjacencymarker = None
+
+    def _edgeschanged(self):
+        """ Called by the adjacency cache's temporary triggers whenever a row of graphdb_edges is changed """
+        self._edgewrites += 1
+
+    def _dataversion(self):
+        cursor = self.cursor()
+        cursor.row_factory = None
+        try:
+            return cursor.execute("""PRAGMA data_version;""").fetchone()[0]
+        finally:
+            cursor.close()
+
+    def _adjacency(self):
+        """ Returns the up-to-date adjacency cache (loading it if necessary), or None if it is not enabled """
+        if not self._adjacencyenabled: return None
+        version = (self._dataversion(),self._edgewrites)
+        if self._adjacencycache is None or version != self._adjacencyversion or self._adjacencyrolledback():
+            cursor = self.cursor()
+            cursor.row_factory = None
+            try:
+                cursor.execute("""SELECT rowid, node1table, node1row, node1relation, node1key, node2table, node2row, node2relation, node2key FROM graphdb_edges ORDER BY rowid;""")
+                self._adjacencycache = AdjacencyCache(cursor)
+            finally:
+                cursor.close()
+            self._adjacencyversion = version
+            self._markadjacency()
+        return self._adjacencycache
+
+    @property
+    def adjacency(self):
+        """ The up-to-date AdjacencyCache (loaded if necessary), or None if the adjacency cache is not enabled (see use_adjacency_cache) """
+        return self._adjacency()
+
+    def _currentadjacency(self):
+        """ Returns the adjacency cache if it is loaded and no unrecorded changes have been made to graphdb_edges by this connection
+            (used by create_edge and delete_edge to decide whether the cache can be updated in place) """
+        if self._adjacencycache is None or self._adjacencyversion is None or self._adjacencyversion[1] != self._edgewrites: return None
+        if self._adjacencyrolledback(): return None
+        return self._adjacencycache
+
+    def _markadjacency(self):
+        """ Records that the adjacency cache was loaded or updated during the current transaction (if any).
+
+            The changes to graphdb_edges made during a transaction are discarded by a rollback, but PRAGMA data_version
+            does not change and the temporary triggers do not fire. A marker row is therefore written to a temporary
+            table in the same transaction: it is removed along with the changes by "ROLLBACK" or "ROLLBACK TO" (see
+            _adjacencyrolledback). Connections which cannot write (e.g.- "PRAGMA query_only") cannot have changes to
+            roll back and are not marked.
+        """
+        self._adjacencymarker = None
+        if not self.in_transaction: return
+        self._adjacencymarkers += 1
+        cursor = self.cursor()
+        cursor.row_factory = None
+        try:
+            cursor.execute("""CREATE TEMP TABLE IF NOT EXISTS graphdb_adjacency_marker (markerid INTEGER PRIMARY KEY, marker INT);""")
+            cursor.execute("""INSERT OR REPLACE INTO temp.graphdb_adjacency_marker (markerid, marker) VALUES (1, ?);""",(self._adjacencymarkers,))
+        except sqlite3.OperationalError:
+            return
+        finally:
+            cursor.close()
+        self._adjacencymarker = self._adjacencymarkers
+
+    def _adjacencyrolledback(self):
+        """ Returns whether the transaction in which the adjacency cache was last loaded or updated has been (partially) rolled back (see _markadjacency) """
+        if self._adjacencymarker is None: return False
+        cursor = self.cursor()
+        cursor.row_factory = None
+        try:
+            marker = cursor.execute("""SELECT marker FROM temp.graphdb_adjacency_marker;""").fetchone()
+        except sqlite3.OperationalError:
+            ## The marker table was created in the rolled back transaction
+            marker = None
+        finally:
+            cursor.close()
+        if marker is None or marker[0] != self._adjacencymarker:
+            self._adjacencycache = None
+            self._adjacencymarker = None
+            return True
+        ## The transaction was committed
+        if not self.in_transaction: self._adjacencymarker = None
+        return False
+
+    def rollback(self):
+        ## Table ids, known relations, and changes applied to the adjacency cache may have been rolled back
+        super().rollback()
+        self._cleartables()
+        self._knownrelations = set()
+        self._relationversion = None
+        self._adjacencycache = None
+        self._adjacencymarker = None
+
+    def commit(self):
+        super().commit()
+        ## Changes applied to the adjacency cache have been committed
+        self._adjacencymarker = None
+
+    def _normalizerelations(self, relations):
+        """ Validates the relations argument of the traversal methods and returns a list of relation keys (or None if relations is None) """
+        if relations is None: return None
+        if isinstance(relations,str): relations = [relations,]
+        relations = list(relations)
+        if not relations or not all(isinstance(relation,str) for relation in relations):
+            raise TypeError("relations must be a string or a list of strings")
+        return list(dict.fromkeys(normalizerelation(relation) for relation in relations))
 
     @property
     def edgetable(self):
@@ -109,34 +434,69 @@ node2relation TEXT);""")
         elif len(nodes) == 2:
             node1,node2 = nodes
         if (isinstance(node1,AdvancedRow) and not node1table is None)\
-            or (isinstance(node2,AdvancedRow) and not node1table is None):
+            or (isinstance(node2,AdvancedRow) and not node2table is None):
             raise ValueError("It is an error to supply a node ")
 
         if isinstance(node1,AdvancedRow):
-            node1table = node1.table.name
-            try:
-                node1 = node1.pk
-            except Exception as e:
-                raise e
+            node1table = node1.table
+            node1 = node1.pk
         if isinstance(node2,AdvancedRow):
-            node2table = node2.table.name
+            node2table = node2.table
             node2 = node2.pk
 
-        if isinstance(node1table,str):
-            node1table = self.getadvancedtable(node1table).name
-        if isinstance(node2table,str):
-            node2table = self.getadvancedtable(node2table).name
-
-        if not isinstance(node1,AdvancedRow) and (not isinstance(node1,int) or not isinstance(node1table,str))\
-            or not isinstance(node2,AdvancedRow) and (not isinstance(node2,int) or not isinstance(node2table,str)):
+        if not isinstance(node1,int) or node1table is None\
+            or not isinstance(node2,int) or node2table is None:
             raise TypeError("nodes must be either AdvancedRow objects or they must be an int and some identification for their tables must also be supplied.")
+        if not isinstance(node1table,int): node1table = self.tableid(node1table)
+        if not isinstance(node2table,int): node2table = self.tableid(node2table)
         
         if (node1relation and not isinstance(node1relation,str)) or (node2relation and not isinstance(node2relation,str)):
             raise TypeError("Node Relations must be strings")
 
-        rowid = self.edgetable.insert(node1table = node1table, node1row = node1, node2table = node2table, node2row = node2, node1relation = node1relation, node2relation = node2relation)
+        node1key,node2key = normalizerelation(node1relation),normalizerelation(node2relation)
+        cache = self._currentadjacency()
+        replacements = dict(node1row = node1, node1relation = node1relation, node1key = node1key, node2row = node2, node2relation = node2relation, node2key = node2key)
+        ## The tableids are looked up by name when the Edge is inserted: if a table's registration was rolled back without
+        ## GraphDB.rollback (e.g.- by the sqlite3 context manager) the cached id is stale, nothing is inserted, and the table
+        ## is registered again
+        cursor = self.cursor()
+        try:
+            for attempt in range(2):
+                replacements['node1name'] = self.tablename(node1table)
+                replacements['node2name'] = self.tablename(node2table)
+                cursor.execute("""INSERT INTO graphdb_edges (node1table, node1row, node1relation, node1key, node2table, node2row, node2relation, node2key)
+SELECT table1.tableid, :node1row, :node1relation, :node1key, table2.tableid, :node2row, :node2relation, :node2key
+FROM graphdb_tables AS table1, graphdb_tables AS table2 WHERE table1.name = :node1name AND table2.name = :node2name;""",replacements)
+                if cursor.rowcount: break
+                if attempt: raise ValueError("Could not register the Edge's tables")
+                self._cleartables()
+                node1table,node2table = self.tableid(replacements['node1name']),self.tableid(replacements['node2name'])
+            rowid = cursor.lastrowid
+        finally:
+            cursor.close()
+        self._knownrelations.update(key for key in (node1key,node2key) if key is not None)
+        if cache is not None:
+            cache.add(rowid, (node1table,node1), node1relation, node1key, (node2table,node2), node2relation, node2key)
+            self._adjacencyversion = (self._adjacencyversion[0],self._edgewrites)
+            self._markadjacency()
         return rowid
 
+    def delete_edge(self, *edges):
+        """ Deletes the given Edges (Edge objects or edge ids) from graphdb_edges.
+
+            Like other changes, the deletion is not committed automatically. The adjacency cache (if it is enabled) is updated in place.
+        """
+        ids = [edge.pk if isinstance(edge,Edge) else edge for edge in edges]
+        if not all(isinstance(edgeid,int) for edgeid in ids):
+            raise TypeError("edges must be Edge objects or integer edge ids")
+        if not ids: return
+        cache = self._currentadjacency()
+        self.edgetable.quickdelete(pk__in = ids)
+        if cache is not None:
+            cache.remove(ids)
+            self._adjacencyversion = (self._adjacencyversion[0],self._edgewrites)
+            self._markadjacency()
+
     def getedge(self,*_, **kw):
         """ If one positional argument is supplied, returns the Edge with the given id; otherwise functions as quickselect """
         if 'pk' in kw and _:
@@ -150,29 +510,610 @@ node2relation TEXT);""")
                 raise TypeError("It is invalid to supply both node1 and node1row/node1table (perhaps you meant node1row)")
             node1 = kw.pop("node1")
             kw['node1row'] = node1.pk
-            kw['node1table'] = node1.table.name
+            kw['node1table'] = node1.table
         if 'node2' in kw:
             if 'node2table' in kw or 'node2row' in kw:
                 raise TypeError("It is invalid to supply both node2 and node1row/node2table (perhaps you meant node2row)")
             node2 = kw.pop("node2")
             kw['node2row'] = node2.pk
-            kw['node2table'] = node2.table.name
-        edgetable = self.edgetable
-        with temp_row_factory(edgetable,edge_factory):
-            result = edgetable.quickselect(**kw)
+            kw['node2table'] = node2.table
+        for key in ("node1table","node2table"):
+            if key in kw and not isinstance(kw[key],int): kw[key] = self.tableid(kw[key], create = False)
+        ## Tables without an id do not have any edges
+        if kw.get("node1table",0) is None or kw.get("node2table",0) is None:
+            result = QueryResult()
+        else:
+            edgetable = self.edgetable
+            with temp_row_factory(edgetable,edge_factory):
+                result = edgetable.quickselect(**kw)
         if len(_) == 1:
             return result.first()
         return result
 
+    def _incident(self, nodes, relations = None, direction = "both", reverse = False):
+        """ Returns a list of (edge, side) tuples for the Edges of the given nodes, where side (1 or 2) is the side of the Edge
+            which is one of the nodes.
+
+            nodes is a node or a list of nodes (AdvancedRows or (table, rowid) tuples). relations and direction work as in
+            traverse (relations are matched against the given node's side of the Edge, or against the other side if reverse
+            is True). The Edges are fetched with one query per constants.REPLACEMENT_LIMIT nodes. An Edge is listed once
+            per side that matches, ordered by Edge id.
+        """
+        if isinstance(nodes,AdvancedRow) or (isinstance(nodes,tuple) and len(nodes) == 2 and isinstance(nodes[1],int)):
+            nodes = [nodes,]
+        if direction not in TRAVERSALDIRECTIONS:
+            raise ValueError(f"Invalid direction: {direction} (must be one of {', '.join(TRAVERSALDIRECTIONS)})")
+        relations = self._normalizerelations(relations)
+        sides = []
+        if direction in ("both","out"): sides.append(1)
+        if direction in ("both","in"): sides.append(2)
+
+        keys = []
+        for node in nodes:
+            key = self._nodekey(node)
+            if key is not None and key not in keys: keys.append(key)
+        cache = self._adjacency()
+        if cache is not None:
+            result = self._cachedincident(cache, keys, relations, direction, reverse)
+            if result is not None: return result
+        limit = constants.REPLACEMENT_LIMIT - (len(relations) if relations else 0)
+        edgetable = self.edgetable
+        result = []
+        for chunk in range(0,len(keys),limit):
+            chunk = keys[chunk:chunk+limit]
+            replacements = dict()
+            tables = dict()
+            for tableid,rowid in chunk:
+                name = f"row{len(replacements)}"
+                replacements[name] = rowid
+                tables.setdefault(tableid,[]).append(f":{name}")
+            relationsql = ""
+            if relations:
+                names = []
+                for relation in relations:
+                    name = f"relation{len(replacements)}"
+                    replacements[name] = relation
+                    names.append(f":{name}")
+                relationsql = f" AND node{{side}}key IN ({', '.join(names)})"
+            conditions = [f"(node{side}table = {tableid} AND node{side}row IN ({', '.join(rowids)}){relationsql.format(side = 3-side if reverse else side)})"
+                          for side in sides for tableid,rowids in tables.items()]
+            with temp_row_factory(edgetable,edge_factory):
+                edges = edgetable.select(" OR ".join(conditions), replacements)
+            chunk = set(chunk)
+            for edge in sorted(edges, key = lambda edge: edge.pk):
+                for side in sides:
+                    if (edge._getvalue(f"node{side}table"),edge._getvalue(f"node{side}row")) not in chunk: continue
+                    if relations and edge._getvalue(f"node{3-side if reverse else side}key") not in relations: continue
+                    result.append((edge,side))
+        return result
+
+    def _cachedincident(self, cache, keys, relations, direction, reverse):
+        """ Returns the result of _incident using the adjacency cache: the Edges are created from the cache instead of being queried.
+
+            Returns None if graphdb_edges has columns which are not in the cache (in which case the Edges should be queried).
+        """
+        edgetable = self.edgetable
+        columns = ["rowid",] + [str(column) for column in edgetable.columns]
+        columnindex = {column:index for index,column in enumerate(columns)}
+        ## Edges are created with the same columns (in the same order) as if they had been queried
+        if set(columns) != set(EDGECOLUMNS): return None
+        incident = []
+        for key in keys:
+            incident.extend(cache.incident(key, relations = relations, direction = direction, reverse = reverse))
+        incident.sort(key = lambda item: (item[1]['rowid'],item[0]))
+        edges = dict()
+        result = []
+        with temp_row_factory(edgetable,edge_factory):
+            for side,row in incident:
+                edge = edges.get(row['rowid'])
+                if edge is None:
+                    edge = edges[row['rowid']] = Edge(edgetable, None, tuple(row[column] for column in columns), columnindex = columnindex)
+                result.append((edge,side))
+        return result
+
+    def incident_edges(self, nodes, relations = None, direction = "both", reverse = False):
+        """ Returns a QueryResult of the Edges of the given node or list of nodes (AdvancedRows or (table, rowid) tuples).
+
+            relations and direction work as in traverse; if reverse is True, relations are matched against the relation
+            of the other node of each Edge instead. All of the Edges are fetched with a single query (unless there are more
+            than constants.REPLACEMENT_LIMIT nodes).
+        """
+        result = QueryResult()
+        seen = set()
+        for edge,side in self._incident(nodes, relations = relations, direction = direction, reverse = reverse):
+            if edge.pk in seen: continue
+            seen.add(edge.pk)
+            result.append(edge)
+        return result
+
+    def neighbors(self, nodes, relations = None, direction = "both"):
+        """ Returns a QueryResult of (edge, neighbor) tuples for the given node or list of nodes (AdvancedRows or (table, rowid) tuples).
+
+            neighbor is the Node on the other side of edge from the given node; if both of an Edge's nodes were given,
+            the Edge is listed for each of them. relations and direction work as in traverse.
+            The Edges are fetched with a single query and the neighbors are then fetched with one query per table, so
+            fanning out from a Node does not query each Edge's nodes individually. The returned Edges already have their
+            nodes loaded (so Edge.node1, Edge.node2, and Edge.other do not query the database). Edges whose neighbor
+            no longer exists are omitted.
+        """
+        incident = self._incident(nodes, relations = relations, direction = direction)
+        keys = set()
+        for edge,side in incident:
+            keys.add((edge._getvalue("node1table"),edge._getvalue("node1row")))
+            keys.add((edge._getvalue("node2table"),edge._getvalue("node2row")))
+        nodes = self._getnodes(keys)
+        result = QueryResult()
+        for edge,side in incident:
+            for nodeside in (1,2):
+                node = nodes.get((edge._getvalue(f"node{nodeside}table"),edge._getvalue(f"node{nodeside}row")))
+                if node is not None: edge._nodecache[nodeside] = node
+            neighbor = edge._nodecache.get(3-side)
+            if neighbor is not None: result.append((edge,neighbor))
+        return result
+
+    def _nodekey(self, node):
+        """ Returns the (tableid, rowid) key used for node (an AdvancedRow or a (table, rowid) tuple) in graphdb_edges.
+
+            If the node's table has not been assigned an id (i.e.- it has no edges), None is returned instead.
+        """
+        if isinstance(node,AdvancedRow):
+            table,rowid = node.table,node.pk
+        elif isinstance(node,(tuple,list)) and len(node) == 2:
+            table,rowid = node
+        else:
+            raise TypeError("Nodes must be AdvancedRows or (table, rowid) tuples")
+        if not isinstance(rowid,int):
+            raise TypeError("Node rowids must be integers")
+        if not isinstance(table,int): table = self.tableid(table, create = False)
+        if table is None: return None
+        return table,rowid
+
+    def _traversalstep(self, walk, relations, direction, replacements, reverse = False):
+        """ Returns the JOIN clause and the (tableid, rowid) expressions used by one step of a recursive traversal query.
+
+            walk is the name of the recursive table and must have nodetable and noderow columns. relations (if supplied)
+            are matched against the relation key (see normalizerelation) of the node each edge points from, and are added to
+            replacements. direction is one of TRAVERSALDIRECTIONS: "out" follows edges from node1 to node2, "in" follows
+            them from node2 to node1, and "both" follows both. If reverse is True, the step walks the edges backwards
+            (from the node each edge points to towards the node it points from).
+        """
+        if direction not in TRAVERSALDIRECTIONS:
+            raise ValueError(f"Invalid direction: {direction} (must be one of {', '.join(TRAVERSALDIRECTIONS)})")
+        relationsql = ""
+        relations = self._normalizerelations(relations)
+        if relations is not None:
+            names = []
+            for relation in relations:
+                name = f"relation{len(replacements)}"
+                replacements[name] = relation
+                names.append(f":{name}")
+            relationsql = ", ".join(names)
+
+        ## Each branch is (the side matched against walk, the side whose relation is checked, the side stepped to)
+        branches = []
+        if direction in ("both","out"): branches.append((2,1,1) if reverse else (1,1,2))
+        if direction in ("both","in"): branches.append((1,2,2) if reverse else (2,2,1))
+        conditions = []
+        for match,relation,_ in branches:
+            condition = f"e.node{match}table = {walk}.nodetable AND e.node{match}row = {walk}.noderow"
+            if relationsql: condition += f" AND e.node{relation}key IN ({relationsql})"
+            conditions.append(f"({condition})")
+        join = f"JOIN graphdb_edges AS e ON {' OR '.join(conditions)}"
+
+        if len(branches) == 1:
+            step = branches[0][2]
+            return join, f"e.node{step}table", f"e.node{step}row"
+        match,_,step = branches[0]
+        other = branches[1][2]
+        expressions = [f"CASE WHEN e.node{match}table = {walk}.nodetable AND e.node{match}row = {walk}.noderow THEN e.node{step}{column} ELSE e.node{other}{column} END"
+                       for column in ("table","row")]
+        return join, *expressions
+
+    def _getnodes(self, keys):
+        """ Returns a dict mapping each (tableid, rowid) key to its Node, using one query per table.
+
+            Keys whose rows no longer exist are omitted.
+        """
+        tables = dict()
+        for tableid,rowid in keys:
+            tables.setdefault(tableid,set()).add(rowid)
+        nodes = dict()
+        for tableid,rowids in tables.items():
+            table = self.getadvancedtable(self.tablename(tableid))
+            with temp_row_factory(table,node_factory):
+                for node in table.quickselect(pk__in = sorted(rowids)):
+                    nodes[(tableid,node.pk)] = node
+        return nodes
+
+    def _getnode(self, node):
+        """ Returns a list containing the Node for node (an AdvancedRow or a (table, rowid) tuple) whose table does not have an id.
+
+            The list is empty if the row does not exist.
+        """
+        if isinstance(node,AdvancedRow): table,rowid = node.table,node.pk
+        else: table,rowid = node
+        if not isinstance(table,str): table = table.name
+        table = self.getadvancedtable(table)
+        with temp_row_factory(table,node_factory):
+            return list(table.quickselect(pk = rowid))
+
+    def _walk(self, sql, replacements):
+        """ Executes a traversal query and returns its rows as tuples """
+        cursor = self.cursor()
+        cursor.row_factory = None
+        try:
+            return cursor.execute(sql,replacements).fetchall()
+        finally:
+            cursor.close()
+
+    def traverse(self, start, relations = None, max_depth = 1, direction = "both"):
+        """ Returns the Nodes within max_depth edges of start (an AdvancedRow or a (table, rowid) tuple), grouped by depth.
+
+            The result is a list where index i is a QueryResult of the Nodes whose shortest distance from start is i
+            (index 0 contains start itself). relations limits the traversal to edges where the relation of the node being
+            stepped from is one of the given relations (compared using normalizerelation). direction is one of TRAVERSALDIRECTIONS
+            (see _traversalstep). The traversal is performed by a single recursive query; max_depth is required because
+            the query tracks each node at every depth it can be reached at. If the adjacency cache is enabled (see
+            use_adjacency_cache), the traversal is performed in memory instead and only the Nodes' rows are queried.
+        """
+        if not isinstance(max_depth,int) or max_depth < 0:
+            raise ValueError("max_depth must be a non-negative integer")
+        key = self._nodekey(start)
+        if key is None:
+            ## start has no edges, but should still be returned as a Node
+            return [QueryResult(self._getnode(start)),]
+        cache = self._adjacency()
+        if cache is not None:
+            levels = cache.traverse(key, relations = self._normalizerelations(relations), max_depth = max_depth, direction = direction)
+            rows = [(tableid,rowid,depth) for depth,keys in enumerate(levels) for tableid,rowid in keys]
+        else:
+            replacements = dict(starttable = key[0], startrow = key[1], maxdepth = max_depth)
+            join,tableexpr,rowexpr = self._traversalstep("walk", relations, direction, replacements)
+            sql = f"""WITH RECURSIVE walk(nodetable, noderow, depth) AS (
+SELECT :starttable, :startrow, 0
+UNION SELECT {tableexpr}, {rowexpr}, walk.depth + 1 FROM walk {join} WHERE walk.depth < :maxdepth)
+SELECT nodetable, noderow, MIN(depth) AS depth FROM walk GROUP BY nodetable, noderow ORDER BY depth, nodetable, noderow;"""
+            rows = self._walk(sql,replacements)
+        nodes = self._getnodes([(tableid,rowid) for tableid,rowid,depth in rows])
+        result = [QueryResult() for depth in range(rows[-1][2]+1)]
+        for tableid,rowid,depth in rows:
+            node = nodes.get((tableid,rowid))
+            if node is not None: result[depth].append(node)
+        return result
+
+    def reachable(self, start, relations = None, direction = "both"):
+        """ Returns a QueryResult of every Node that can be reached from start (an AdvancedRow or a (table, rowid) tuple).
+
+            start itself is not included. relations and direction are the same as for traverse. Each Node is only
+            visited once, so this is cheaper than traverse when depths are not needed. Uses the adjacency cache if it
+            is enabled (see use_adjacency_cache).
+        """
+        key = self._nodekey(start)
+        if key is None: return QueryResult()
+        cache = self._adjacency()
+        if cache is not None:
+            rows = cache.reachable(key, relations = self._normalizerelations(relations), direction = direction)
+        else:
+            replacements = dict(starttable = key[0], startrow = key[1])
+            join,tableexpr,rowexpr = self._traversalstep("walk", relations, direction, replacements)
+            sql = f"""WITH RECURSIVE walk(nodetable, noderow) AS (
+SELECT :starttable, :startrow
+UNION SELECT {tableexpr}, {rowexpr} FROM walk {join})
+SELECT nodetable, noderow FROM walk WHERE NOT (nodetable = :starttable AND noderow = :startrow) ORDER BY nodetable, noderow;"""
+            rows = self._walk(sql,replacements)
+        nodes = self._getnodes(rows)
+        return QueryResult(nodes[key] for key in rows if key in nodes)
+
+    def shortest_path(self, start, end, relations = None, max_depth = None, direction = "both"):
+        """ Returns a QueryResult of the Nodes on a shortest path from start to end (inclusive), or None if there is no path.
+
+            start and end can be AdvancedRows or (table, rowid) tuples. relations and direction are the same as for traverse.
+            If max_depth is supplied, paths longer than max_depth edges are not considered (which is also faster when
+            end cannot be reached, since the reachability check is skipped).
+
+            Two recursive queries are used: the first is a breadth-first walk from start which stops as soon as it reaches
+            a neighbor of end (giving the distance between them), and the second rebuilds the path by collecting the
+            distances of the nodes closer than end and then stepping back from end to any neighbor one step closer to start.
+            If the adjacency cache is enabled (see use_adjacency_cache), a breadth-first search is performed in memory instead.
+        """
+        if max_depth is not None and (not isinstance(max_depth,int) or max_depth < 0):
+            raise ValueError("max_depth must be a non-negative integer")
+        startkey,endkey = self._nodekey(start),self._nodekey(end)
+        if startkey is None or endkey is None: return None
+        if startkey == endkey:
+            return QueryResult(self._getnodes([startkey,]).values())
+        if max_depth == 0: return None
+        cache = self._adjacency()
+        if cache is not None:
+            keys = cache.shortest_path(startkey, endkey, relations = self._normalizerelations(relations), max_depth = max_depth, direction = direction)
+            if keys is None: return None
+            nodes = self._getnodes(keys)
+            return QueryResult(nodes[key] for key in keys if key in nodes)
+        replacements = dict(starttable = startkey[0], startrow = startkey[1], endtable = endkey[0], endrow = endkey[1], maxdepth = max_depth)
+
+        ## Without a depth limit the breadth-first walk would never finish if end is not reachable, so reachability is checked first
+        if max_depth is None:
+            join,tableexpr,rowexpr = self._traversalstep("reach", relations, direction, replacements)
+            guard = f"""reach(nodetable, noderow) AS (
+SELECT :starttable, :startrow
+UNION SELECT {tableexpr}, {rowexpr} FROM reach {join}),
+"""
+            seed = "WHERE EXISTS (SELECT 1 FROM reach WHERE nodetable = :endtable AND noderow = :endrow)"
+            limit = ""
+        else:
+            guard,seed = "",""
+            limit = "WHERE walk.depth < :maxdepth - 1"
+        join,tableexpr,rowexpr = self._traversalstep("goal", relations, direction, replacements, reverse = True)
+        ends = f"""goal(nodetable, noderow) AS (SELECT :endtable, :endrow),
+ends(nodetable, noderow) AS (SELECT {tableexpr}, {rowexpr} FROM goal {join}),
+"""
+        join,tableexpr,rowexpr = self._traversalstep("walk", relations, direction, replacements)
+        sql = f"""WITH RECURSIVE {guard}{ends}walk(nodetable, noderow, depth) AS (
+SELECT :starttable, :startrow, 0 {seed}
+UNION SELECT {tableexpr}, {rowexpr}, walk.depth + 1 FROM walk {join} {limit} ORDER BY 3)
+SELECT depth + 1 FROM walk WHERE EXISTS (SELECT 1 FROM ends WHERE ends.nodetable = walk.nodetable AND ends.noderow = walk.noderow) LIMIT 1;"""
+        rows = self._walk(sql,replacements)
+        if not rows: return None
+        replacements['distance'] = rows[0][0]
+
+        join,tableexpr,rowexpr = self._traversalstep("near", relations, direction, replacements)
+        near = f"""near(nodetable, noderow, depth) AS (
+SELECT :starttable, :startrow, 0
+UNION SELECT {tableexpr}, {rowexpr}, near.depth + 1 FROM near {join} WHERE near.depth < :distance - 1),
+distance(nodetable, noderow, depth) AS (SELECT nodetable, noderow, MIN(depth) FROM near GROUP BY nodetable, noderow),
+"""
+        ## Every node at distance d > 0 has a neighbor at distance d - 1, so ordering by depth walks straight back to start
+        join,tableexpr,rowexpr = self._traversalstep("back", relations, direction, replacements, reverse = True)
+        sql = f"""WITH RECURSIVE {near}back(nodetable, noderow, depth, path) AS (
+SELECT :endtable, :endrow, :distance, '/' || :endtable || ':' || :endrow || '/'
+UNION ALL SELECT d.nodetable, d.noderow, d.depth, '/' || d.nodetable || ':' || d.noderow || back.path
+FROM back {join} JOIN distance AS d ON d.nodetable = {tableexpr} AND d.noderow = {rowexpr} AND d.depth = back.depth - 1
+WHERE back.depth > 0 ORDER BY 3)
+SELECT path FROM back WHERE depth = 0 LIMIT 1;"""
+        rows = self._walk(sql,replacements)
+        keys = [tuple(int(value) for value in key.split(":")) for key in rows[0][0].strip("/").split("/")]
+        nodes = self._getnodes(keys)
+        return QueryResult(nodes[key] for key in keys if key in nodes)
+
+class AdjacencyCache():
+    """ An in-memory index of graphdb_edges used by GraphDB when its adjacency cache is enabled (see GraphDB.use_adjacency_cache).
+
+        Nodes are referred to by (tableid, rowid) keys, which are mapped to consecutive integer indices. The Edges of
+        each Node are stored in compact (CSR-style) arrays: the entries of the Node at index i are
+        offsets[i]:offsets[i+1] of edges (the Edge id), others (the index of the Node on the other side of the Edge),
+        sides (1 if the Node is node1 of the Edge, 2 if it is node2), relations and otherrelations (the index of the
+        Node's and the other Node's relation key in relationkeys, or -1 if there is no relation), and names and othernames
+        (likewise for the relations as they were stored, in relationnames). Entries are grouped by Node and then by relation.
+
+        Edges which are added after the arrays are built are kept in a separate dict and removed Edges are skipped until
+        the arrays are rebuilt by compact (which happens automatically once enough changes have accumulated).
+        The traversal methods accept and return keys and mirror GraphDB's methods of the same names.
+    """
+    ## The fields of each entry, in order
+    FIELDS = ["relations","edges","others","sides","otherrelations","names","othernames"]
+
+    def __init__(self, rows = ()):
+        """ Builds the cache from rows of (edgeid, node1table, node1row, node1relation, node1key, node2table, node2row, node2relation, node2key) """
+        self.keys = []
+        self.indices = dict()
+        self.relationkeys = []
+        self.relationindices = dict()
+        self.relationnames = []
+        self.nameindices = dict()
+        entries = []
+        for edgeid,node1table,node1row,node1relation,node1key,node2table,node2row,node2relation,node2key in rows:
+            entries.extend(self._edgeentries(edgeid, (node1table,node1row), node1relation, node1key, (node2table,node2row), node2relation, node2key))
+        self._build(entries)
+
+    def _index(self, key):
+        """ Returns the index of the given (tableid, rowid) key, adding it if necessary """
+        index = self.indices.get(key)
+        if index is None:
+            index = self.indices[key] = len(self.keys)
+            self.keys.append(key)
+        return index
+
+    def _intern(self, value, values, indices):
+        """ Returns the index of value in the values list (adding it if necessary) or -1 for None """
+        if value is None: return -1
+        index = indices.get(value)
+        if index is None:
+            index = indices[value] = len(values)
+            values.append(value)
+        return index
+
+    def _relation(self, relationkey):
+        """ Returns the index of the given relation key, adding it if necessary (-1 for None) """
+        return self._intern(relationkey, self.relationkeys, self.relationindices)
+
+    def _edgeentries(self, edgeid, node1, node1relation, node1key, node2, node2relation, node2key):
+        """ Returns the (node, relation, edge, neighbor, side, otherrelation, name, othername) entries of both sides of an Edge """
+        node1,node2 = self._index(node1),self._index(node2)
+        key1,key2 = self._relation(node1key),self._relation(node2key)
+        name1,name2 = self._intern(node1relation, self.relationnames, self.nameindices),self._intern(node2relation, self.relationnames, self.nameindices)
+        return [(node1,key1,edgeid,node2,1,key2,name1,name2),(node2,key2,edgeid,node1,2,key1,name2,name1)]
+
+    def _build(self, entries):
+        """ Builds the arrays from a list of (node,) + entry tuples (see _edgeentries) """
+        entries.sort(key = lambda entry: entry[:2])
+        counts = [0] * (len(self.keys) + 1)
+        for entry in entries: counts[entry[0] + 1] += 1
+        for index in range(len(self.keys)): counts[index + 1] += counts[index]
+        self.offsets = array.array("q",counts)
+        for position,field in enumerate(self.FIELDS, start = 1):
+            setattr(self,field,array.array("b" if field == "sides" else "q",(entry[position] for entry in entries)))
+        self._added = dict()
+        self._removed = set()
+
+    def _entries(self, index):
+        """ Yields the (relation, edge, neighbor, side, otherrelation, name, othername) entries of the Node at the given index """
+        removed = self._removed
+        if index + 1 < len(self.offsets):
+            arrays = [getattr(self,field) for field in self.FIELDS]
+            edges = self.edges
+            for position in range(self.offsets[index],self.offsets[index + 1]):
+                if edges[position] in removed: continue
+                yield tuple(values[position] for values in arrays)
+        for entry in self._added.get(index,()):
+            if entry[1] not in removed: yield entry
+
+    def _pending(self):
+        return sum(len(entries) for entries in self._added.values()) + 2 * len(self._removed)
+
+    def add(self, edgeid, node1, node1relation, node1key, node2, node2relation, node2key):
+        """ Adds an Edge between the node1 and node2 (tableid, rowid) keys (with the given relations and relation keys) """
+        ## sqlite reuses the largest rowid if it is deleted
+        if edgeid in self._removed: self.compact()
+        for entry in self._edgeentries(edgeid, node1, node1relation, node1key, node2, node2relation, node2key):
+            self._added.setdefault(entry[0],[]).append(entry[1:])
+        self._checkpending()
+
+    def remove(self, edgeids):
+        """ Removes the Edges with the given ids """
+        self._removed.update(edgeids)
+        self._checkpending()
+
+    def _checkpending(self):
+        if self._pending() > max(1024,len(self.edges) // 4): self.compact()
+
+    def compact(self):
+        """ Rebuilds the arrays to include added Edges and drop removed ones """
+        entries = [(index,) + entry for index in range(len(self.keys)) for entry in self._entries(index)]
+        self._build(entries)
+
+    def _filters(self, relations, direction):
+        """ Returns the relation indices (or None for any relation) and sides which the traversal methods should follow """
+        if direction not in TRAVERSALDIRECTIONS:
+            raise ValueError(f"Invalid direction: {direction} (must be one of {', '.join(TRAVERSALDIRECTIONS)})")
+        sides = {"both":(1,2),"out":(1,),"in":(2,)}[direction]
+        if relations is None: return None,sides
+        if isinstance(relations,str): relations = [relations,]
+        return set(self.relationindices[key] for key in map(normalizerelation,relations) if key in self.relationindices),sides
+
+    def _step(self, index, relations, sides):
+        """ Yields the indices of the Nodes one step away from the Node at the given index """
+        ## Only the needed arrays are read, as this is used by every traversal
+        removed = self._removed
+        if index + 1 < len(self.offsets):
+            relationvalues,edges,others,sidevalues = self.relations,self.edges,self.others,self.sides
+            for position in range(self.offsets[index],self.offsets[index + 1]):
+                if sidevalues[position] in sides and (relations is None or relationvalues[position] in relations) and edges[position] not in removed:
+                    yield others[position]
+        for entry in self._added.get(index,()):
+            if entry[3] in sides and (relations is None or entry[0] in relations) and entry[1] not in removed: yield entry[2]
+
+    def neighbors(self, key, relations = None, direction = "both"):
+        """ Returns a list of (edgeid, neighbor key) tuples for the given (tableid, rowid) key """
+        index = self.indices.get(key)
+        if index is None: return []
+        relations,sides = self._filters(relations,direction)
+        keys = self.keys
+        return [(entry[1],keys[entry[2]]) for entry in self._entries(index)
+                if entry[3] in sides and (relations is None or entry[0] in relations)]
+
+    def incident(self, key, relations = None, direction = "both", reverse = False):
+        """ Returns a list of (side, row) tuples for the Edges of the given (tableid, rowid) key.
+
+            side is the key's side of the Edge and row is a dict of the Edge's values in graphdb_edges (including its rowid).
+            relations and direction work as in GraphDB.incident_edges: relations are matched against the key's relation,
+            or against the other Node's relation if reverse is True.
+        """
+        index = self.indices.get(key)
+        if index is None: return []
+        relations,sides = self._filters(relations,direction)
+        field = 4 if reverse else 0
+        keys,relationkeys,relationnames = self.keys,self.relationkeys,self.relationnames
+        result = []
+        for entry in self._entries(index):
+            relation,edge,neighbor,side,otherrelation,name,othername = entry
+            if side not in sides or (relations is not None and entry[field] not in relations): continue
+            nodes = {side:(key,name,relation),3-side:(keys[neighbor],othername,otherrelation)}
+            row = {"rowid":edge}
+            for nodeside,(nodekey,name,relation) in nodes.items():
+                row[f"node{nodeside}table"],row[f"node{nodeside}row"] = nodekey
+                row[f"node{nodeside}relation"] = relationnames[name] if name >= 0 else None
+                row[f"node{nodeside}key"] = relationkeys[relation] if relation >= 0 else None
+            result.append((side,row))
+        return result
+
+    def traverse(self, key, relations = None, max_depth = 1, direction = "both"):
+        """ Returns a list of lists of keys, where index i contains the (sorted) keys whose shortest distance from key is i """
+        relations,sides = self._filters(relations,direction)
+        levels = [[key,]]
+        index = self.indices.get(key)
+        if index is None: return levels
+        seen = {index}
+        level = [index]
+        for depth in range(max_depth):
+            found = []
+            for current in level:
+                for neighbor in self._step(current,relations,sides):
+                    if neighbor not in seen:
+                        seen.add(neighbor)
+                        found.append(neighbor)
+            if not found: break
+            levels.append(sorted(self.keys[neighbor] for neighbor in found))
+            level = found
+        return levels
+
+    def reachable(self, key, relations = None, direction = "both"):
+        """ Returns a sorted list of the keys which can be reached from key (not including key) """
+        relations,sides = self._filters(relations,direction)
+        index = self.indices.get(key)
+        if index is None: return []
+        seen = {index}
+        queue = [index]
+        while queue:
+            current = queue.pop()
+            for neighbor in self._step(current,relations,sides):
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+        seen.discard(index)
+        return sorted(self.keys[neighbor] for neighbor in seen)
+
+    def shortest_path(self, start, end, relations = None, max_depth = None, direction = "both"):
+        """ Returns a list of the keys on a shortest path from start to end (inclusive), or None if there is no path """
+        relations,sides = self._filters(relations,direction)
+        if start == end: return [start,]
+        startindex,endindex = self.indices.get(start),self.indices.get(end)
+        if startindex is None or endindex is None: return None
+        parents = {startindex:None}
+        queue = collections.deque([(startindex,0)])
+        while queue:
+            current,depth = queue.popleft()
+            if max_depth is not None and depth >= max_depth: continue
+            for neighbor in self._step(current,relations,sides):
+                if neighbor in parents: continue
+                parents[neighbor] = current
+                if neighbor == endindex:
+                    path = []
+                    while neighbor is not None:
+                        path.append(self.keys[neighbor])
+                        neighbor = parents[neighbor]
+                    return path[::-1]
+                queue.append((neighbor,depth + 1))
+        return None
+
 class Edge(AdvancedRow):
     """ A represnetation of an Edge.
 
-        Maintains references to both Nodes (which are AdvancedRow objects)
+        Maintains references to both Nodes (which are AdvancedRow objects).
+        Nodes loaded by GraphDB.neighbors are cached on the Edge.
     """
-    def __init__(self, table, cursor, row):
-        super().__init__(table, cursor, row)
+    def __init__(self, table, cursor, row, columnindex = None):
+        super().__init__(table, cursor, row, columnindex = columnindex)
         self._node1tableref = None
         self._node2tableref = None
+        self._nodecache = dict()
+
+    def _side(self,node):
+        """ Returns which side of the Edge (1 or 2) the given node is on, without loading either of the Edge's Nodes """
+        if isinstance(node,AdvancedRow):
+            key = self.table.database._nodekey(node)
+            for side in (1,2):
+                if key == (self._getvalue(f"node{side}table"),self._getvalue(f"node{side}row")): return side
+        raise ValueError("Node is not part of this edge.")
 
     def noderelation(self,node): 
         """ Since it may not be obvious which order the nodes are in,
@@ -180,39 +1121,39 @@ class Edge(AdvancedRow):
             a node in the Edge.
             
         """
-        if node == self.node1:
+        if self._side(node) == 1:
             return self.node1relation
-        if node == self.node2:
-            return self.node2relation
-        raise ValueError("Node is not part of this edge.")
+        return self.node2relation
 
     def other(self,node):
         """ Since it may not be obvious which order the nodes are in,
             this is a method for determing the other node in the Edge.
             
         """
-        if node == self.node1:
+        if self._side(node) == 1:
             return self.node2
-        if node == self.node2:
-            return self.node1
-        raise ValueError("Node is not part of this edge.")
+        return self.node1
 
     def __getattribute__(self, name):
         ## Save some steps for known attrs
-        if name.startswith("__") or name in ['table','cursor','row']:
+        if name.startswith("__") or name in ['table','row']:
             return super().__getattribute__(name)
-        if name in ['_node1tableref','_node2tableref']:
+        if name in ['_node1tableref','_node2tableref','_nodecache']:
             return self.__dict__[name]
 
         if name == 'node1':
+            if 1 in self._nodecache: return self._nodecache[1]
             if not self._node1tableref:
-                self._node1tableref = self.table.database.getadvancedtable(self.node1table)
+                db = self.table.database
+                self._node1tableref = db.getadvancedtable(db.tablename(self.node1table))
             _node1tableref = self._node1tableref
             with temp_row_factory(self._node1tableref,node_factory):
                 return self._node1tableref.quickselect(pk = self.node1row).first()
         elif name == 'node2':
+            if 2 in self._nodecache: return self._nodecache[2]
             if not self._node2tableref:
-                self._node2tableref = self.table.database.getadvancedtable(self.node2table)
+                db = self.table.database
+                self._node2tableref = db.getadvancedtable(db.tablename(self.node2table))
             _node2tableref = self._node2tableref
             with temp_row_factory(self._node2tableref,node_factory):
                 return self._node2tableref.quickselect(pk = self.node2row).first()
@@ -222,8 +1163,8 @@ class Edge(AdvancedRow):
 edge_factory = AdvancedRow_Factory(Edge)
 
 class Node(AdvancedRow):
-    def __init__(self, table, cursor, row):
-        super().__init__(table, cursor, row)
+    def __init__(self, table, cursor, row, columnindex = None):
+        super().__init__(table, cursor, row, columnindex = columnindex)
 
     def __getattribute__(self,name):
         result = None
@@ -234,7 +1175,7 @@ class Node(AdvancedRow):
         except AttributeError as e:
             db = self.table.database
             if name == "edges":
-                result = db.getedge(node1 = self) + db.getedge(node2 = self)
+                result = db.incident_edges(self)
                 return result
             else:
                 result = parse_nodeattr(self,name)
@@ -250,32 +1191,22 @@ class Node(AdvancedRow):
 node_factory = AdvancedRow_Factory(Node)
 
 def parse_nodeattr(node,name):
-    """ Attempts to parse the given attribute name into meaningful attributes """
+    """ Attempts to parse the given attribute name into meaningful attributes.
+
+        The name is first treated as the node's relation in its Edges. Failing that, if the name ends with the "this" keyword
+        (i.e.- "likes__this") it returns the Edges where the other node has the relation. Names which are not known relations
+        (see GraphDB.isrelation) are rejected without querying the database; otherwise a single query is made.
+    """
     db = node.table.database
-    def _normal():
-        """ Simply try to using the attribute name """
-        return db.getedge(node1 = node, node1relation__like = name) + db.getedge(node2 = node, node2relation__like = name)
-    def _replace_whitespace():
-        """ Replace underscores in attribute name with a space """
-        name2 = name.replace("_"," ")
-        return db.getedge(node1 = node, node1relation__like = name2) + db.getedge(node2 = node, node2relation__like = name2)
-    def _check_keywords():
-        """ Check if there are special keywords at the end """
-        segments = name.split("__")
-        ## Currently this method only supports one keyword
-        ## This may be extended in the future
-        if len(segments) != 2: return
-        name2,keyword = segments
-        if keyword != "this": return
-        ## The "this" keyword checks the reverse relations
-        results = db.getedge(node1 = node, node2relation__like = name2) + db.getedge(node2 = node, node1relation__like = name2)
-        ## try without replacement
-        if results: return results
-        ## if that fails, try with whitespace replacement
-        name2 = name2.replace("_"," ")
-        return db.getedge(node1 = node, node2relation__like = name2) + db.getedge(node2 = node, node1relation__like = name2)
-    for meth in [_normal,
-                 _replace_whitespace,
-                 _check_keywords]:
-        result = meth()
-        if result: return result
\ No newline at end of file
+    if db.isrelation(name):
+        result = db.incident_edges(node, relations = name)
+        if result: return result
+    segments = name.split("__")
+    ## Currently this method only supports one keyword
+    ## This may be extended in the future
+    if len(segments) != 2: return
+    name2,keyword = segments
+    if keyword != "this": return
+    ## The "this" keyword checks the reverse relations
+    if db.isrelation(name2):
+        return db.incident_edges(node, relations = name2, reverse = True)
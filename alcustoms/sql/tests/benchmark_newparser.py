@@ -0,0 +1,41 @@
+""" Benchmarks for alcustoms.sql.newparser
+
+    Times parsing of wide Table definitions (up to 1600 columns) with
+    columns of increasing complexity.
+
+    Usage: python benchmark_newparser.py [number of runs]
+"""
+## This Module
+from alcustoms.sql.newparser import Parser
+
+## Builtin
+import sys
+import timeit
+
+COLUMNDEFINITIONS = {
+    "simple": "column{i} TEXT",
+    "constraints": "column{i} TEXT NOT NULL DEFAULT 'value{i}'",
+    "references": "column{i} INTEGER REFERENCES other{i}(id) ON DELETE CASCADE",
+    "complex": "column{i} TEXT NOT NULL DEFAULT 'value{i}' CHECK (column{i} != '') REFERENCES other{i}(id)",
+    }
+
+def widetable(columns, columndefinition):
+    """ Returns a Table definition with the given number of columns """
+    columndefs = ",\n".join("    "+columndefinition.format(i = i) for i in range(columns))
+    return f"""CREATE TABLE widetable (
+    id INTEGER PRIMARY KEY,
+{columndefs},
+    UNIQUE (column0,column1) ON CONFLICT REPLACE
+);"""
+
+def main(number = 20):
+    for name,columndefinition in COLUMNDEFINITIONS.items():
+        for columns in (50,200,400,1600):
+            definition = widetable(columns, columndefinition)
+            ## Best of 5 runs
+            t = min(timeit.repeat(lambda: Parser(definition).obj, number = number, repeat = 5)) / number
+            print(f"{name:>11} {columns:>4} columns: {t*1000:8.2f}ms")
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    main(number)
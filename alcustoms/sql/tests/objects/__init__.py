@@ -59,5 +59,42 @@ class Advanced_RowIDCase(unittest.TestCase):
         self.assertIsInstance(row,sql.AdvancedRow)
         self.assertEqual(row,self.table1.quickselect(pk = result3).first())
 
+class AdvancedRowCase(unittest.TestCase):
+    """ Test Case for the storage of AdvancedRow's values """
+    def setUp(self):
+        self.db = sql.Database(":memory:")
+        self.db.addtables(sql.Table("""CREATE TABLE test (a TEXT, b INT);"""))
+        self.table = self.db.getadvancedtable("test")
+        self.table.addmultiple(dict(a = "Hello", b = 1), dict(a = "World", b = 2))
+        self.table.row_factory = sql.advancedrow_factory
+        return super().setUp()
+
+    def test_compact(self):
+        """ Tests that AdvancedRows do not have an instance dict and that rows from the same query share their column index """
+        row1,row2 = self.table.selectall()
+        self.assertFalse(hasattr(row1,"__dict__"))
+        self.assertIs(row1._index,row2._index)
+        self.assertEqual(list(row1._index),["rowid","a","b"])
+
+    def test_lazyrow(self):
+        """ Tests that the row's dict is only created when requested """
+        row = self.table.selectall().first()
+        self.assertEqual(row.a,"Hello")
+        self.assertEqual(row.pk,1)
+        self.assertIsNone(row._row)
+        self.assertEqual(row.row,dict(rowid = 1, a = "Hello", b = 1))
+        self.assertEqual(list(row.row),["rowid","a","b"])
+        self.assertIsNotNone(row._row)
+        self.assertIs(row.row,row.row)
+
+    def test_equality(self):
+        """ Tests that rows are equal regardless of which query they came from """
+        rows = self.table.selectall()
+        self.assertEqual(rows[0],self.table.quickselect(a = "Hello").first())
+        self.assertNotEqual(rows[0],rows[1])
+        self.assertEqual(rows[1],dict(rowid = 2, a = "World", b = 2))
+        rows[1].row
+        self.assertEqual(rows[1],self.table.selectall()[1])
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
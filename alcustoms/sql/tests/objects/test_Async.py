@@ -0,0 +1,123 @@
+## Test Target
+from alcustoms.sql.objects import Async
+## Test Framework
+import unittest
+
+## Testing Utilities
+from alcustoms.sql.tests import utils
+
+## Sister Modules
+from alcustoms import sql
+
+## Builtin
+import asyncio
+
+class AsyncDatabaseCase(unittest.IsolatedAsyncioTestCase):
+    """ TestCase for AsyncDatabase and AsyncAdvancedTable using an in-memory database """
+    async def asyncSetUp(self):
+        self.db = Async.AsyncDatabase(":memory:", row_factory = sql.advancedrow_factory)
+        await self.db.run(lambda db: db.execute(utils.TESTTABLESQL), write = True)
+        self.table = await self.db.getadvancedtable("testtable")
+
+    async def asyncTearDown(self):
+        await self.db.close()
+
+    async def test_getadvancedtable(self):
+        """ Tests that getadvancedtable returns an AsyncAdvancedTable and raises for missing tables """
+        self.assertIsInstance(self.table,Async.AsyncAdvancedTable)
+        with self.assertRaises(ValueError):
+            await self.db.getadvancedtable("notatable")
+
+    async def test_methods(self):
+        """ Tests the basic awaitable AdvancedTable methods """
+        rowid = await self.table.addrow(name = "Hello", value = 1)
+        self.assertEqual(rowid,1)
+        await self.table.addmultiple(dict(name = "World", value = 2), dict(name = "Foo", value = 3))
+        rows = await self.table.quickselect(value__gt = 1)
+        self.assertEqual([row.name for row in rows],["World","Foo"])
+        row = await self.table.get(rowid)
+        self.assertEqual(row.name,"Hello")
+        await self.table.quickupdate(WHERE = dict(name = "Foo"), value = 10)
+        self.assertEqual((await self.table.quickselect(name = "Foo")).first().value,10)
+        await self.table.quickdelete(name = "World")
+        self.assertEqual(len(await self.table.selectall()),2)
+        rows = await self.table.select(query = "value = :value", replacements = dict(value = 10))
+        self.assertEqual(rows.first().name,"Foo")
+
+    async def test_stream(self):
+        """ Tests that iquickselect and iselect can be used as async iterators """
+        await self.table.addmultiple(*[dict(name = str(i), value = i) for i in range(25)])
+        rows = [row.value async for row in self.table.iquickselect(value__lt = 20, batch_size = 7)]
+        self.assertEqual(rows,list(range(20)))
+        rows = [row.value async for row in self.table.iselect(batch_size = 10)]
+        self.assertEqual(rows,list(range(25)))
+
+    async def test_expressions(self):
+        """ Tests that Q expressions can be passed positionally to the quick* methods """
+        await self.table.addmultiple(*[dict(name = str(i), value = i) for i in range(10)])
+        rows = await self.table.quickselect(sql.Q(value = 1) | sql.Q(value = 8))
+        self.assertEqual([row.value for row in rows],[1,8])
+        rows = [row.value async for row in self.table.iquickselect(sql.Q(value__lt = 2) | sql.Q(value__gt = 7), batch_size = 3)]
+        self.assertEqual(rows,[0,1,8,9])
+        await self.table.quickdelete(sql.Q(value__lt = 3) | sql.Q(name = "9"))
+        self.assertEqual([row.value for row in await self.table.selectall()],list(range(3,9)))
+
+    async def test_concurrent(self):
+        """ Tests that concurrent calls on an in-memory database are serialized on its worker thread """
+        await asyncio.gather(*[self.table.addrow(name = str(i), value = i) for i in range(10)])
+        results = await asyncio.gather(*[self.table.quickselect(value__lt = 5) for i in range(5)],
+                                       self.collect(self.table.iquickselect(batch_size = 3)))
+        self.assertTrue(all(len(result) == 5 for result in results[:-1]))
+        self.assertEqual(sorted(results[-1]),list(range(10)))
+        self.assertIsInstance(self.db._slots(),Async._NullSlots)
+
+    async def collect(self, stream):
+        return [row.value async for row in stream]
+
+    async def test_rollback(self):
+        """ Tests that writes are rolled back when they raise an Exception """
+        def badwrite(db):
+            db.getadvancedtable("testtable").addrow(name = "Hello", value = 1)
+            raise RuntimeError()
+        with self.assertRaises(RuntimeError):
+            await self.db.run(badwrite, write = True)
+        self.assertEqual(len(await self.table.selectall()),0)
+
+class AsyncDatabasePoolCase(unittest.IsolatedAsyncioTestCase):
+    """ TestCase for AsyncDatabase using a database file (and therefore a DatabasePool) """
+    @utils.filemanager
+    async def test_pool(self, file):
+        """ Tests that reads overlap with each other and see committed writes """
+        async with Async.AsyncDatabase(file, readers = 2, row_factory = sql.advancedrow_factory) as db:
+            self.assertIsNotNone(db.pool)
+            await db.run(lambda db: db.execute(utils.TESTTABLESQL), write = True)
+            table = await db.getadvancedtable("testtable")
+            await table.addmultiple(*[dict(name = str(i), value = i) for i in range(100)])
+            results = await asyncio.gather(*[table.quickselect(value__lt = 50) for i in range(4)])
+            self.assertTrue(all(len(result) == 50 for result in results))
+            self.assertEqual(db.pool.stats()['readers']['acquisitions'],5)
+
+    @utils.filemanager
+    async def test_stream_reads(self, file):
+        """ Tests that open streams can continue while other reads are waiting for a reader (regression test for a deadlock) """
+        async with Async.AsyncDatabase(file, readers = 2, row_factory = sql.advancedrow_factory) as db:
+            await db.run(lambda db: db.execute(utils.TESTTABLESQL), write = True)
+            table = await db.getadvancedtable("testtable")
+            await table.addmultiple(*[dict(name = str(i), value = i) for i in range(20)])
+            streams = [table.iquickselect(batch_size = 5) for i in range(2)]
+            for stream in streams:
+                self.assertEqual((await asyncio.wait_for(stream.__anext__(), 5)).value,0)
+            reads = asyncio.gather(*[table.quickselect(value__lt = 10) for i in range(3)])
+            await asyncio.sleep(.1)
+            for stream in streams:
+                rows = await asyncio.wait_for(self.collect(stream), 5)
+                self.assertEqual(rows,list(range(1,20)))
+            results = await asyncio.wait_for(reads, 5)
+            self.assertTrue(all(len(result) == 10 for result in results))
+            self.assertEqual(len(await asyncio.wait_for(table.quickselect(), 5)),20)
+
+    async def collect(self, stream):
+        return [row.value async for row in stream]
+
+if __name__ == "__main__":
+    unittest.main()
@@ -268,6 +268,54 @@ class DatabaseObjectCase2(unittest.TestCase):
         ## The malformed table should be in fail
         self.assertListEqual(fail,[badtesttable,])
 
+class SchemaCacheCase(unittest.TestCase):
+    """ Tests for the Database's SchemaCache """
+    def setUp(self):
+        utils.setupconnection(self)
+        return super().setUp()
+
+    def test_gettable_cached(self):
+        """ Tests that gettable caches its Tables and returns copies of the cached Table """
+        table1 = self.connection.gettable("testtable")
+        self.assertIn("testtable",self.connection.schemacache.tables)
+        table2 = self.connection.gettable("testtable")
+        self.assertEqual(table1,table2)
+        self.assertIsNot(table1,table2)
+        self.assertIsNot(table1,self.connection.schemacache.tables["testtable"])
+
+    def test_getadvancedtable_cached(self):
+        """ Tests that getadvancedtable returns separate AdvancedTables which do not share row_factories """
+        table1 = self.connection.getadvancedtable("testtable")
+        table2 = self.connection.getadvancedtable("testtable")
+        self.assertEqual(table1,table2)
+        self.assertIsNot(table1,table2)
+        table1.row_factory = objects.dict_factory
+        self.assertIsNone(table2.row_factory)
+        self.assertIsNone(self.connection.getadvancedtable("testtable").row_factory)
+
+    def test_schemaversion(self):
+        """ Tests that the cache is invalidated when the schema is changed outside of the Database's methods """
+        table = self.connection.gettable("testtable")
+        self.assertNotIn("other",table.columns)
+        ## Bypassing AdvancedTable.addcolumn
+        self.connection.execute("""ALTER TABLE testtable ADD COLUMN other TEXT;""")
+        table = self.connection.gettable("testtable")
+        self.assertIn("other",table.columns)
+        table = self.connection.getadvancedtable("testtable")
+        self.assertIn("other",table.columns)
+
+    def test_addcolumn(self):
+        """ Tests that AdvancedTable.addcolumn is reflected by subsequent gettable calls """
+        table = self.connection.getadvancedtable("testtable")
+        table.addcolumn("other TEXT")
+        self.assertIn("other",self.connection.gettable("testtable").columns)
+
+    def test_removetable(self):
+        """ Tests that removed tables are not returned from the cache """
+        self.connection.gettable("testtable")
+        self.connection.removetable("testtable")
+        self.assertRaisesRegex(ValueError,"Table .* does not exist",self.connection.gettable,"testtable")
+
 class DatabaseObjectCase3(unittest.TestCase):
     def setUp(self):
         utils.setupconnection(self)
@@ -307,4 +355,68 @@ class DatabaseObjectCase3(unittest.TestCase):
         ## it's not part of the table_constructor
         table4 = self.connection.getadvancedtable("testtable4")
         self.assertNotIsInstance(table4,AdvancedTestTable)
-        self.assertFalse(hasattr(table4,"test_true"))
\ No newline at end of file
+        self.assertFalse(hasattr(table4,"test_true"))
+
+class DatabasePoolCase(unittest.TestCase):
+    """ TestCase for DatabasePool """
+    def test_memory(self):
+        """ Tests that DatabasePool cannot be used with an in-memory database """
+        self.assertRaises(ValueError, Connection.DatabasePool, ":memory:")
+
+    @utils.filemanager
+    def test_readerwriter(self, file):
+        """ Tests that the pool uses WAL mode, that readers cannot write, and that the writer commits on exit """
+        with Connection.DatabasePool(file, readers = 2, row_factory = sql.advancedrow_factory) as pool:
+            with pool.writer() as db:
+                self.assertEqual(db.execute("""PRAGMA journal_mode;""").fetchone()['journal_mode'],"wal")
+                db.addtables(sql.Table(utils.TESTTABLESQL))
+                db.getadvancedtable("testtable").addrow(name = "Hello", value = 1)
+            with pool.reader() as db:
+                self.assertIsInstance(db,Connection.Database)
+                table = db.getadvancedtable("testtable")
+                self.assertEqual(table.selectall().first().name,"Hello")
+                self.assertRaises(sql.OperationalError, table.addrow, name = "World", value = 2)
+                db.row_factory = None
+            ## Row factory is reset when the connection is returned
+            with pool.reader() as db:
+                self.assertIsInstance(db.row_factory,objects.AdvancedRow_Factory)
+
+            ## Writer does not commit if an error is raised
+            def badwrite():
+                with pool.writer() as db:
+                    db.getadvancedtable("testtable").addrow(name = "World", value = 2)
+                    raise RuntimeError()
+            self.assertRaises(RuntimeError,badwrite)
+            with pool.reader() as db:
+                self.assertEqual(len(db.getadvancedtable("testtable").selectall()),1)
+
+    @utils.filemanager
+    def test_metrics(self, file):
+        """ Tests that the pool records wait metrics and times out when no connections are available """
+        with Connection.DatabasePool(file, readers = 1, timeout = 0.1) as pool:
+            db = pool.acquire()
+            self.assertRaises(Connection.PoolTimeout, pool.acquire)
+            pool.release(db)
+            with pool.writer():
+                self.assertRaises(Connection.PoolTimeout, pool.acquire, write = True)
+            stats = pool.stats()
+            self.assertEqual(stats['readers']['acquisitions'],1)
+            self.assertEqual(stats['readers']['timeouts'],1)
+            self.assertEqual(stats['writer']['acquisitions'],1)
+            self.assertEqual(stats['writer']['timeouts'],1)
+            pool.resetstats()
+            self.assertEqual(pool.stats()['readers']['acquisitions'],0)
+
+    @utils.filemanager
+    def test_release_foreign(self, file):
+        """ Tests that a pool will not accept connections which it did not open """
+        with Connection.DatabasePool(file, readers = 1, timeout = 0.1) as pool:
+            db = Connection.Database(file)
+            try: self.assertRaises(ValueError, pool.release, db)
+            finally: db.close()
+            with Connection.DatabasePool(file, readers = 1) as other:
+                with other.reader() as reader:
+                    self.assertRaises(ValueError, pool.release, reader)
+            ## The pool's own reader is unaffected
+            with pool.reader() as reader:
+                self.assertTrue(any(reader is connection for connection in pool._connections))
@@ -0,0 +1,149 @@
+## Test Target
+from alcustoms.sql.objects import Index
+## Test Framework
+import unittest
+
+## Testing Utilities
+from alcustoms.sql.tests import utils
+
+## Sister Modules
+from alcustoms import sql
+from alcustoms.sql.objects import Table
+
+class IndexCase(unittest.TestCase):
+    """ TestCase for parsing and creating Index objects """
+    def test_parse(self):
+        """ Tests that CREATE INDEX statements are parsed correctly """
+        for (definition,name,table,columns,unique,where,existsok,schema) in [
+            ("""CREATE INDEX testindex ON testtable (name);""","testindex","testtable",[("name",None,None)],False,None,False,None),
+            ("""CREATE UNIQUE INDEX IF NOT EXISTS main.testindex ON testtable(name COLLATE NOCASE DESC, value ASC)""","testindex","testtable",[("name","NOCASE","DESC"),("value",None,"ASC")],True,None,True,"main"),
+            ("""create index "test index" on testtable (lower(name), abs(value + 1)) where value > 10 AND name IS NOT NULL;""","test index","testtable",[("lower(name)",None,None),("abs(value + 1)",None,None)],False,"value > 10 AND name IS NOT NULL",False,None),
+            ]:
+            with self.subTest(definition = definition):
+                index = Index.Index.from_definition(definition)
+                self.assertIsInstance(index,Index.Index)
+                self.assertEqual(index.name,name)
+                self.assertEqual(index.table,table)
+                self.assertEqual([tuple(column) for column in index.columns],columns)
+                self.assertEqual(index.unique,unique)
+                self.assertEqual(index.where,where)
+                self.assertEqual(index.existsok,existsok)
+                self.assertEqual(index.schema,schema)
+                ## Definition should produce an equivalent Index
+                self.assertEqual(Index.Index.from_definition(index.definition),index)
+                ## from_definition is also available on instances
+                self.assertEqual(index.from_definition(index.definition),index)
+
+    def test_bad(self):
+        """ Tests that invalid Indexes raise errors """
+        self.assertRaises(ValueError, Index.Index.from_definition, """CREATE INDEX testindex ON testtable;""")
+        self.assertRaises(ValueError, Index.Index.from_definition, """CREATE TABLE testtable (name TEXT);""")
+        self.assertRaises(ValueError, Index.Index, "testindex", "testtable", [Index.IndexedColumn("name",None,"UP")])
+        self.assertRaises(AttributeError, lambda: Index.Index("testindex", columns = ["name"]).definition)
+        self.assertRaises(AttributeError, lambda: Index.Index("testindex", "testtable").definition)
+
+    def test_equality(self):
+        """ Tests that Index equality ignores case, default sort order, whitespace and existsok """
+        index = Index.Index("testindex","testtable",["name","value"], where = "value > 1")
+        self.assertEqual(index,Index.Index("TestIndex","TESTTABLE",[Index.IndexedColumn("NAME",None,"ASC"),"value"], where = "value  >  1", existsok = True))
+        self.assertNotEqual(index,Index.Index("testindex","testtable",["value","name"], where = "value > 1"))
+        self.assertNotEqual(index,Index.Index("testindex","testtable",["name","value"], where = "value > 1", unique = True))
+        self.assertNotEqual(index,Index.Index("testindex","testtable",["name","value"]))
+
+class TableIndexCase(unittest.TestCase):
+    """ TestCase for Indexes declared on Tables and TableConstructors """
+    def setUp(self):
+        utils.setupconnection(self)
+        return super().setUp()
+
+    def test_gettable(self):
+        """ Tests that Tables retrieved from the Database include their Indexes """
+        self.assertEqual(self.connection.gettable("testtable").indexes,[])
+        index = self.connection.addindex("""CREATE INDEX testindex ON testtable (name);""")
+        table = self.connection.gettable("testtable")
+        self.assertEqual(table.indexes,[index])
+        self.assertEqual(self.connection.getadvancedtable("testtable").indexes,[index])
+        self.assertEqual(self.connection.getindexes(),[index])
+        self.connection.removeindex("testindex")
+        self.assertEqual(self.connection.gettable("testtable").indexes,[])
+
+    def test_constructor(self):
+        """ Tests that Indexes declared on a TableConstructor are created by addtables and checked by validatetable """
+        constructor = Table.TableConstructor("indextable", columns = dict(name = "TEXT", value = "INTEGER"))
+        index = constructor.addindex(Index.Index("indextable_name_idx", columns = ["name"]))
+        self.assertEqual(index.table,"indextable")
+        constructor.addindex("""CREATE UNIQUE INDEX indextable_value_idx ON indextable (value DESC);""")
+        self.assertRaises(ValueError, constructor.addindex, """CREATE INDEX otherindex ON testtable (name);""")
+
+        success,fail = self.connection.addandvalidatetables(constructor)
+        self.assertEqual(success,[constructor])
+        table = self.connection.gettable("indextable")
+        self.assertEqual(len(table.indexes),2)
+        self.assertTrue(self.connection.validatetable(table.to_constructor()))
+
+        ## Missing Indexes fail validation
+        self.connection.removeindex("indextable_value_idx")
+        self.assertFalse(self.connection.validatetable(constructor))
+        ## Tables which exist are still given their missing indexes
+        constructor.existsok = True
+        success,fail = self.connection.addandvalidatetables(constructor)
+        self.assertEqual(success,[constructor])
+
+        ## Undeclared indexes do not fail validation
+        self.assertTrue(self.connection.validatetable(Table.TableConstructor("indextable", columns = dict(name = "TEXT", value = "INTEGER"))))
+
+    def test_constructor_bad(self):
+        """ Tests that a table is not created if one of its Indexes fails """
+        constructor = Table.TableConstructor("badindextable", columns = dict(name = "TEXT"))
+        constructor.addindex(Index.Index("badindextable_name_idx", columns = ["name"]))
+        constructor.addindex(Index.Index("badindextable_bad_idx", columns = ["name"], where = "notacolumn > 1"))
+        success,fail = self.connection.addtables(constructor)
+        self.assertEqual((success,fail),([],[constructor]))
+        self.assertRaises(ValueError, self.connection.gettable, "badindextable")
+        self.assertEqual(self.connection.execute("""SELECT name FROM sqlite_master WHERE tbl_name = 'badindextable';""").fetchall(),[])
+
+        ## Exceptions which are not sqlite Errors are raised, but still do not leave the table behind
+        constructor = Table.TableConstructor("badindextable", columns = dict(name = "TEXT"))
+        constructor.addindex(Index.Index("badindextable_name_idx", columns = ["name"]))
+        constructor.addindex(Index.Index("badindextable_empty_idx"))
+        self.assertRaises(AttributeError, self.connection.addtables, constructor)
+        self.assertFalse(self.connection.in_transaction)
+        self.assertEqual(self.connection.execute("""SELECT name FROM sqlite_master WHERE tbl_name = 'badindextable';""").fetchall(),[])
+
+class IndexAdvisorCase(unittest.TestCase):
+    """ TestCase for the IndexAdvisor """
+    def setUp(self):
+        utils.setupconnection(self)
+        utils.populatetesttable(self)
+        self.table = self.connection.getadvancedtable("testtable")
+        return super().setUp()
+
+    def test_advisor(self):
+        """ Tests that the IndexAdvisor records query shapes and suggests indexes for full table scans """
+        advisor = self.connection.startindexadvisor()
+        self.table.quickselect(name = "Hello", value__gt = 1)
+        self.table.quickselect(value__gt = 10, name = "World")
+        self.table.quickselect(name__like = "%Hello%")
+        self.table.quickselect(pk = 1)
+        self.table.quickdelete(value = 100)
+        self.assertEqual(sum(advisor.shapes.values()),5)
+
+        suggestions = advisor.suggest()
+        indexes = [suggestion.index for suggestion in suggestions]
+        ## Same shape regardless of keyword order: equality column first, then range column
+        self.assertEqual(suggestions[0].count,2)
+        self.assertEqual([column.name for column in indexes[0].columns],["name","value"])
+        self.assertIn(["value"],[[column.name for column in index.columns] for index in indexes])
+        ## LIKE and rowid lookups cannot be improved
+        self.assertEqual(len(indexes),2)
+
+        self.assertEqual(advisor.apply(minimum = 2),[indexes[0]])
+        self.assertEqual(self.connection.getindexes("testtable"),[indexes[0]])
+        self.assertEqual([suggestion.index for suggestion in advisor.suggest()],[indexes[1]])
+
+        self.assertIs(self.connection.stopindexadvisor(),advisor)
+        self.table.quickselect(name = "Hello")
+        self.assertEqual(sum(advisor.shapes.values()),5)
+
+if __name__ == "__main__":
+    unittest.main()
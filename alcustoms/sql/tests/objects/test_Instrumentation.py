@@ -0,0 +1,145 @@
+## Test Target
+from alcustoms.sql.objects import Instrumentation
+## Test Framework
+import unittest
+
+## Testing Utilities
+from alcustoms.sql.tests import utils
+
+## Sister Modules
+from alcustoms import sql
+
+## Builtin
+import functools
+import io
+import sys
+
+def decorator(func):
+    @functools.wraps(func)
+    def inner(*args,**kw):
+        return sys._getframe(), func(*args,**kw)
+    return inner
+
+class Base():
+    def method(self): return sys._getframe()
+    @classmethod
+    def clsmethod(cls): return sys._getframe()
+    @property
+    def prop(self): return sys._getframe()
+    @decorator
+    def decorated(self): return sys._getframe()
+
+class Sub(Base):
+    def submethod(self): return sys._getframe()
+
+def function(self = None): return sys._getframe()
+
+class NormalizeCase(unittest.TestCase):
+    """ TestCase for normalizesql """
+    def test_normalizesql(self):
+        """ Tests that statements which only differ by their values are normalized to the same string """
+        for (a,b) in [
+            ("SELECT * FROM test WHERE a = 1;","SELECT  *\nFROM test WHERE a = 25;"),
+            ("SELECT * FROM test WHERE a = 'hello';","SELECT * FROM test WHERE a = 'it''s';"),
+            ("SELECT * FROM test WHERE a = :value0;","SELECT * FROM test WHERE a = ?;"),
+            ("SELECT * FROM test WHERE a IN (?, ?);","SELECT * FROM test WHERE a IN (:a,:b,:c,:d);"),
+            ]:
+            with self.subTest(a = a, b = b):
+                self.assertEqual(Instrumentation.normalizesql(a),Instrumentation.normalizesql(b))
+        self.assertEqual(Instrumentation.normalizesql("SELECT * FROM test2 WHERE a IN (1,2,3);"),"SELECT * FROM test2 WHERE a IN (...);")
+
+class QualnameCase(unittest.TestCase):
+    """ TestCase for qualname """
+    def test_methodname(self):
+        """ Tests that the class of a method is determined from self or cls when co_qualname is not available """
+        sub = Sub()
+        wrapper,decorated = sub.decorated()
+        for frame,name,qualname in [
+            (sub.method(),"Base.method","Base.method"),
+            (sub.submethod(),"Sub.submethod","Sub.submethod"),
+            (Sub.clsmethod(),"Base.clsmethod","Base.clsmethod"),
+            (sub.prop,"Base.prop","Base.prop"),
+            (decorated,"Base.decorated","Base.decorated"),
+            (wrapper,"<locals>.inner","decorator.<locals>.inner"),
+            (function(sub),"function","function"),
+            ]:
+            with self.subTest(name = name):
+                self.assertEqual(Instrumentation._methodname(frame),name)
+                if hasattr(frame.f_code,"co_qualname"):
+                    self.assertEqual(Instrumentation.qualname(frame),qualname)
+                else:
+                    self.assertEqual(Instrumentation.qualname(frame),name)
+
+class InstrumentationCase(unittest.TestCase):
+    """ TestCase for Database.instrument """
+    def setUp(self):
+        utils.setupconnection(self)
+        utils.populatetesttable(self)
+        self.connection.row_factory = sql.advancedrow_factory
+        self.table = self.connection.getadvancedtable("testtable")
+        return super().setUp()
+
+    def test_uninstrumented(self):
+        """ Tests that nothing is recorded unless the Database is instrumented """
+        self.assertIsNone(self.connection.querylog)
+        self.assertNotIsInstance(self.connection.cursor(),Instrumentation.InstrumentedCursor)
+        log = self.connection.instrument()
+        self.assertIsInstance(self.connection.cursor(),Instrumentation.InstrumentedCursor)
+        self.assertIs(self.connection.uninstrument(),log)
+        self.table.selectall()
+        self.assertEqual(log.stats,dict())
+
+    def test_record(self):
+        """ Tests that statements are aggregated with their row counts and calling methods """
+        log = self.connection.instrument()
+        self.table.quickselect(name = "Hello")
+        self.table.quickselect(name = "World")
+        self.table.addmultiple(dict(name = "Foo", value = 3), dict(name = "Bar", value = 4), rowids = False)
+        self.connection.execute("SELECT * FROM testtable;").fetchall()
+
+        stats = [stats for stats in log.stats.values() if stats.normalized.startswith("SELECT testtable.rowid, testtable.* FROM testtable WHERE")]
+        self.assertEqual(len(stats),1)
+        stats = stats[0]
+        self.assertEqual(stats.count,2)
+        self.assertEqual(stats.rows,2)
+        self.assertEqual(stats.apis,{"AdvancedTable.quickselect":2})
+
+        stats = log.stats["SELECT * FROM testtable;"]
+        self.assertEqual(stats.rows,4)
+        self.assertEqual(stats.apis,{"Database.execute":1})
+
+        stats = [stats for stats in log.stats.values() if stats.normalized.startswith("INSERT")]
+        self.assertEqual(len(stats),1)
+        self.assertEqual(stats[0].rows,2)
+        self.assertEqual(stats[0].apis,{"AdvancedTable.addmultiple":1})
+
+    def test_explain(self):
+        """ Tests that query plans are captured for slow statements and passed to the callback """
+        records = []
+        log = self.connection.instrument(threshold = 0, explain = True, callback = records.append)
+        self.table.quickselect(value = 1)
+        self.assertTrue(records)
+        record = records[-1]
+        self.assertEqual(record.api,"AdvancedTable.quickselect")
+        self.assertTrue(record.plan)
+        self.assertTrue(any(stats.isscan for stats in log.scans()))
+
+        ## Statements under the threshold are not passed to the callback
+        log.threshold = 1000
+        records.clear()
+        self.table.quickselect(value = 1)
+        self.assertEqual(records,[])
+
+    def test_dump(self):
+        """ Tests that the QueryLog can be written out """
+        log = self.connection.instrument()
+        self.table.selectall()
+        output = io.StringIO()
+        log.dump(file = output)
+        self.assertIn("SELECT testtable.rowid, testtable.* FROM testtable",output.getvalue())
+        self.assertIn("AdvancedTable.selectall",output.getvalue())
+        log.clear()
+        self.assertEqual(log.asdict(),dict())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,11 +9,14 @@ from alcustoms.sql.tests import utils
 
 ## This module
 from alcustoms.sql import constants, objects
-from alcustoms.sql.objects import Connection
+from alcustoms.sql.objects import Connection, Utilities
 
 ## Builtin
+import array
 import collections
 import itertools
+import math
+import sqlite3
 
 class TableConstructorCase(unittest.TestCase):
     def setUp(self):
@@ -442,6 +445,47 @@ class AdvancedTableCase(unittest.TestCase):
         self.assertEqual(len(rows),3)
         self.assertEqual(rows,[{"forgnid":0,"myname":"Foo"},{"forgnid":1,"myname":"Bar"},{"forgnid":1,"myname":"BizzBuzz"}])
 
+    def test_iselect(self):
+        """ Tests that iselect lazily returns the same rows as select """
+        testtable = self.connection.getadvancedtable("testtable")
+        testtable.addmultiple(*[dict(name = f"row{i}", value = i) for i in range(25)])
+        rows = testtable.iselect(batch_size = 4)
+        self.assertNotIsInstance(rows,list)
+        self.assertEqual(next(rows),("row0",0))
+        self.assertListEqual([("row0",0),]+list(rows),testtable.select())
+
+        for kwargs in [dict(rowid = True), dict(columns = ["value",]), dict(limit = 10), dict(query = "value > :rep", replacements = dict(rep = 20))]:
+            with self.subTest(kwargs = kwargs):
+                self.assertListEqual(list(testtable.iselect(batch_size = 3, **kwargs)), testtable.select(**kwargs))
+
+    def test_iselect_factory(self):
+        """ Tests that iselect continues to use the Table's Row Factory after the Database's row_factory is restored """
+        utils.populatetesttable(self)
+        testtable = self.connection.getadvancedtable("testtable")
+        testtable.database.row_factory = objects.dict_factory
+        testtable.row_factory = objects.object_to_factory(utils.TestObject)
+
+        rows = testtable.iselect(batch_size = 1)
+        self.assertEqual(self.connection.row_factory,objects.dict_factory)
+        for row in rows:
+            with self.subTest(row = row):
+                self.assertIsInstance(row,utils.TestObject)
+
+    def test_iselect_bad(self):
+        """ Tests that iselect requires a positive integer batch_size """
+        testtable = self.connection.getadvancedtable("testtable")
+        for batch_size in [0,-1,1.5,"1"]:
+            with self.subTest(batch_size = batch_size):
+                self.assertRaises(ValueError,testtable.iselect,batch_size = batch_size)
+
+    def test_iquickselect(self):
+        """ Tests that iquickselect accepts the same arguments as quickselect """
+        utils.populatetesttable(self)
+        testtable = self.connection.getadvancedtable("testtable")
+        for kwarg in [{"value":1}, {"name__likeany":"orl"}, {"value__in":(1,2)}, {"pk":1}, {"limit":1}]:
+            with self.subTest(kwarg = kwarg):
+                self.assertListEqual(list(testtable.iquickselect(batch_size = 1, **kwarg)), testtable.quickselect(**kwarg))
+
     def test_parseobject(self):
         """ Tests that the AdvancedTable can parse the correct attributes from an object that shares it's columns """
         ## Throw in some rows to turn into objects
@@ -601,6 +645,33 @@ class AdvancedTableCase(unittest.TestCase):
         self.assertListEqual(testtable.selectall(rowid = True),[utils.TestObject(name="Foo",value=1,rowid = 1),utils.TestObject(name="Bar",value=2,rowid = 2),
                                                     utils.TestObject(name="Bizz",value=3, rowid = 3),utils.TestObject(name="Bazz",value = 4, rowid = 4)]) 
 
+    @unittest.skipIf(sqlite3.sqlite_version_info < (3,35,0), "RETURNING requires sqlite 3.35.0")
+    def test_addmultiple_returning(self):
+        """ Tests that addmultiple inserts each group with multi-row RETURNING statements and matches the rowids to the rows """
+        testtable = self.connection.getadvancedtable("testtable")
+        testtable.addrow(name = "First", value = 0)
+        input = [dict(name = str(i), value = i) if i % 3 else dict(value = i) for i in range(1,constants.REPLACEMENT_LIMIT * 2)]
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+        rowids = testtable.addmultiple(*input)
+        self.connection.set_trace_callback(None)
+        inserts = [statement for statement in statements if statement.startswith("INSERT")]
+        ## (name,value) rows are split into REPLACEMENT_LIMIT // 2 value chunks; value-only rows fit in one statement
+        self.assertEqual(len(inserts),4)
+        self.assertTrue(all("RETURNING" in statement for statement in inserts))
+        testtable.row_factory = objects.dict_factory
+        for row,rowid in zip(input,rowids):
+            self.assertEqual(testtable.quickselect(pk = rowid).first()['value'],row['value'])
+
+        ## Tables whose triggers or ON CONFLICT IGNORE constraints may skip rows insert each row individually
+        self.connection.execute("""CREATE TABLE ignoretable (name TEXT UNIQUE ON CONFLICT IGNORE, value INT);""")
+        ignoretable = self.connection.getadvancedtable("ignoretable")
+        self.assertFalse(ignoretable._canreturnrowids())
+        self.assertTrue(testtable._canreturnrowids())
+        self.connection.execute("""CREATE TRIGGER testtrigger AFTER INSERT ON testtable BEGIN SELECT 1; END;""")
+        self.assertFalse(testtable._canreturnrowids())
+        self.assertEqual(testtable.addmultiple(dict(name = "a", value = 1), dict(name = "b", value = 2)),[len(input)+2,len(input)+3])
+
     def test_addmultiple_difflengths(self):
         """ Tests that addmultiple properly groups and handles inserts of different lengths"""
         utils.setupadditionaltables(self)
@@ -652,6 +723,139 @@ class AdvancedTableCase(unittest.TestCase):
         #map(mapid,inserts)
         self.assertEqual(inserts,rows)
 
+    def test_addmultiple_large(self):
+        """ Tests that addmultiple returns the correct rowids for a large, mixed set of rows """
+        testtable = self.connection.getadvancedtable("testtable")
+        inserts = [dict(name = str(i), value = i) if i % 3 else dict(value = i) for i in range(5000)]
+        rowids = testtable.addmultiple(*inserts)
+        self.assertEqual(len(rowids),len(inserts))
+        self.assertEqual(len(set(rowids)),len(inserts))
+        testtable.row_factory = objects.dict_factory
+        for rowid,row in zip(rowids,inserts):
+            self.assertEqual(testtable.quickselect(pk = rowid).first()['value'],row['value'])
+
+    def test_addmultiple_nogrouping_order(self):
+        """ Tests that rows are inserted in order when grouping is False, even if they declare different columns """
+        testtable = self.connection.getadvancedtable("testtable")
+        inserts = [dict(name = "a", value = 1),dict(value = 2),dict(value = 3),dict(name = "d", value = 4)]
+        rowids = testtable.addmultiple(*inserts, grouping = False)
+        self.assertListEqual(rowids,[1,2,3,4])
+        self.assertIsInstance(rowids[0],objects.Advanced_RowID)
+        self.assertListEqual(testtable.selectall(),[("a",1),(None,2),(None,3),("d",4)])
+
+    def test_addmultiple_norowids(self):
+        """ Tests that addmultiple inserts all rows when rowids is False """
+        testtable = self.connection.getadvancedtable("testtable")
+        inserts = [dict(name = str(i), value = i) for i in range(1000)]
+        self.assertIsNone(testtable.addmultiple(*inserts, rowids = False))
+        testtable.row_factory = objects.dict_factory
+        self.assertListEqual(testtable.selectall(),inserts)
+
+    def test_addmultiple_autocommit(self):
+        """ Tests that addmultiple rolls back all rows if one fails while the Database is in autocommit mode """
+        utils.setupadditionaltables(self)
+        self.connection.isolation_level = None
+        testtable4 = self.connection.getadvancedtable("testtable4")
+        inserts = [dict(uniquevalue = 1, checkevenvalue = 0), dict(uniquevalue = 2, checkevenvalue = 2), dict(uniquevalue = 1, checkevenvalue = 4)]
+        self.assertRaises(Exception,testtable4.addmultiple,*inserts)
+        self.assertFalse(self.connection.in_transaction)
+        self.assertListEqual(testtable4.selectall(),[])
+
+        testtable4.addmultiple(*inserts[:2])
+        self.assertFalse(self.connection.in_transaction)
+        self.assertEqual(len(testtable4.selectall()),2)
+
+    def test_uniquecolumns(self):
+        """ Tests that uniquecolumns returns all column sets with PRIMARY KEY or UNIQUE constraints """
+        self.connection.execute("""CREATE TABLE uniquetable (id INTEGER PRIMARY KEY, a TEXT UNIQUE, b TEXT, c TEXT, UNIQUE (b,c));""")
+        table = self.connection.getadvancedtable("uniquetable")
+        self.assertListEqual(table.uniquecolumns(),[("id",),("a",),("b","c")])
+
+        ## UNIQUE Indexes are included unless they are partial or use expressions or collations
+        self.connection.execute("""CREATE UNIQUE INDEX uniquetable_b_idx ON uniquetable (b);""")
+        self.connection.execute("""CREATE UNIQUE INDEX uniquetable_c_idx ON uniquetable (c) WHERE c IS NOT NULL;""")
+        self.connection.execute("""CREATE UNIQUE INDEX uniquetable_lower_idx ON uniquetable (lower(c));""")
+        self.connection.execute("""CREATE UNIQUE INDEX uniquetable_nocase_idx ON uniquetable (a COLLATE NOCASE, c);""")
+        self.connection.execute("""CREATE INDEX uniquetable_bc_idx ON uniquetable (c, b);""")
+        self.assertListEqual(table.uniquecolumns(),[("id",),("a",),("b","c"),("b",)])
+
+    def test_upsert_many_index(self):
+        """ Tests that a UNIQUE Index can be used as the conflict target of upsert_many """
+        self.connection.execute("""CREATE TABLE upserttable (key TEXT, value INT);""")
+        self.connection.execute("""CREATE UNIQUE INDEX upserttable_key_idx ON upserttable (key);""")
+        table = self.connection.getadvancedtable("upserttable")
+        table.addrow(key = "a", value = 1)
+        table.upsert_many([dict(key = "a", value = 10), dict(key = "b", value = 2)], conflict = ["key",], update = ["value",])
+        self.assertListEqual(table.selectall(),[("a",10),("b",2)])
+
+    def test_upsert_many(self):
+        """ Tests that upsert_many updates conflicting rows and returns the rowids of all affected rows """
+        self.connection.execute("""CREATE TABLE upserttable (key TEXT UNIQUE, value INT, other TEXT);""")
+        table = self.connection.getadvancedtable("upserttable")
+        table.addmultiple(dict(key = "a", value = 1, other = "foo"), dict(key = "b", value = 2, other = "bar"))
+
+        rowids = table.upsert_many([dict(key = "b", value = 20), dict(key = "c", value = 3), dict(key = "a", value = 10)], conflict = ["key",], update = ["value",])
+        self.assertListEqual(rowids,[2,3,1])
+        self.assertListEqual(table.selectall(),[("a",10,"foo"),("b",20,"bar"),("c",3,None)])
+
+    def test_upsert_many_donothing(self):
+        """ Tests that upsert_many ignores conflicting rows when update is not supplied """
+        self.connection.execute("""CREATE TABLE upserttable (a TEXT, b TEXT, value INT, UNIQUE (a,b));""")
+        table = self.connection.getadvancedtable("upserttable")
+        table.addrow(a = "a", b = "b", value = 1)
+
+        rowids = table.upsert_many([dict(a = "a", b = "b", value = 2), dict(a = "a", b = "c", value = 3)], conflict = ["b","a"])
+        self.assertListEqual(rowids,[None,2])
+        self.assertListEqual(table.selectall(),[("a","b",1),("a","c",3)])
+
+        self.assertIsNone(table.upsert_many([dict(a = "a", b = "c", value = 4),], conflict = ["a","b"], update = ["value",], rowids = False))
+        self.assertListEqual(table.selectall(),[("a","b",1),("a","c",4)])
+
+    def test_upsert_many_rowfactory(self):
+        """ Tests that upsert_many returns rowids on a connection using advancedrow_factory """
+        self.connection.row_factory = objects.advancedrow_factory
+        self.connection.execute("""CREATE TABLE upserttable (name TEXT UNIQUE, value INT);""")
+        table = self.connection.getadvancedtable("upserttable")
+        for update in (["value",],None):
+            with self.subTest(update = update):
+                rowids = table.upsert_many([dict(name = "a", value = 1),dict(name = "a", value = 2),dict(name = None, value = 3)], conflict = ["name",], update = update)
+                if update: self.assertListEqual(rowids,[1,1,2])
+                else: self.assertListEqual(rowids,[None,None,3])
+        self.assertListEqual([(row.name,row.value) for row in table.selectall()],[("a",2),(None,3),(None,3)])
+
+    @unittest.skipIf(sqlite3.sqlite_version_info < (3,35,0), "RETURNING requires sqlite 3.35.0")
+    def test_upsert_many_batched(self):
+        """ Tests that upsert_many upserts each group with multi-row statements and matches the rowids to the rows """
+        self.connection.execute("""CREATE TABLE upserttable (key INT UNIQUE, name TEXT UNIQUE COLLATE NOCASE, value INT);""")
+        table = self.connection.getadvancedtable("upserttable")
+        table.addmultiple(dict(key = 0, name = "zero", value = 0), dict(key = 1, name = "one", value = 1))
+        ## Duplicate keys in the same statement, and keys which sqlite converts using the column's affinity
+        input = [dict(key = i, name = f"name{i}", value = i) for i in range(2,constants.REPLACEMENT_LIMIT)] + [dict(key = 2, name = "two", value = -2),dict(key = "1", name = "ONE", value = -1)]
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+        rowids = table.upsert_many(input, conflict = ["key",], update = ["value",])
+        self.connection.set_trace_callback(None)
+        ## (key,name,value) rows with 2 lookup parameters (their index and key) are split into REPLACEMENT_LIMIT // 5 row chunks
+        self.assertEqual(len([statement for statement in statements if statement.startswith("INSERT")]),math.ceil(len(input) / (constants.REPLACEMENT_LIMIT // 5)))
+        self.assertListEqual(rowids,list(range(3,constants.REPLACEMENT_LIMIT+1))+[3,2])
+        self.assertEqual(table.quickselect(key = 2).first()[2],-2)
+        self.assertEqual(table.quickselect(key = 1).first()[2],-1)
+
+        ## Ignored rows (including rows which conflict with earlier rows in the same statement) have a rowid of None
+        rowids = table.upsert_many([dict(key = -1, name = "One"),dict(key = -2, name = "new"),dict(key = -3, name = "NEW"),dict(key = -4, name = "newer")], conflict = ["name",])
+        self.assertListEqual(rowids,[None,constants.REPLACEMENT_LIMIT+1,None,constants.REPLACEMENT_LIMIT+2])
+
+    def test_upsert_many_bad(self):
+        """ Tests that upsert_many validates its conflict and update columns """
+        self.connection.execute("""CREATE TABLE upserttable (key TEXT UNIQUE, value INT);""")
+        table = self.connection.getadvancedtable("upserttable")
+        rows = [dict(key = "a", value = 1),]
+        self.assertRaises(ValueError,table.upsert_many,rows,conflict = ["value",])
+        self.assertRaises(ValueError,table.upsert_many,rows,conflict = [])
+        self.assertRaises(AttributeError,table.upsert_many,rows,conflict = ["notacolumn",])
+        self.assertRaises(AttributeError,table.upsert_many,rows,conflict = ["key",], update = ["notacolumn",])
+        self.assertRaises(ValueError,table.upsert_many,[dict(value = 1),],conflict = ["key",])
+
     def test_quickupdate(self):
         """ Tests the quickupdate method of AdvancedTable; a lot of the infrastructure was already tested, so we're doing a bunch together"""
         testtable = self.connection.getadvancedtable("testtable")
@@ -869,5 +1073,552 @@ class AdvancedTableCase(unittest.TestCase):
     def test_advancedselect_explicit_table(self):
         """ Tests that the new verison of quick select with a single explicit table which is the calling table """
 
+class LargeInCase(unittest.TestCase):
+    """ TestCase for quick-queries with in/notin lists longer than constants.REPLACEMENT_LIMIT """
+    def setUp(self):
+        utils.setupconnection(self)
+        self.connection.row_factory = objects.dict_factory
+        self.connection.executemany("""INSERT INTO testtable (name,value) VALUES (?,?);""",((f"Row{i}",i) for i in range(3000)))
+        self.connection.commit()
+        self.table = self.connection.getadvancedtable("testtable")
+        self.values = list(range(0,3000,2))
+        return super().setUp()
+
+    def assertValues(self,rows,expected):
+        self.assertEqual(sorted(row['value'] for row in rows),sorted(expected))
+
+    def test_chunked(self):
+        """ Tests that moderately large "in" lists are split across multiple queries """
+        self.assertGreater(len(self.values),constants.REPLACEMENT_LIMIT)
+        self.assertLessEqual(len(self.values),constants.LARGEIN_CHUNKLIMIT)
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+        ## Duplicate values are removed before chunking
+        rows = self.table.quickselect(value__in = self.values + self.values)
+        self.connection.set_trace_callback(None)
+        self.assertGreater(len(statements),1)
+        self.assertFalse(any("templist" in statement for statement in statements))
+        self.assertValues(rows,range(0,3000,2))
+        self.assertIsInstance(rows,objects.QueryResult)
+
+        rows = self.table.quickselect(value__in = self.values, name__like = "Row1%")
+        self.assertValues(rows,[i for i in range(0,3000,2) if str(i).startswith("1")])
+        self.assertEqual(len(self.table.quickselect(value__in = self.values, limit = 1000)),1000)
+        self.assertValues(self.table.iquickselect(value__in = self.values),range(0,3000,2))
+        self.assertEqual(len(list(self.table.iquickselect(value__in = self.values, limit = 1000))),1000)
+
+    def test_templist(self):
+        """ Tests that "notin" lists and very large "in" lists are loaded into temporary tables """
+        values = list(range(0,constants.LARGEIN_CHUNKLIMIT * 2,2))
+        for kw,expected in [(dict(value__in = values),range(0,3000,2)),
+                            (dict(value__notin = self.values),range(1,3000,2)),
+                            ## rowids start at 1
+                            (dict(pk__notin = [value + 1 for value in self.values]),range(1,3000,2)),
+                            (dict(value__in = self.values, distinct = True),range(0,3000,2)),
+                            (dict(value__in = self.values, name__notin = [f"Row{i}" for i in range(1000)]),range(1000,3000,2)),
+                            ]:
+            with self.subTest(kw = list(kw)):
+                self.assertValues(self.table.quickselect(**kw),expected)
+                self.assertValues(self.table.iquickselect(**kw),expected)
+        self.assertFalse(self.connection.in_transaction)
+        ## Temporary tables are removed
+        self.assertEqual(self.connection.execute("""SELECT * FROM temp.sqlite_master;""").fetchall(),[])
+        self.assertRaises(ValueError, self.table.quickselect, notacolumn__notin = self.values)
+        self.assertEqual(self.connection.execute("""SELECT * FROM temp.sqlite_master;""").fetchall(),[])
+
+    def test_iterate_write(self):
+        """ Tests that changes made while iterating over a large iquickselect are not committed by its temporary tables """
+        values = list(range(0,constants.LARGEIN_CHUNKLIMIT * 2,2))
+        self.connection.execute("""CREATE TABLE log (x INTEGER);""")
+        for kw in [dict(value__in = values), dict(value__notin = self.values)]:
+            with self.subTest(kw = list(kw)):
+                for row in self.table.iquickselect(**kw, limit = 50):
+                    self.connection.execute("""INSERT INTO log (x) VALUES (1);""")
+                self.assertTrue(self.connection.in_transaction)
+                self.connection.rollback()
+                self.assertEqual(self.connection.execute("""SELECT count(*) AS count FROM log;""").fetchone()['count'],0)
+                for batch in self.table.iter_columns("value", batch_size = 10, **kw):
+                    self.connection.execute("""INSERT INTO log (x) VALUES (1);""")
+                    if len(batch['value']) < 10: break
+                self.connection.rollback()
+                self.assertEqual(self.connection.execute("""SELECT count(*) AS count FROM log;""").fetchone()['count'],0)
+
+    def test_update_delete(self):
+        """ Tests quickupdate and quickdelete with large lists """
+        self.table.quickupdate(WHERE = dict(value__notin = self.values), name = None)
+        self.assertValues(self.table.quickselect(name = None),range(1,3000,2))
+        self.table.quickdelete(value__in = self.values)
+        self.assertValues(self.table.selectall(),range(1,3000,2))
+        self.assertEqual(self.connection.execute("""SELECT * FROM temp.sqlite_master;""").fetchall(),[])
+
+    @utils.filemanager
+    def test_readonly(self, file):
+        """ Tests that temporary tables can be used on query_only connections """
+        with Connection.DatabasePool(file, readers = 1, row_factory = objects.dict_factory) as pool:
+            with pool.writer() as db:
+                db.execute(utils.TESTTABLESQL)
+                db.executemany("""INSERT INTO testtable (name,value) VALUES (?,?);""",((f"Row{i}",i) for i in range(3000)))
+            with pool.reader() as db:
+                table = db.getadvancedtable("testtable")
+                self.assertValues(table.quickselect(value__notin = self.values),range(1,3000,2))
+                self.assertRaises(sqlite3.OperationalError, db.execute, """DELETE FROM testtable;""")
+
+class PaginateCase(unittest.TestCase):
+    """ TestCase for AdvancedTable.paginate and AdvancedTable.iterpages """
+    def setUp(self):
+        utils.setupconnection(self)
+        self.connection.row_factory = objects.dict_factory
+        ## Values repeat so that ordering by value requires the rowid to break ties; every 7th value is NULL
+        self.connection.executemany("""INSERT INTO testtable (name,value) VALUES (?,?);""",((f"Row{i}",None if not i % 7 else i % 5) for i in range(100)))
+        self.table = self.connection.getadvancedtable("testtable")
+        return super().setUp()
+
+    def walk(self, page_size, **kw):
+        rows = []
+        for page in self.table.iterpages(page_size, **kw):
+            self.assertLessEqual(len(page),page_size)
+            rows.extend(page)
+        return rows
+
+    def test_paginate(self):
+        """ Tests basic pagination by primary key """
+        page = self.table.paginate(10)
+        self.assertIsInstance(page,objects.Page)
+        self.assertEqual([row['rowid'] for row in page],list(range(1,11)))
+        self.assertEqual(page.after,10)
+        self.assertTrue(page.hasmore)
+        page = self.table.paginate(10, after = page.after)
+        self.assertEqual([row['rowid'] for row in page],list(range(11,21)))
+        page = self.table.paginate(10, after = 95)
+        self.assertEqual([row['rowid'] for row in page],list(range(96,101)))
+        self.assertFalse(page.hasmore)
+        page = self.table.paginate(10, after = 100)
+        self.assertEqual(len(page),0)
+        self.assertIsNone(page.after)
+
+        page = self.table.paginate(10, order_by = "-pk")
+        self.assertEqual([row['rowid'] for row in page],list(range(100,90,-1)))
+
+    def test_orderby(self):
+        """ Tests that walking all pages ordered by a column returns every row exactly once and in order """
+        allrows = self.table.selectall(rowid = True)
+        for order_by,reverse in [(None,False),("pk",False),("-pk",True),("value",False),("-value",True),("name",False)]:
+            for page_size in (1,3,7,100,1000):
+                with self.subTest(order_by = order_by, page_size = page_size):
+                    rows = self.walk(page_size, order_by = order_by)
+                    column = (order_by or "rowid").strip("-").replace("pk","rowid")
+                    ## NULLs sort first
+                    expected = sorted(allrows, key = lambda row: (row[column] is not None, row[column] if row[column] is not None else 0, row['rowid']), reverse = reverse)
+                    self.assertEqual([row['rowid'] for row in rows],[row['rowid'] for row in expected])
+
+    def test_after(self):
+        """ Tests that after can be a pk or an AdvancedRow when ordering by a column """
+        page = self.table.paginate(10, order_by = "value")
+        self.assertEqual(page.after,(page[-1]['value'],page[-1]['rowid']))
+        expected = self.table.paginate(10, after = page.after, order_by = "value")
+        self.assertEqual(self.table.paginate(10, after = page[-1]['rowid'], order_by = "value"),expected)
+        self.table.row_factory = objects.advancedrow_factory
+        page = self.table.paginate(10, after = page[-1]['rowid'], order_by = "value")
+        self.assertEqual([row.pk for row in page],[row['rowid'] for row in expected])
+        self.assertEqual([row.pk for row in self.table.paginate(10, after = page[-1], order_by = "value")],
+                         [row.pk for row in self.table.paginate(10, after = page.after, order_by = "value")])
+        self.assertRaises(ValueError, self.table.paginate, 10, after = 1000, order_by = "value")
+
+    def test_filters(self):
+        """ Tests paginate with filters, columns, and invalid arguments """
+        rows = self.walk(4, value__gte = 3, columns = ["name",])
+        self.assertEqual(sorted(rows, key = lambda row: row['rowid']),rows)
+        self.assertEqual([row['rowid'] for row in rows],[row['rowid'] for row in self.table.quickselect(value__gte = 3, rowid = True)])
+        self.assertEqual(set(rows[0]),set(["rowid","name"]))
+        rows = self.walk(4, order_by = "value", value__in = [1,2], columns = ["name",])
+        self.assertEqual(set(rows[0]),set(["rowid","name","value"]))
+        self.assertEqual(len(rows),len(self.table.quickselect(value__in = [1,2])))
+
+        self.assertRaises(ValueError, self.table.paginate, 0)
+        self.assertRaises(ValueError, self.table.paginate, "10")
+        self.assertRaises(AttributeError, self.table.paginate, 10, order_by = "notacolumn")
+        self.assertRaises(ValueError, self.table.paginate, 10, notacolumn = 1)
+
+    def test_expressions(self):
+        """ Tests that Q expressions can be passed positionally to paginate and iterpages """
+        expected = [row['rowid'] for row in self.table.quickselect(objects.Q(value__lt = 2) | objects.Q(value = None), rowid = True)]
+        page = self.table.paginate(10, objects.Q(value__lt = 2) | objects.Q(value = None))
+        self.assertEqual([row['rowid'] for row in page],expected[:10])
+        page = self.table.paginate(10, objects.Q(value__lt = 2) | objects.Q(value = None), after = page.after)
+        self.assertEqual([row['rowid'] for row in page],expected[10:20])
+        rows = [row['rowid'] for page in self.table.iterpages(4, objects.Q(value__lt = 2) | objects.Q(value = None)) for row in page]
+        self.assertEqual(rows,expected)
+        rows = [row['rowid'] for page in self.table.iterpages(4, objects.Q(value__lt = 2), order_by = "-value") for row in page]
+        self.assertEqual(sorted(rows),[row['rowid'] for row in self.table.quickselect(value__lt = 2, rowid = True)])
+
+    def test_constant(self):
+        """ Tests that deep pages are resolved without scanning the preceding rows """
+        self.connection.execute("""CREATE INDEX testtable_value ON testtable (value);""")
+        plans = []
+        self.connection.set_trace_callback(plans.append)
+        self.table.paginate(10, after = 90)
+        self.table.paginate(10, after = 90, order_by = "value")
+        self.connection.set_trace_callback(None)
+        for statement in plans:
+            if not statement.startswith("SELECT testtable.rowid"): continue
+            with self.subTest(statement = statement):
+                plan = [row['detail'] for row in self.connection.execute(f"EXPLAIN QUERY PLAN {statement}").fetchall()]
+                self.assertTrue(all(line.startswith("SEARCH") for line in plan))
+
+class AggregateCase(unittest.TestCase):
+    """ TestCase for AdvancedTable.count, AdvancedTable.aggregate, and AdvancedTable.group_by """
+    def setUp(self):
+        utils.setupconnection(self)
+        utils.populatetesttable(self)
+        self.connection.execute("""INSERT INTO testtable (name,value) VALUES ("Hello",3),("World",4),("Foo",NULL);""")
+        ## Results should not depend on the row_factory
+        self.connection.row_factory = objects.advancedrow_factory
+        self.table = self.connection.getadvancedtable("testtable")
+        return super().setUp()
+
+    def test_count(self):
+        """ Tests count with and without filters """
+        self.assertEqual(self.table.count(),5)
+        self.assertEqual(self.table.count(name = "Hello"),2)
+        self.assertEqual(self.table.count(value__gt = 1, name__in = ["World","Foo"]),2)
+        self.assertEqual(self.table.count(value = None),1)
+        self.assertEqual(self.table.count(name = "Bar"),0)
+        self.assertEqual(self.table.count(value__notin = list(range(2,constants.REPLACEMENT_LIMIT * 2))),1)
+        self.assertRaises(ValueError, self.table.count, notacolumn = 1)
+
+    def test_aggregate(self):
+        """ Tests aggregate """
+        self.assertEqual(self.table.aggregate(sum = "value", avg = "value", count = "*"),dict(sum = 10, avg = 2.5, count = 5))
+        self.assertEqual(self.table.aggregate(count = "value", min = ["value","name"], max = ("value","pk")),dict(count = 4, min = (1,"Foo"), max = (4,5)))
+        self.assertEqual(self.table.aggregate(WHERE = dict(name = "Hello"), sum = "value", total = "value"),dict(sum = 4, total = 4.0))
+        self.assertEqual(self.table.aggregate(WHERE = dict(name = "Bar"), sum = "value", count = "*"),dict(sum = None, count = 0))
+        self.assertIsInstance(self.table.aggregate(group_concat = "name")['group_concat'],str)
+
+        self.assertRaises(TypeError, self.table.aggregate)
+        self.assertRaises(ValueError, self.table.aggregate, median = "value")
+        self.assertRaises(AttributeError, self.table.aggregate, sum = "notacolumn")
+        self.assertRaises(AttributeError, self.table.aggregate, sum = "*")
+        self.assertRaises(ValueError, self.table.aggregate, sum = [])
+        self.assertRaises(ValueError, self.table.aggregate, WHERE = "name = 'Hello'", sum = "value")
+
+    def test_group_by(self):
+        """ Tests group_by """
+        self.assertEqual(self.table.group_by("name", count = "*", sum = "value"),
+                         [dict(name = "Foo", count = 1, sum = None), dict(name = "Hello", count = 2, sum = 4), dict(name = "World", count = 2, sum = 6)])
+        self.assertEqual(self.table.group_by(["name",], WHERE = dict(value__gte = 2), max = ["value","pk"]),
+                         [dict(name = "Hello", max = (3,3)), dict(name = "World", max = (4,4))])
+        self.assertEqual(self.table.group_by(["name","value"], WHERE = dict(name = "Hello")),[dict(name = "Hello", value = 1), dict(name = "Hello", value = 3)])
+        self.assertRaises(AttributeError, self.table.group_by, "notacolumn", count = "*")
+        self.assertRaises(ValueError, self.table.group_by, [], count = "*")
+
+class TraversalCase(unittest.TestCase):
+    """ TestCase for quick-queries which traverse Foreign Keys (see objects._advancedqueryparser) """
+    def setUp(self):
+        utils.setupconnection(self)
+        self.connection.row_factory = objects.dict_factory
+        utils.setupadvancedtables(self)
+        return super().setUp()
+
+    def expected(self, fname):
+        """ Returns the commentids of the comments on posts by users with the given fname """
+        users = [user['userid'] for user in self.users.quickselect(fname = fname)]
+        posts = [post['postid'] for post in self.posts.quickselect(userid__in = users)]
+        return sorted(comment['commentid'] for comment in self.comments.quickselect(pid__in = posts))
+
+    def test_quickselect(self):
+        """ Tests that traversals are compiled into a single statement """
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+        rows = self.comments.quickselect(pid__userid__fname = "John")
+        self.connection.set_trace_callback(None)
+        ## Other than checking the schema_version (see Database.checkschemacache)
+        statements = [statement for statement in statements if not statement.startswith("PRAGMA")]
+        self.assertEqual(len(statements),1)
+        self.assertIn("pid IN (SELECT postid FROM posts WHERE userid IN (SELECT userid FROM users WHERE fname =",statements[0])
+        self.assertEqual(sorted(row['commentid'] for row in rows),self.expected("John"))
+        ## Options, pk, and the Foreign Key's own column
+        self.assertEqual(sorted(row['commentid'] for row in self.comments.quickselect(pid__userid__fname__in = ["Alice","Carol"])),
+                         sorted(self.expected("Alice")+self.expected("Carol")))
+        self.assertEqual(sorted(row['commentid'] for row in self.comments.quickselect(pid__userid__pk = 3, uid = 4)),
+                         [row['commentid'] for row in self.comments.quickselect(pid__in = [3,4,5], uid = 4)])
+        self.assertEqual(len(self.comments.quickselect(pid__postid__gt = 6)),len(self.comments.quickselect(pid__gt = 6)))
+        ## Self-referencing Foreign Keys
+        self.assertEqual([row['commentid'] for row in self.comments.quickselect(replyto__uid__fname = "Alice", uid = 1)],[])
+        self.assertEqual(len(self.comments.quickselect(replyto__uid__fname = "Alice")),5)
+        ## Rows are not duplicated
+        self.assertEqual(len(self.users.quickselect(fname = "John")),1)
+        self.assertEqual(self.comments.count(pid__userid__lname = "Doe"),len(self.expected("John")))
+        self.assertEqual([row['commentid'] for row in self.comments.advancedselect(pid__userid__fname = "John")],self.expected("John"))
+
+    def test_update_delete(self):
+        """ Tests that traversals can be used with quickupdate and quickdelete """
+        self.comments.quickupdate(WHERE = dict(pid__userid__fname = "John"), comment = "Moderated")
+        self.assertEqual(sorted(row['commentid'] for row in self.comments.quickselect(comment = "Moderated")),self.expected("John"))
+        expected = len(self.comments.selectall()) - len(self.expected("Alice"))
+        self.comments.quickdelete(pid__userid__fname = "Alice")
+        self.assertEqual(len(self.comments.selectall()),expected)
+
+    def test_large(self):
+        """ Tests that traversals can be used with in lists larger than constants.REPLACEMENT_LIMIT """
+        values = ["John",] + [str(i) for i in range(constants.REPLACEMENT_LIMIT)]
+        self.assertEqual(sorted(row['commentid'] for row in self.comments.quickselect(pid__userid__fname__in = values)),self.expected("John"))
+        values += [str(i) for i in range(constants.REPLACEMENT_LIMIT,constants.LARGEIN_CHUNKLIMIT)]
+        self.assertEqual(sorted(row['commentid'] for row in self.comments.quickselect(pid__userid__fname__in = values)),self.expected("John"))
+
+    def test_errors(self):
+        """ Tests that invalid traversals raise errors """
+        self.assertRaises(ValueError, self.comments.quickselect, pid__userid__notacolumn = 1)
+        self.assertRaises(NotImplementedError, self.comments.quickselect, pid__userid__fname__notanoption = 1)
+        ## comment is not a Foreign Key
+        self.assertRaises(NotImplementedError, self.comments.quickselect, comment__userid = 1)
+
+    def test_cache(self):
+        """ Tests that traversals are cached by the Database and recompiled when the schema changes """
+        self.comments.quickselect(pid__userid__fname = "John")
+        queries = self.connection.schemacache.queries
+        hits = queries.hits
+        self.comments.quickselect(pid__userid__fname = "Jane")
+        self.assertEqual(queries.hits,hits+1)
+        self.connection.execute("""ALTER TABLE users RENAME COLUMN fname TO firstname;""")
+        users = self.connection.getadvancedtable("users")
+        self.assertRaises(ValueError, self.comments.quickselect, pid__userid__fname = "John")
+        self.assertEqual(sorted(row['commentid'] for row in self.comments.quickselect(pid__userid__firstname = "John")),
+                         sorted(comment['commentid'] for post in self.posts.quickselect(userid = users.quickselect(firstname = "John")[0]['userid']) for comment in self.comments.quickselect(pid = post['postid'])))
+
+class ExpressionCase(unittest.TestCase):
+    """ TestCase for Q expressions (see objects.Q) """
+    def setUp(self):
+        utils.setupconnection(self)
+        utils.populatetesttable(self)
+        self.connection.execute("""INSERT INTO testtable (name,value) VALUES ("Hello",3),("World",4),("Foo",NULL);""")
+        self.connection.row_factory = objects.dict_factory
+        self.table = self.connection.getadvancedtable("testtable")
+        return super().setUp()
+
+    def select(self, *expressions, **kw):
+        return sorted((row['name'],row['value']) for row in self.table.quickselect(*expressions, **kw) if row['value'] is not None)
+
+    def test_compile(self):
+        """ Tests the sql generated for Q expressions """
+        Q = objects.Q
+        compiled = self.table._compiledquery(objects.addexpressions(dict(value__ne = None),(Q(name = "Hello") | ~Q(value__lt = 2),)))
+        self.assertEqual(compiled.querystring,"value IS NOT NULL AND ((name = :rep1) OR (NOT (value < :rep2)))")
+        compiled = self.table._compiledquery(objects.addexpressions(dict(),((Q(name = "Hello") | Q(name = "World")) & Q(value__in = [1,2]),)))
+        self.assertEqual(compiled.querystring,"(((name = :rep1) OR (name = :rep2)) AND (value IN (:rep3,:rep4)))")
+        ## Expressions with the same connector are flattened
+        self.assertEqual(len((Q(name = "Hello") | Q(name = "World") | Q(value = 1)).children),3)
+        self.assertRaises(TypeError, Q, dict(name = "Hello"))
+        self.assertRaises(TypeError, self.table.quickselect, dict(name = "Hello"))
+
+    def test_quickselect(self):
+        """ Tests that Q expressions can be used with the quick-query methods """
+        Q = objects.Q
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+        self.assertEqual(self.select(Q(name = "Hello") | Q(value__gt = 3)),[("Hello",1),("Hello",3),("World",4)])
+        self.connection.set_trace_callback(None)
+        self.assertEqual(len(statements),1)
+        self.assertEqual(self.select(~Q(name = "Hello"), value__lt = 4),[("World",2)])
+        self.assertEqual(self.select(~(Q(name = "Hello") & Q(value = 1))),[("Hello",3),("World",2),("World",4)])
+        self.assertEqual(self.select(Q(name__in = ["Hello","World"]) & (Q(value = 1) | Q(value = 4))),[("Hello",1),("World",4)])
+        self.assertEqual(len(self.table.quickselect(Q(value = None) | Q(name = "World"))),3)
+        self.assertEqual(len(list(self.table.iquickselect(Q(value = None) | Q(name = "World")))),3)
+        self.assertEqual(self.table.count(Q(value__lt = 2) | Q(value__gt = 3)),2)
+        self.assertEqual(self.table.aggregate(WHERE = Q(name = "World") | Q(value = None), count = "*"),{"count":3})
+        self.assertEqual([row['name'] for row in self.table.paginate(2, Q(value = 1) | Q(value = 3))],["Hello","Hello"])
+        ## Empty expressions
+        self.assertEqual(len(self.table.quickselect(Q())),5)
+        self.assertEqual(len(self.table.quickselect(~Q())),0)
+        self.assertRaises(ValueError, self.table.quickselect, Q(notacolumn = 1) | Q(name = "Hello"))
+
+    def test_update_delete(self):
+        """ Tests that Q expressions can be used with quickupdate and quickdelete """
+        Q = objects.Q
+        self.table.quickupdate(WHERE = Q(value = 1) | Q(value = None), name = "Updated")
+        self.assertEqual(self.table.count(name = "Updated"),2)
+        self.table.quickdelete(Q(name = "Updated") | Q(value = 4))
+        self.assertEqual(self.select(),[("Hello",3),("World",2)])
+
+    def test_cache(self):
+        """ Tests that Q expressions with the same shape share a compiled query """
+        Q = objects.Q
+        self.select(Q(name = "Hello") | Q(value__in = [1,2]))
+        misses = objects.QUERYCACHE.misses
+        self.assertEqual(self.select(Q(name = "World") | Q(value__in = [3,4])),[("Hello",3),("World",2),("World",4)])
+        self.assertEqual(objects.QUERYCACHE.misses,misses)
+        ## Traversals inside of expressions
+        utils.setupadvancedtables(self)
+        rows = self.comments.quickselect(Q(pid__userid__fname = "Alice") | Q(uid = 3))
+        self.assertEqual(sorted(row['commentid'] for row in rows),sorted(row['commentid'] for row in self.comments.quickselect(pid__in = [3,4,5])))
+
+class RowsCase(unittest.TestCase):
+    """ TestCase for the rows argument of AdvancedTable.select (and related methods) """
+    def setUp(self):
+        utils.setupconnection(self)
+        utils.populatetesttable(self)
+        self.connection.row_factory = objects.advancedrow_factory
+        self.table = self.connection.getadvancedtable("testtable")
+        return super().setUp()
+
+    def test_select(self):
+        """ Tests each of the row modes """
+        self.assertEqual(self.table.select(rows = "tuple"),[("Hello",1),("World",2)])
+        self.assertEqual(self.table.select(rows = "tuple", rowid = True),[(1,"Hello",1),(2,"World",2)])
+        rows = self.table.select(rows = "namedtuple", columns = ["value",])
+        self.assertEqual(rows,[(1,),(2,)])
+        self.assertEqual([row.value for row in rows],[1,2])
+        self.assertIsInstance(rows,objects.QueryResult)
+        rows = self.table.quickselect(name = "World", rows = "row")
+        self.assertIsInstance(rows[0],sqlite3.Row)
+        self.assertEqual(rows[0]['value'],2)
+        self.assertEqual(list(self.table.iquickselect(value__gt = 0, rows = "tuple", batch_size = 1)),[("Hello",1),("World",2)])
+        page = self.table.paginate(1, rows = "namedtuple")
+        self.assertEqual(page[0].rowid,1)
+        self.assertEqual(self.table.paginate(1, after = page.after, rows = "namedtuple")[0].name,"World")
+        ## The Table's factory is not affected
+        self.assertIsInstance(self.table.select()[0],objects.AdvancedRow)
+        self.assertRaises(ValueError, self.table.select, rows = "dict")
+        self.assertRaises(ValueError, self.table.select, rows = "tuple", prefetch = ["value",])
+
+    def test_namedtuple(self):
+        """ Tests that namedtuple classes are reused and that invalid field names are renamed """
+        first = self.table.select(rows = "namedtuple")
+        second = self.table.quickselect(value = 2, rows = "namedtuple")
+        self.assertIs(type(first[0]),type(second[0]))
+        cursor = self.connection.cursor()
+        cursor.execute("""SELECT COUNT(*), name FROM testtable;""")
+        cursor.row_factory = objects.namedtuple_factory(cursor)
+        row = cursor.fetchone()
+        self.assertEqual(row._0,2)
+        self.assertEqual(row.name,"Hello")
+
+class ColumnsCase(unittest.TestCase):
+    """ TestCase for AdvancedTable.to_columns and AdvancedTable.iter_columns """
+    def setUp(self):
+        utils.setupconnection(self)
+        self.connection.execute("""CREATE TABLE measurements (measurementid INTEGER PRIMARY KEY, sensor TEXT, reading REAL, count INT, flag BOOLEAN, data BLOB);""")
+        self.connection.executemany("""INSERT INTO measurements (sensor, reading, count, flag, data) VALUES (?,?,?,?,?);""",
+                                    [(f"sensor{i%3}", i/2, i, i%2, bytes([i])) for i in range(100)])
+        self.connection.row_factory = objects.advancedrow_factory
+        self.table = self.connection.getadvancedtable("measurements")
+        return super().setUp()
+
+    def test_affinity(self):
+        """ Tests that Column affinities follow sqlite's rules """
+        self.assertEqual([column.affinity for column in self.table.columns.values()],["INTEGER","TEXT","REAL","INTEGER","NUMERIC","BLOB"])
+
+    def test_numpy(self):
+        """ Tests to_columns with numpy arrays """
+        numpy = Utilities.numpy
+        if numpy is None: self.skipTest("numpy is not installed")
+        columns = self.table.to_columns(["pk","sensor","reading","count","flag"], count__lt = 10, batch_size = 3)
+        self.assertEqual(list(columns),["pk","sensor","reading","count","flag"])
+        self.assertEqual(columns['pk'].dtype,numpy.int64)
+        self.assertEqual(list(columns['pk']),list(range(1,11)))
+        self.assertEqual(columns['sensor'].dtype,object)
+        self.assertEqual(columns['reading'].dtype,numpy.float64)
+        self.assertEqual(columns['reading'].sum(),22.5)
+        self.assertEqual(columns['count'].dtype,numpy.int64)
+        self.assertEqual(columns['flag'].dtype,numpy.float64)
+        columns = self.table.to_columns("reading", objects.Q(sensor = "sensor0") | objects.Q(count = 1))
+        self.assertEqual(len(columns['reading']),35)
+        self.assertEqual(len(self.table.to_columns("data", count = 1000)['data']),0)
+
+    def test_array(self):
+        """ Tests to_columns without numpy """
+        columns = self.table.to_columns(["count","reading","data"], usenumpy = False)
+        self.assertIsInstance(columns['count'],array.array)
+        self.assertEqual(columns['count'].typecode,"q")
+        self.assertEqual(list(columns['count']),list(range(100)))
+        self.assertEqual(columns['reading'].typecode,"d")
+        self.assertEqual(columns['data'],[bytes([i]) for i in range(100)])
+
+    def test_conversion(self):
+        """ Tests that buffers are converted when values do not match the column's affinity """
+        self.connection.execute("""INSERT INTO measurements (sensor, reading, count) VALUES ("sensor0",NULL,NULL);""")
+        self.connection.execute("""INSERT INTO measurements (sensor, reading, count) VALUES ("sensor1","high",2.5);""")
+        for usenumpy in (False,True):
+            if usenumpy and Utilities.numpy is None: continue
+            columns = self.table.to_columns(["count","reading"], pk__gte = 99, usenumpy = usenumpy, batch_size = 1)
+            count,reading = list(columns['count']),list(columns['reading'])
+            self.assertEqual(count[:2]+count[3:],[98,99,2.5])
+            self.assertTrue(math.isnan(count[2]))
+            self.assertEqual(reading[:2]+reading[3:],[49.0,49.5,"high"])
+            self.assertTrue(math.isnan(reading[2]))
+
+    def test_iter_columns(self):
+        """ Tests that iter_columns yields batches """
+        batches = list(self.table.iter_columns(["pk","count"], batch_size = 40, usenumpy = False))
+        self.assertEqual([len(batch['count']) for batch in batches],[40,40,20])
+        self.assertEqual([value for batch in batches for value in batch['pk']],list(range(1,101)))
+        self.assertRaises(AttributeError, self.table.to_columns, ["notacolumn",])
+        self.assertRaises(ValueError, self.table.to_columns, [])
+
+class QueryCacheCase(unittest.TestCase):
+    """ TestCase for the compiled query cache used by AdvancedTable's quick-query methods """
+    def setUp(self):
+        utils.setupconnection(self)
+        utils.populatetesttable(self)
+        self.connection.row_factory = objects.dict_factory
+        self.table = self.connection.getadvancedtable("testtable")
+        objects.QUERYCACHE.clear()
+        return super().setUp()
+
+    def test_identical(self):
+        """ Tests that compiled queries produce exactly the same sql and replacements as _selectqueryparser """
+        for kw in [dict(),
+                   dict(name = "Hello"),
+                   dict(name = None, value__ne = None, pk__gt = None),
+                   dict(value__gte = 1, name__likeany = "ell", name__like = "H%"),
+                   dict(name__in = ["Hello","World"], value__notin = (3,4,5), pk = 1),
+                   dict(name__in = [], value__lt = 2),
+                   ]:
+            with self.subTest(kw = kw):
+                querystrings,replacements = objects._selectqueryparser(self.table.rowid,list(self.table.columns),rowid = self.table.rowid, **kw)
+                for i in range(2):
+                    querystring,replacementdict = self.table._quickquery(kw)
+                    self.assertEqual(querystring," AND ".join(querystrings))
+                    self.assertEqual(replacementdict,replacements)
+
+    def test_hits(self):
+        """ Tests that repeated query shapes are compiled once and bound with new values """
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+        self.assertEqual(self.table.quickselect(name = "Hello").first()['value'],1)
+        misses = objects.QUERYCACHE.misses
+        self.assertEqual(self.table.quickselect(name = "World").first()['value'],2)
+        self.assertEqual(objects.QUERYCACHE.misses,misses)
+        self.assertEqual(len(self.table.quickselect(name__in = ["Hello","World"])),2)
+        self.assertEqual(len(self.table.quickselect(name__in = ["Foo","World"])),1)
+        ## Different list lengths and None values are different shapes
+        self.assertEqual(len(self.table.quickselect(name__in = ["Hello"])),1)
+        self.assertEqual(len(self.table.quickselect(name = None)),0)
+        self.connection.set_trace_callback(None)
+        self.assertEqual(statements[0],statements[1].replace("'World'","'Hello'"))
+
+        self.table.quickupdate(WHERE = dict(name = "Hello"), value = 10)
+        self.table.quickupdate(WHERE = dict(name = "World"), value = 20)
+        self.assertEqual([row['value'] for row in self.table.selectall()],[10,20])
+        self.table.quickdelete(value__gt = 15)
+        self.table.quickdelete(value__gt = 5)
+        self.assertEqual(len(self.table.selectall()),0)
+
+    def test_errors(self):
+        """ Tests that invalid queries still raise errors and are not cached """
+        for i in range(2):
+            self.assertRaises(ValueError, self.table.quickselect, notacolumn = 1)
+            self.assertRaises(ValueError, self.table.quickselect, name__in = "Hello")
+            self.assertRaises(NotImplementedError, self.table.quickselect, name__notanoption = 1)
+            self.assertRaises(ValueError, self.table.quickupdate, WHERE = dict(name = "Hello"), notacolumn = 1)
+            self.assertRaises(AttributeError, self.table.select, columns = ["notacolumn"])
+            self.assertRaises(ValueError, self.table.select, limit = "1")
+
+    def test_disabled(self):
+        """ Tests that the cache is not used when usequerycache is False """
+        self.table.usequerycache = False
+        self.table.quickselect(name = "Hello")
+        self.table.quickupdate(WHERE = dict(name = "Hello"), value = 10)
+        self.assertEqual(len(objects.QUERYCACHE),0)
+
 if __name__ == "__main__":
     unittest.main()
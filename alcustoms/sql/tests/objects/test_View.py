@@ -0,0 +1,135 @@
+## Test Target
+from alcustoms.sql.objects import View
+## Test Framework
+import unittest
+
+## Testing Utilities
+from alcustoms.sql.tests import utils
+
+## Sister Modules
+from alcustoms import sql
+from alcustoms.sql import constants, objects
+from alcustoms.sql.objects import graphdb
+
+class JoinCase(unittest.TestCase):
+    """ TestCase for View.Join and AdvancedTable.join """
+    def setUp(self):
+        utils.setupconnection(self)
+        self.connection.row_factory = objects.advancedrow_factory
+        utils.setupadvancedtables(self)
+        return super().setUp()
+
+    def test_on(self):
+        """ Tests that ON clauses are inferred from Foreign Keys """
+        join = self.posts.join("users")
+        self.assertEqual(join.sql(),"posts LEFT JOIN users ON posts.userid = users.userid")
+        ## Foreign Keys can be in either table
+        join = self.users.join(self.posts, jointype = "INNER", alias = "p")
+        self.assertEqual(join.sql(),"users INNER JOIN posts AS p ON users.userid = p.userid")
+        join = View.INNERJOIN(self.posts,self.users).join("comments", oncolumns = "pid")
+        self.assertEqual(join.sql(),"posts INNER JOIN users ON posts.userid = users.userid LEFT JOIN comments ON posts.postid = comments.pid")
+        join = self.comments.join("comments", alias = "parent", oncolumns = [("replyto","parent.commentid"),])
+        self.assertEqual(join.sql(),"comments LEFT JOIN comments AS parent ON comments.replyto = parent.commentid")
+        self.assertEqual(View.NATURALINNERJOIN(self.users,self.posts).sql(),"users NATURAL INNER JOIN posts")
+
+    def test_errors(self):
+        """ Tests that invalid Joins raise errors """
+        ## comments references both posts and users
+        self.assertRaises(ValueError, self.posts.join("users").join, "comments")
+        ## comments references itself
+        self.assertRaises(ValueError, self.comments.join, "comments", alias = "parent")
+        self.assertRaises(ValueError, self.comments.join, "comments")
+        self.assertRaises(AttributeError, self.users.join, self.connection.getadvancedtable("testtable"))
+        self.assertRaises(AttributeError, self.posts.join, "users", jointype = "SIDEWAYS")
+        self.assertRaises(AttributeError, self.posts.join, "users", oncolumns = [("notacolumn","userid"),])
+        self.assertRaises(AttributeError, self.posts.join("users").join, "comments", oncolumns = [("userid","uid"),])
+        self.assertRaises(ValueError, View.NATURALLEFTJOIN, self.posts, self.users, oncolumns = [("userid","userid"),])
+
+    def test_select(self):
+        """ Tests that rows are split per table and that a single query is used """
+        join = self.posts.join("users", alias = "author")
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+        rows = join.select()
+        self.connection.set_trace_callback(None)
+        self.assertEqual(len(statements),1)
+        self.assertEqual(len(rows),len(self.posts.selectall()))
+        for row in rows:
+            self.assertEqual(set(row),set(["posts","author"]))
+            self.assertIsInstance(row['posts'],objects.AdvancedRow)
+            self.assertEqual(row['posts'].userid,row['author'])
+        self.assertEqual(rows[0]['author'].table.name,"users")
+
+        ## LEFT JOINs which do not match return None
+        rows = self.users.join("posts").select()
+        self.assertEqual(sorted(row['users'].pk for row in rows if row['posts'] is None),[2,4])
+
+        ## Tables without an AdvancedRow_Factory return dicts
+        users = self.connection.getadvancedtable("users")
+        users.row_factory = None
+        rows = self.posts.join(users).select(limit = 2)
+        self.assertEqual(len(rows),2)
+        self.assertIsInstance(rows[0]['users'],dict)
+        self.assertEqual(rows[0]['users']['userid'],rows[0]['posts'].userid.userid)
+
+    def test_filters(self):
+        """ Tests that filters can refer to any table in the Join """
+        join = self.posts.join("users", alias = "author", jointype = "INNER").join("comments", oncolumns = "pid", alias = "c")
+        rows = join.select(author__fname = "Alice", c__comment = "lol")
+        self.assertTrue(rows)
+        self.assertTrue(all(row['author'].fname == "Alice" and row['c'].comment == "lol" for row in rows))
+        self.assertEqual(len(rows),len([comment for post in self.posts.quickselect(userid = 3) for comment in self.comments.quickselect(pid = post.pk, comment = "lol")]))
+
+        rows = join.select(userid__in = [1,], author__lname__like = "D%", c__pk__gt = 10)
+        self.assertTrue(rows)
+        self.assertTrue(all(row['posts'].userid.pk == 1 and row['c'].pk > 10 for row in rows))
+        self.assertEqual(join.select(author__email__likeany = "nothing"),[])
+        self.assertRaises(ValueError, join.select, author__notacolumn = 1)
+
+    def test_quickqueryfilters(self):
+        """ Tests that Q expressions, Foreign Key traversal and large in/notin lists are compiled like quickselect """
+        join = self.posts.join("users", alias = "author", jointype = "INNER").join("comments", oncolumns = "pid", alias = "c")
+        ## Positional Q expressions filter the base table; Q expressions passed as an alias filter that table
+        rows = join.select(sql.Q(postid = 1) | sql.Q(postid = 3), c = sql.Q(comment = "lol") | sql.Q(uid = 3))
+        self.assertTrue(rows)
+        self.assertTrue(all(row['posts'].pk in (1,3) and (row['c'].comment == "lol" or row['c'].uid.pk == 3) for row in rows))
+        ## Foreign Key traversal from a joined table (comments.uid -> users)
+        rows = join.select(c__uid__fname = "Alice")
+        self.assertTrue(rows)
+        self.assertTrue(all(row['c'].uid.fname == "Alice" for row in rows))
+        ## Large lists use temporary tables
+        rows = join.select(c__pk__in = list(range(-constants.REPLACEMENT_LIMIT,3)), author__fname__notin = [str(i) for i in range(constants.REPLACEMENT_LIMIT)])
+        self.assertEqual(sorted(row['c'].pk for row in rows),[1,2])
+        self.assertEqual(self.connection.execute("""SELECT * FROM temp.sqlite_master;""").fetchall(),[])
+        ## Replacements are unique across tables
+        rows = join.select(sql.Q(postid = 3), author = sql.Q(userid = 3), c = sql.Q(uid = 3))
+        self.assertTrue(rows)
+        self.assertTrue(all(row['c'].uid.pk == 3 for row in rows))
+
+    def test_rowfactory(self):
+        """ Tests that rows are created with the class of each table's row_factory """
+        db = graphdb.GraphDB(":memory:")
+        db.execute("""CREATE TABLE owners (ownerid INTEGER PRIMARY KEY, name TEXT);""")
+        db.execute("""CREATE TABLE pets (name TEXT, owner INT REFERENCES owners(ownerid));""")
+        db.execute("""INSERT INTO owners (name) VALUES ("Alice");""")
+        db.execute("""INSERT INTO pets (name, owner) VALUES ("Doge", 1);""")
+        rows = db.getadvancedtable("pets").join("owners").select()
+        self.assertIsInstance(rows[0]['pets'],graphdb.Node)
+        self.assertIsInstance(rows[0]['owners'],graphdb.Node)
+        self.assertEqual(rows[0]['owners'].name,"Alice")
+
+    def test_columns(self):
+        """ Tests column projection """
+        join = self.posts.join("users", alias = "author")
+        rows = join.select(columns = ["post","author.fname"])
+        self.assertEqual(list(rows[0]['posts'].row),["postid","post"])
+        self.assertEqual(list(rows[0]['author'].row),["userid","fname"])
+        rows = join.select(columns = ["author.*",], distinct = True)
+        self.assertEqual(set(rows[0]),set(["author",]))
+        self.assertEqual(len(rows),2)
+        ## userid is in both tables
+        self.assertRaises(AttributeError, join.select, columns = ["userid",])
+        self.assertRaises(AttributeError, join.select, columns = ["notatable.*",])
+
+if __name__ == "__main__":
+    unittest.main()
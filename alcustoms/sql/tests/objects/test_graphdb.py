@@ -51,7 +51,8 @@ class BasicCase(unittest.TestCase):
         self.assertEqual(table.name,"graphdb_edges")
         ## Check all the expected columns
         for column in ["node1table","node1row","node1relation",
-                       "node2table","node2row","node2relation"]:
+                       "node2table","node2row","node2relation",
+                       "node1key","node2key"]:
             with self.subTest(column = column, table = table):
                 self.assertIn(column,table.columns)
 
@@ -73,12 +74,225 @@ class BasicCase(unittest.TestCase):
 
         db.execute("""INSERT INTO graphdb_edges (node1table,node1row,node1relation,node2table,node2row,node2relation) VALUES (1,2,"Hello",3,4,"World");""")
         result = db.execute("""SELECT * FROM graphdb_edges WHERE rowid = 1;""").fetchone()
-        self.assertEqual(result,dict(node1table=1,node1row=2,node1relation="Hello",node2table=3,node2row=4,node2relation="World"))
+        ## Relation keys are filled in by graphdb_edges' triggers
+        self.assertEqual(result,dict(node1table=1,node1row=2,node1relation="Hello",node2table=3,node2row=4,node2relation="World",node1key="hello",node2key="world"))
 
         table = db.getadvancedtable("graphdb_edges")
         table.insert(node1table = 5, node1row = 6, node1relation = "Foo", node2table = 7, node2row = 8, node2relation = "Bar")
         result = table.quickselect(pk = 2).first()
-        self.assertEqual(result.row,dict(rowid = 2, node1table = 5, node1row = 6, node1relation = "Foo", node2table = 7, node2row = 8, node2relation = "Bar"))
+        self.assertEqual(result.row,dict(rowid = 2, node1table = 5, node1row = 6, node1relation = "Foo", node2table = 7, node2row = 8, node2relation = "Bar", node1key = "foo", node2key = "bar"))
+
+class StorageCase(unittest.TestCase):
+    """ Tests for the layout of graphdb_edges """
+    def setUp(self):
+        setupconnection(self)
+        return super().setUp()
+
+    def test_tableid(self):
+        """ Tests that edges store integer tableids """
+        populateedges(self)
+        users,pets = self.connection.tableid(self.users),self.connection.tableid("pets")
+        self.assertNotEqual(users,pets)
+        self.assertEqual(self.connection.tablename(users),"users")
+        rows = self.connection.execute("""SELECT DISTINCT typeof(node1table), typeof(node2table) FROM graphdb_edges;""").fetchall()
+        self.assertEqual(rows,[{"typeof(node1table)":"integer","typeof(node2table)":"integer"},])
+        self.assertEqual(len(self.connection.getedge(node1table = "pets")),2)
+        self.assertEqual(len(self.connection.getedge(node1table = pets)),2)
+        ## Tables without edges
+        self.connection.execute("""CREATE TABLE food (name TEXT);""")
+        self.assertEqual(self.connection.getedge(node1table = "food"),[])
+        self.assertIsNone(self.connection.tableid("food", create = False))
+        self.assertRaises(ValueError, self.connection.tablename, 100)
+
+    def test_indexes(self):
+        """ Tests that edge lookups use an index """
+        populateedges(self)
+        alice = self.users.quickselect(name = "Alice").first()
+        for node in ("node1","node2"):
+            with self.subTest(node = node):
+                plan = self.connection.execute(f"""EXPLAIN QUERY PLAN SELECT * FROM graphdb_edges WHERE {node}table = ? AND {node}row = ?;""",(self.connection.tableid(alice),alice.pk)).fetchall()
+                self.assertIn(f"USING INDEX graphdb_edges_{node}",plan[0]['detail'])
+                plan = self.connection.execute(f"""EXPLAIN QUERY PLAN SELECT * FROM graphdb_edges WHERE {node}table = ? AND {node}row = ? AND {node}key = ?;""",(self.connection.tableid(alice),alice.pk,"owner")).fetchall()
+                self.assertIn(f"{node}key=?",plan[0]['detail'])
+
+    @utils.filemanager
+    def test_rollback(self, file):
+        """ Tests that tables registered in a rolled back transaction are registered again (regression test for orphaned edges) """
+        db = graphdb.GraphDB(file)
+        db.execute("""CREATE TABLE users (name TEXT);""")
+        db.execute("""INSERT INTO users (name) VALUES ("Alice"),("Bob");""")
+        db.commit()
+        users = db.getadvancedtable("users")
+        alice,bob = users.quickselect(name = "Alice").first(),users.quickselect(name = "Bob").first()
+        db.create_edge(alice, bob, node1relation = "sister")
+        db.rollback()
+        self.assertFalse(db.isrelation("sister"))
+        db.create_edge(alice, bob, node1relation = "sister")
+        db.commit()
+        ## Rolling back with a statement bypasses GraphDB.rollback
+        db.execute("""CREATE TABLE pets (name TEXT);""")
+        db.execute("""INSERT INTO pets (name) VALUES ("Caterson");""")
+        db.commit()
+        caterson = db.getadvancedtable("pets").quickselect(name = "Caterson").first()
+        db.create_edge(caterson, alice, node1relation = "owner")
+        db.execute("""ROLLBACK;""")
+        db.create_edge(caterson, alice, node1relation = "owner")
+        self.assertEqual(db.tablename(db.tableid("pets")),"pets")
+        db.commit()
+        db.close()
+
+        db = graphdb.GraphDB(file)
+        self.assertEqual(db.execute("""SELECT name FROM graphdb_tables ORDER BY name;""").fetchall(),[{"name":"pets"},{"name":"users"}])
+        alice = db.getadvancedtable("users").quickselect(name = "Alice").first()
+        self.assertEqual(len(alice.edges),2)
+        self.assertEqual(sorted(node.name for node in db.traverse(alice)[1]),["Bob","Caterson"])
+        db.close()
+
+    @utils.filemanager
+    def test_readonly(self, file):
+        """ Tests that an existing GraphDB can be opened without writing to it """
+        db = graphdb.GraphDB(file)
+        db.execute("""CREATE TABLE users (name TEXT);""")
+        db.execute("""INSERT INTO users (name) VALUES ("Alice"),("Bob");""")
+        users = db.getadvancedtable("users")
+        db.create_edge(users.quickselect(name = "Alice").first(), users.quickselect(name = "Bob").first(), node1relation = "sister")
+        db.commit()
+        db.close()
+
+        ## No statements are executed on the existing schema
+        class RecordingGraphDB(graphdb.GraphDB):
+            def execute(self, sql, *args, **kw):
+                statements.append(sql)
+                return super().execute(sql, *args, **kw)
+        statements = []
+        RecordingGraphDB(file, isolation_level = None).close()
+        self.assertEqual(statements,[])
+
+        ## Another connection holds the write lock
+        writer = sql.Database(file)
+        writer.execute("""BEGIN IMMEDIATE;""")
+        try:
+            db = graphdb.GraphDB(file, timeout = 0)
+            self.assertFalse(db.in_transaction)
+            db.close()
+        finally:
+            writer.rollback()
+            writer.close()
+
+        db = graphdb.GraphDB(f"{file.as_uri()}?mode=ro", uri = True)
+        alice = db.getadvancedtable("users").quickselect(name = "Alice").first()
+        self.assertEqual(alice.sister.first().node2.name,"Bob")
+        db.close()
+
+    @utils.filemanager
+    def test_migrate(self, file):
+        """ Tests that edge tables which stored table names are migrated """
+        db = sql.Database(file)
+        db.execute("""CREATE TABLE users (name TEXT);""")
+        db.execute("""CREATE TABLE pets (name TEXT);""")
+        db.execute("""INSERT INTO users (name) VALUES ("Alice"),("Bob");""")
+        db.execute("""INSERT INTO pets (name) VALUES ("Caterson");""")
+        db.execute("""CREATE TABLE graphdb_edges (node1table INT, node1row INT, node1relation TEXT, node2table INT, node2row INT, node2relation TEXT);""")
+        db.execute("""INSERT INTO graphdb_edges VALUES ("users",1,"sister","users",2,"brother"),("pets",1,"owner","users",1,"owned by");""")
+        db.commit()
+        db.close()
+
+        db = graphdb.GraphDB(file)
+        self.assertFalse(db.in_transaction)
+        rows = db.execute("""SELECT node1table, node2table FROM graphdb_edges;""").fetchall()
+        self.assertTrue(all(isinstance(value,int) for row in rows for value in row.values()))
+        alice = db.getadvancedtable("users").quickselect(name = "Alice").first()
+        self.assertEqual(alice.sister.first().node2.name,"Bob")
+        self.assertEqual(alice.owned_by.first().node1.name,"Caterson")
+        db.close()
+
+    @utils.filemanager
+    def test_migrate_relationkeys(self, file):
+        """ Tests that relation keys are added to edge tables which were created without them """
+        db = sql.Database(file)
+        db.execute("""CREATE TABLE users (name TEXT);""")
+        db.execute("""INSERT INTO users (name) VALUES ("Alice"),("Bob");""")
+        db.execute("""CREATE TABLE graphdb_tables (tableid INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);""")
+        db.execute("""INSERT INTO graphdb_tables (name) VALUES ("users");""")
+        db.execute("""CREATE TABLE graphdb_edges (node1table INT, node1row INT, node1relation TEXT, node2table INT, node2row INT, node2relation TEXT);""")
+        db.execute("""CREATE INDEX graphdb_edges_node1 ON graphdb_edges (node1table, node1row, node1relation);""")
+        db.execute("""INSERT INTO graphdb_edges VALUES (1,1,"Big_Sister",1,2,"Little Brother");""")
+        db.commit()
+        db.close()
+
+        db = graphdb.GraphDB(file)
+        self.assertFalse(db.in_transaction)
+        self.assertEqual(db.execute("""SELECT node1key, node2key FROM graphdb_edges;""").fetchall(),[dict(node1key = "big sister", node2key = "little brother"),])
+        self.assertEqual(db.execute("""PRAGMA index_info(graphdb_edges_node1);""").fetchall()[-1]['name'],"node1key")
+        alice = db.getadvancedtable("users").quickselect(name = "Alice").first()
+        self.assertEqual(alice.big_sister.first().node2.name,"Bob")
+        db.close()
+
+class RelationCase(unittest.TestCase):
+    """ TestCase for relation keys and GraphDB.isrelation """
+    def setUp(self):
+        setupconnection(self)
+        populateedges(self)
+        self.alice = self.users.quickselect(name = "Alice").first()
+        self.caterson = self.pets.quickselect(name = "Caterson").first()
+        return super().setUp()
+
+    def test_normalizerelation(self):
+        """ Tests that normalizerelation matches the sql used by the triggers """
+        self.assertEqual(graphdb.normalizerelation("Owned_By"),"owned by")
+        ## Only ASCII letters are lowercased (like sqlite's lower function)
+        self.assertEqual(graphdb.normalizerelation("ÉCOLE"),"École")
+        self.assertIsNone(graphdb.normalizerelation(None))
+        self.connection.execute("""UPDATE graphdb_edges SET node1relation = "Best_Friend" WHERE rowid = 1;""")
+        self.assertEqual(self.connection.getedge(1).node1key,"best friend")
+
+    def test_isrelation(self):
+        """ Tests that known relations are cached """
+        self.assertTrue(self.connection.isrelation("OWNED_BY"))
+        self.assertFalse(self.connection.isrelation("enemy"))
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+        self.assertTrue(self.connection.isrelation("Owner"))
+        self.assertFalse(self.connection.isrelation("enemy"))
+        self.connection.set_trace_callback(None)
+        ## Known relations don't query the database and unknown relations only check data_version
+        self.assertEqual(statements,["PRAGMA data_version;",])
+
+        ## Changes made by the connection
+        self.connection.create_edge(self.alice,self.caterson, node1relation = "Enemy")
+        self.assertTrue(self.connection.isrelation("enemy"))
+        self.connection.execute("""INSERT INTO graphdb_edges (node1relation) VALUES ("Friend");""")
+        self.assertTrue(self.connection.isrelation("friend"))
+
+    @utils.filemanager
+    def test_otherconnection(self, file):
+        """ Tests that relations added by other connections are found """
+        db = graphdb.GraphDB(file)
+        other = graphdb.GraphDB(file)
+        try:
+            db.execute("""CREATE TABLE users (name TEXT);""")
+            db.execute("""INSERT INTO users (name) VALUES ("Alice"),("Bob");""")
+            db.commit()
+            self.assertFalse(other.isrelation("friend"))
+            db.create_edge(node1 = 1, node1table = "users", node2 = 2, node2table = "users", node1relation = "friend")
+            db.commit()
+            self.assertTrue(other.isrelation("Friend"))
+        finally:
+            db.close()
+            other.close()
+
+    def test_attributes(self):
+        """ Tests that Node attributes use relation keys """
+        self.assertEqual(self.alice.Owned_By,self.alice.owned_by)
+        self.assertEqual(len(self.alice.OWNER),1)
+        self.assertEqual([edge.pk for edge in self.caterson.likes__this],[5,])
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+        self.assertRaises(AttributeError, getattr, self.alice, "enemy")
+        self.assertEqual(len(self.alice.sister),1)
+        self.connection.set_trace_callback(None)
+        ## "enemy" only checks data_version and "sister" needs one query (excluding schema checks)
+        self.assertEqual(len([statement for statement in statements if not statement.startswith("PRAGMA") and "sqlite_master" not in statement]),1)
 
 class EdgeCase(unittest.TestCase):
     def setUp(self):
@@ -209,5 +423,302 @@ class GraphDBCase(unittest.TestCase):
         populateedges(self)
         return super().setUp()
 
+class NeighborCase(unittest.TestCase):
+    """ TestCase for GraphDB.neighbors and GraphDB.incident_edges """
+    ## The number of queries of graphdb_edges neighbors and incident_edges should execute
+    edgequeries = 1
+    def setUp(self):
+        setupconnection(self)
+        populateedges(self)
+        self.alice,self.bob = self.users.quickselect(name = "Alice").first(), self.users.quickselect(name = "Bob").first()
+        return super().setUp()
+
+    def trace(self,function,*args,**kw):
+        """ Returns the result of the function and the statements it executed (excluding schema checks and the adjacency cache's rollback marker) """
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+        try:
+            result = function(*args,**kw)
+        finally:
+            self.connection.set_trace_callback(None)
+        return result,[statement for statement in statements if not statement.startswith("PRAGMA") and "sqlite_master" not in statement and "graphdb_adjacency_marker" not in statement]
+
+    def test_neighbors(self):
+        """ Tests that neighbors uses one query for the Edges and one query per table for the neighbors """
+        result,statements = self.trace(self.connection.neighbors,self.alice)
+        self.assertEqual(len(statements),self.edgequeries + 2)
+        self.assertEqual([(edge.pk,neighbor.name) for edge,neighbor in result],[(1,"Bob"),(3,"Elefanzo"),(4,"Caterson")])
+        self.assertIsInstance(result[0][0],graphdb.Edge)
+        self.assertIsInstance(result[0][1],graphdb.Node)
+
+        ## Edge nodes are already loaded
+        nodes,statements = self.trace(lambda: [(edge.other(self.alice),edge.node1,edge.node2) for edge,neighbor in result])
+        self.assertEqual(statements,[])
+        self.assertEqual([other.name for other,node1,node2 in nodes],["Bob","Elefanzo","Caterson"])
+        self.assertEqual([node1.name for other,node1,node2 in nodes],["Alice","Alice","Caterson"])
+
+        ## Edges between given nodes are listed for both nodes
+        result = self.connection.neighbors([self.alice,("users",self.bob.pk)])
+        self.assertEqual([(edge.pk,neighbor.name) for edge,neighbor in result],[(1,"Bob"),(1,"Alice"),(2,"Doge"),(3,"Elefanzo"),(4,"Caterson")])
+
+        result = self.connection.neighbors(self.alice, relations = "OWNER", direction = "out")
+        self.assertEqual([(edge.pk,neighbor.name) for edge,neighbor in result],[(3,"Elefanzo"),])
+        result = self.connection.neighbors(self.alice, direction = "in")
+        self.assertEqual([(edge.pk,neighbor.name) for edge,neighbor in result],[(4,"Caterson"),])
+        self.assertEqual(self.connection.neighbors([]),[])
+        self.assertRaises(ValueError, self.connection.neighbors, self.alice, direction = "sideways")
+
+    def test_incident_edges(self):
+        """ Tests that incident_edges (and Node.edges) use a single query """
+        alice = self.connection.getadvancedtable("users").quickselect(pk = self.alice.pk).first()
+        edges,statements = self.trace(lambda: alice.edges)
+        self.assertEqual(len(statements),self.edgequeries)
+        self.assertEqual([edge.pk for edge in edges],[1,3,4])
+        self.assertEqual(edges,self.connection.getedge(pk__in = [1,3,4]))
+        self.assertEqual([edge.pk for edge in self.connection.incident_edges([self.alice,self.bob])],[1,2,3,4])
+        self.assertEqual([edge.pk for edge in self.connection.incident_edges(self.bob, relations = ["brother","Sister"])],[1,])
+        self.assertEqual([edge.pk for edge in self.connection.incident_edges(self.alice, relations = "owner", reverse = True)],[4,])
+        self.assertEqual([edge.node2relation for edge in self.connection.incident_edges(self.alice, direction = "in")],["owned by",])
+
+class CachedNeighborCase(NeighborCase):
+    """ Runs NeighborCase with the adjacency cache enabled """
+    edgequeries = 0
+    def setUp(self):
+        super().setUp()
+        self.connection.use_adjacency_cache()
+        ## Load the cache
+        self.connection.adjacency
+
+    def test_stale(self):
+        """ Tests that changes to graphdb_edges which are not made by create_edge are reflected in the results """
+        self.connection.execute("""UPDATE graphdb_edges SET node1relation = 'enemy' WHERE rowid = 1;""")
+        self.assertEqual([edge.pk for edge in self.connection.incident_edges(self.alice, relations = "enemy")],[1,])
+        self.connection.execute("""DELETE FROM graphdb_edges WHERE rowid = 3;""")
+        self.assertEqual([(edge.pk,neighbor.name) for edge,neighbor in self.connection.neighbors(self.alice)],[(1,"Bob"),(4,"Caterson")])
+
+class TraversalCase(unittest.TestCase):
+    """ TestCase for GraphDB.traverse, GraphDB.reachable, and GraphDB.shortest_path """
+    ## The number of recursive queries traverse should execute
+    recursivequeries = 1
+    def setUp(self):
+        setupconnection(self)
+        populateedges(self)
+        self.alice,self.bob = self.users.quickselect(name = "Alice").first(), self.users.quickselect(name = "Bob").first()
+        self.caterson,self.doge,self.elefanzo = [self.pets.quickselect(name = name).first() for name in ["Caterson","Doge","Elefanzo"]]
+        return super().setUp()
+
+    def names(self,nodes):
+        return [node.name for node in nodes]
+
+    def test_traverse(self):
+        """ Tests that traverse groups Nodes by depth, only visits each Node once, and uses a single recursive query """
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+        result = self.connection.traverse(self.alice, max_depth = 2)
+        self.connection.set_trace_callback(None)
+        self.assertEqual(len([statement for statement in statements if "WITH RECURSIVE" in statement]),self.recursivequeries)
+        self.assertEqual([self.names(nodes) for nodes in result],[["Alice"],["Bob","Caterson","Elefanzo"],["Doge"]])
+        self.assertIsInstance(result[1][0],graphdb.Node)
+
+        ## Alice, Caterson, and Elefanzo form a cycle
+        result = self.connection.traverse(("users",self.alice.pk), max_depth = 10)
+        self.assertEqual([self.names(nodes) for nodes in result],[["Alice"],["Bob","Caterson","Elefanzo"],["Doge"]])
+        self.assertEqual([self.names(nodes) for nodes in self.connection.traverse(self.alice, max_depth = 0)],[["Alice"],])
+
+        ## Relations and directions
+        result = self.connection.traverse(self.alice, relations = "owner", max_depth = 3, direction = "out")
+        self.assertEqual([self.names(nodes) for nodes in result],[["Alice"],["Elefanzo"]])
+        result = self.connection.traverse(self.alice, max_depth = 3, direction = "in")
+        self.assertEqual([self.names(nodes) for nodes in result],[["Alice"],["Caterson"],["Elefanzo"]])
+        result = self.connection.traverse(self.alice, relations = ["OWNED BY","brother"], max_depth = 3, direction = "in")
+        self.assertEqual([self.names(nodes) for nodes in result],[["Alice"],["Caterson"]])
+
+        ## Nodes without edges
+        self.connection.execute("""INSERT INTO users (name) VALUES ("Frank");""")
+        frank = self.users.quickselect(name = "Frank").first()
+        self.assertEqual([self.names(nodes) for nodes in self.connection.traverse(frank, max_depth = 3)],[["Frank"],])
+        self.connection.execute("""CREATE TABLE toys (name TEXT);""")
+        self.connection.execute("""INSERT INTO toys (name) VALUES ("Ball");""")
+        result = self.connection.traverse(("toys",1))
+        self.assertIsInstance(result[0][0],graphdb.Node)
+        self.assertEqual([self.names(nodes) for nodes in result],[["Ball"],])
+        ball = self.connection.getadvancedtable("toys").quickselect(name = "Ball").first()
+        self.assertEqual([self.names(nodes) for nodes in self.connection.traverse(ball)],[["Ball"],])
+        self.assertEqual(self.connection.traverse(("toys",2)),[[],])
+
+        self.assertRaises(ValueError, self.connection.traverse, self.alice, direction = "sideways")
+        self.assertRaises(ValueError, self.connection.traverse, self.alice, max_depth = -1)
+        self.assertRaises(TypeError, self.connection.traverse, "Alice")
+        self.assertRaises(TypeError, self.connection.traverse, self.alice, relations = [1,])
+
+    def test_reachable(self):
+        """ Tests that reachable returns every connected Node except the starting Node """
+        self.assertEqual(self.names(self.connection.reachable(self.doge)),["Alice","Bob","Caterson","Elefanzo"])
+        self.assertEqual(self.connection.reachable(self.doge, direction = "out"),[])
+        self.assertEqual(self.names(self.connection.reachable(self.bob, direction = "out")),["Doge"])
+        self.assertEqual(self.names(self.connection.reachable(self.alice, relations = ["owner","likes"], direction = "out")),["Caterson","Elefanzo"])
+
+    def test_shortest_path(self):
+        """ Tests shortest_path """
+        self.assertEqual(self.names(self.connection.shortest_path(self.doge,self.caterson)),["Doge","Bob","Alice","Caterson"])
+        self.assertEqual(self.names(self.connection.shortest_path(self.alice,self.caterson, direction = "out")),["Alice","Elefanzo","Caterson"])
+        self.assertEqual(self.names(self.connection.shortest_path(self.bob,self.doge, direction = "out")),["Bob","Doge"])
+        self.assertEqual(self.names(self.connection.shortest_path(self.alice,self.alice)),["Alice",])
+        self.assertIsNone(self.connection.shortest_path(self.bob,self.doge, direction = "in"))
+        self.assertIsNone(self.connection.shortest_path(self.doge,self.bob, direction = "out"))
+
+        ## Depth limits
+        self.assertIsNone(self.connection.shortest_path(self.doge,self.elefanzo, max_depth = 2))
+        self.assertEqual(self.names(self.connection.shortest_path(self.doge,self.elefanzo, max_depth = 3)),["Doge","Bob","Alice","Elefanzo"])
+        self.assertIsNone(self.connection.shortest_path(self.doge,self.bob, max_depth = 0))
+
+        ## Relations
+        self.assertIsNone(self.connection.shortest_path(self.elefanzo,self.alice, relations = "likes"))
+        self.assertEqual(self.names(self.connection.shortest_path(self.elefanzo,self.alice, relations = ["likes","Owner"])),["Elefanzo","Caterson","Alice"])
+        self.assertIsNone(self.connection.shortest_path(self.elefanzo,self.alice, relations = ["likes","owner"], direction = "in"))
+
+        self.connection.execute("""INSERT INTO users (name) VALUES ("Frank");""")
+        frank = self.users.quickselect(name = "Frank").first()
+        self.assertIsNone(self.connection.shortest_path(self.alice,frank))
+
+class CachedTraversalCase(TraversalCase):
+    """ Runs TraversalCase with the adjacency cache enabled """
+    recursivequeries = 0
+    def setUp(self):
+        super().setUp()
+        self.connection.use_adjacency_cache()
+
+class AdjacencyCase(unittest.TestCase):
+    """ TestCase for GraphDB's adjacency cache """
+    def setUp(self):
+        setupconnection(self)
+        populateedges(self)
+        self.connection.use_adjacency_cache()
+        self.alice,self.bob = self.users.quickselect(name = "Alice").first(), self.users.quickselect(name = "Bob").first()
+        self.caterson,self.doge,self.elefanzo = [self.pets.quickselect(name = name).first() for name in ["Caterson","Doge","Elefanzo"]]
+        return super().setUp()
+
+    def key(self,node):
+        return (self.connection.tableid(node),node.pk)
+
+    def test_cache(self):
+        """ Tests that the cache is loaded on demand and that graphdb_edges is not queried afterwards """
+        self.assertIsNone(self.connection._adjacencycache)
+        self.connection.traverse(self.alice)
+        cache = self.connection.adjacency
+        self.assertIsInstance(cache,graphdb.AdjacencyCache)
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+        self.assertEqual([node.name for node in self.connection.reachable(self.doge)],["Alice","Bob","Caterson","Elefanzo"])
+        self.connection.set_trace_callback(None)
+        self.assertFalse([statement for statement in statements if "graphdb_edges" in statement])
+        self.assertIs(self.connection.adjacency,cache)
+
+        self.assertEqual(cache.neighbors(self.key(self.alice)),[(1,self.key(self.bob)),(3,self.key(self.elefanzo)),(4,self.key(self.caterson))])
+        self.assertEqual(cache.neighbors(self.key(self.alice), relations = "Owned_By"),[(4,self.key(self.caterson)),])
+        self.assertEqual(cache.neighbors(self.key(self.alice), direction = "out"),[(1,self.key(self.bob)),(3,self.key(self.elefanzo))])
+        self.assertEqual(cache.neighbors((100,1)),[])
+
+        self.connection.use_adjacency_cache(False)
+        self.assertIsNone(self.connection.adjacency)
+        self.connection.traverse(self.alice)
+        self.assertIsNone(self.connection.adjacency)
+
+    def test_update(self):
+        """ Tests that create_edge and delete_edge update the cache in place """
+        self.connection.traverse(self.alice)
+        cache = self.connection.adjacency
+        edge = self.connection.create_edge(self.doge,self.elefanzo, node1relation = "friend")
+        self.assertEqual(self.connection.shortest_path(self.doge,self.elefanzo, relations = "Friend")[-1].name,"Elefanzo")
+        self.assertIs(self.connection.adjacency,cache)
+        self.connection.delete_edge(edge)
+        self.assertIsNone(self.connection.shortest_path(self.doge,self.elefanzo, relations = "Friend"))
+        self.assertEqual(self.connection.getedge(edge),None)
+        self.assertIs(self.connection.adjacency,cache)
+
+        ## The largest rowid is reused after being deleted
+        self.assertEqual(self.connection.create_edge(self.doge,self.caterson),edge)
+        self.assertEqual(cache.neighbors(self.key(self.doge)),[(2,self.key(self.bob)),(edge,self.key(self.caterson))])
+
+        self.connection.delete_edge(*self.connection.getedge(node1 = self.alice))
+        self.assertEqual(cache.neighbors(self.key(self.alice)),[(4,self.key(self.caterson)),])
+        cache.compact()
+        self.assertEqual(cache.neighbors(self.key(self.alice)),[(4,self.key(self.caterson)),])
+        ## Entries are grouped by relation once they are compacted
+        self.assertEqual(sorted(cache.neighbors(self.key(self.doge))),[(2,self.key(self.bob)),(edge,self.key(self.caterson))])
+        self.assertIs(self.connection.adjacency,cache)
+        self.assertRaises(TypeError, self.connection.delete_edge, "1")
+
+    def test_reload(self):
+        """ Tests that other changes to graphdb_edges cause the cache to be reloaded """
+        self.connection.commit()
+        self.connection.traverse(self.alice)
+        cache = self.connection.adjacency
+        ## Unrelated tables don't affect the cache
+        self.connection.execute("""INSERT INTO users (name) VALUES ("Frank");""")
+        self.connection.traverse(self.alice)
+        self.assertIs(self.connection.adjacency,cache)
+
+        self.connection.execute("""DELETE FROM graphdb_edges WHERE rowid = 1;""")
+        self.assertEqual([node.name for node in self.connection.traverse(self.bob)[1]],["Doge"])
+        self.assertIsNot(self.connection.adjacency,cache)
+
+        cache = self.connection.adjacency
+        self.connection.rollback()
+        self.assertEqual([node.name for node in self.connection.traverse(self.bob)[1]],["Alice","Doge"])
+        self.assertIsNot(self.connection.adjacency,cache)
+
+    def test_rawrollback(self):
+        """ Tests that rollbacks which bypass GraphDB.rollback cause the cache to be reloaded """
+        self.connection.commit()
+        names = lambda node: sorted(neighbor.name for edge,neighbor in self.connection.neighbors(node))
+        self.assertEqual(names(self.doge),["Bob"])
+        cache = self.connection.adjacency
+
+        self.connection.execute("""SAVEPOINT test;""")
+        self.connection.create_edge(self.doge, self.elefanzo, node1relation = "friend")
+        self.assertEqual(names(self.doge),["Bob","Elefanzo"])
+        self.connection.execute("""ROLLBACK TO test;""")
+        self.assertEqual(names(self.doge),["Bob"])
+        self.assertIsNot(self.connection.adjacency,cache)
+        self.connection.execute("""RELEASE test;""")
+
+        ## Caches loaded during a transaction
+        self.connection.execute("""DELETE FROM graphdb_edges WHERE node2row = ? AND node2table = ?;""",(self.doge.pk,self.connection.tableid(self.doge)))
+        self.assertEqual(names(self.doge),[])
+        self.connection.create_edge(self.doge, self.caterson)
+        self.assertEqual(names(self.doge),["Caterson"])
+        self.connection.execute("""ROLLBACK;""")
+        self.assertEqual(names(self.doge),["Bob"])
+
+        ## Committed changes are kept
+        cache = self.connection.adjacency
+        self.connection.create_edge(self.doge, self.elefanzo)
+        self.connection.commit()
+        self.assertEqual(names(self.doge),["Bob","Elefanzo"])
+        self.assertIs(self.connection.adjacency,cache)
+        self.connection.create_edge(self.doge, self.caterson)
+        self.connection.execute("""COMMIT;""")
+        self.assertEqual(names(self.doge),["Bob","Caterson","Elefanzo"])
+        self.assertIs(self.connection.adjacency,cache)
+
+    @utils.filemanager
+    def test_otherconnection(self, file):
+        """ Tests that commits by other connections cause the cache to be reloaded """
+        db = graphdb.GraphDB(file)
+        other = graphdb.GraphDB(file)
+        try:
+            db.execute("""CREATE TABLE users (name TEXT);""")
+            db.execute("""INSERT INTO users (name) VALUES ("Alice"),("Bob");""")
+            db.commit()
+            other.use_adjacency_cache()
+            self.assertEqual(other.reachable(("users",1)),[])
+            db.create_edge(node1 = 1, node1table = "users", node2 = 2, node2table = "users")
+            db.commit()
+            self.assertEqual([node.name for node in other.reachable(("users",1))],["Bob",])
+        finally:
+            db.close()
+            other.close()
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,111 @@
+## Test Target
+from alcustoms.sql import engine
+## Test Framework
+import unittest
+
+## Testing Utilities
+from alcustoms.sql.tests import utils
+
+## Sister Modules
+from alcustoms import sql
+from alcustoms.sql.objects import graphdb
+
+## Third Party
+import flask
+
+class EngineCase(unittest.TestCase):
+    """ TestCase for the flask app-context helpers in engine """
+    def setUp(self):
+        self.file = utils.check_physicalfile()
+        self.app = flask.Flask(__name__)
+        self.app.config['DATABASE_PATH'] = str(self.file)
+        self.pools = []
+        return super().setUp()
+
+    def tearDown(self):
+        for pool in self.pools: pool.close()
+        utils.check_physicalfile()
+        return super().tearDown()
+
+    def create_pools(self, readers = 1):
+        """ Creates a default and a graph pool and registers them with the app """
+        pools = {None: engine.create_pool(self.app, readers = readers, timeout = 0.1), "graph": engine.create_pool(self.app, "graph", readers = readers, timeout = 0.1)}
+        self.pools.extend(pools.values())
+        engine.init_app(self.app, pools)
+        return pools
+
+    def test_create_pool(self):
+        """ Tests that create_pool uses the same Database class and row_factory as get_db """
+        self.app.config['DATABASE_POOL_READERS'] = 2
+        pool = engine.create_pool(self.app)
+        self.pools.append(pool)
+        self.assertEqual(pool.size,2)
+        self.assertIs(pool.databaseclass,sql.Database)
+        self.assertIsInstance(pool.row_factory,sql.objects.AdvancedRow_Factory)
+        pool = engine.create_pool(self.app, "graph", readers = 1)
+        self.pools.append(pool)
+        self.assertIs(pool.databaseclass,graphdb.GraphDB)
+        self.assertIs(pool.row_factory,graphdb.node_factory)
+
+    def test_get_pool(self):
+        """ Tests that get_pool returns the pools registered with init_app """
+        engine.init_app(self.app)
+        with self.app.app_context():
+            self.assertIsNone(engine.get_pool())
+        pools = self.create_pools()
+        with self.app.app_context():
+            self.assertIs(engine.get_pool(),pools[None])
+            self.assertIs(engine.get_pool("graph"),pools["graph"])
+
+    def test_get_db(self):
+        """ Tests that get_db opens a connection per connection type when no pools are registered """
+        engine.init_app(self.app)
+        with self.app.app_context():
+            db = engine.get_db()
+            self.assertIs(type(db),sql.Database)
+            self.assertIs(engine.get_db(),db)
+            graph = engine.get_db("graph")
+            self.assertIsInstance(graph,graphdb.GraphDB)
+            self.assertIs(engine.get_db("graph"),graph)
+        ## Connections are closed on teardown
+        self.assertRaises(sql.ProgrammingError, db.execute, """SELECT 1;""")
+        self.assertRaises(sql.ProgrammingError, graph.execute, """SELECT 1;""")
+
+    def test_pooled(self):
+        """ Tests that get_db draws readers and writers from the pool registered for each connection type """
+        pools = self.create_pools()
+        with self.app.app_context():
+            reader = engine.get_db()
+            self.assertTrue(reader.execute("""PRAGMA query_only;""").fetchone()['query_only'])
+            self.assertIs(engine.get_db(),reader)
+            ## Each connection type is held separately
+            graph = engine.get_db("graph", write = True)
+            self.assertIsInstance(graph,graphdb.GraphDB)
+            self.assertIs(graph,pools["graph"]._writer)
+            self.assertIs(engine.get_db(),reader)
+            ## A writer can be requested after a reader and is then returned for reads
+            writer = engine.get_db(write = True)
+            self.assertIs(writer,pools[None]._writer)
+            self.assertIs(engine.get_db(),writer)
+            self.assertIs(engine.get_db("graph"),graph)
+        ## Everything is returned to the pool it came from on teardown
+        for pool in pools.values():
+            with pool.reader(timeout = 0): pass
+            with pool.writer(timeout = 0): pass
+            self.assertEqual(pool._readers.qsize(),1)
+
+    def test_close_db(self):
+        """ Tests that close_db returns connections to their pools and discards uncommitted changes """
+        pools = self.create_pools()
+        with pools[None].writer() as db:
+            db.execute(utils.TESTTABLESQL)
+        with self.app.app_context():
+            engine.get_db()
+            engine.get_db(write = True).execute("""INSERT INTO testtable (name,value) VALUES ("Hello",1);""")
+            engine.close_db()
+            self.assertNotIn('dbs',flask.g)
+        with pools[None].reader(timeout = 0) as db:
+            self.assertEqual(db.execute("""SELECT count(*) AS count FROM testtable;""").fetchone()['count'],0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -437,6 +437,45 @@ class VirtualTableCase(unittest.TestCase):
         self.assertEqual(obj,advobj)
         self.assertEqual(obj2,advobj)
 
+class ScannerCase(unittest.TestCase):
+    """ Tests for the Scanner-based parser """
+    def widetable(self, columns = 250):
+        """ Returns a Table definition with the given number of columns """
+        columndefs = ",\n".join(f"column{i} TEXT NOT NULL DEFAULT 'value{i}' CHECK (column{i} != '')" for i in range(columns))
+        return f"""CREATE TABLE widetable (
+    id INTEGER PRIMARY KEY,
+    {columndefs},
+    UNIQUE (column0,column1) ON CONFLICT REPLACE
+) WITHOUT ROWID;"""
+
+    def test_columns(self):
+        """ Tests that each parsed Table owns its Columns and Constraints """
+        definition = "CREATE TABLE parsedcolumns (id INTEGER PRIMARY KEY, name TEXT)"
+        table1 = Parser(definition).obj
+        table2 = Parser(definition).obj
+        self.assertIsNot(table1,table2)
+        self.assertEqual(table1,table2)
+        for table in (table1,table2):
+            for column in table.columns.values():
+                self.assertIs(column.table,table)
+        self.assertIsNot(table1.columns['name'],table2.columns['name'])
+
+        table1.columns['name'].constraints.append(objects.Constraint("NOT NULL"))
+        self.assertTrue(table1.columns['name'].notnull)
+        self.assertFalse(table2.columns['name'].notnull)
+
+    def test_widetable(self):
+        """ Tests that tables with a large number of columns are parsed completely """
+        table = Parser(self.widetable()).obj
+        self.assertEqual(len(table.columns),251)
+        self.assertEqual(table.columns["column249"].datatype,"TEXT")
+        self.assertEqual(len(table.tableconstraints),1)
+
+    def test_withoutrowid_tableconstraints(self):
+        """ WITHOUT ROWID was previously ignored when the Table had Table Constraints """
+        table = Parser(self.widetable(columns = 2)).obj
+        self.assertTrue(table.norowid)
+
 class SpecificCase(unittest.TestCase):
     """ A case to test specific bugs and fixes """
     def test_multiple_multiline_comments(self):
@@ -325,6 +325,30 @@ class AdvancedRowCase(unittest.TestCase):
         email = row.pid.userid.email
         self.assertEqual(email,"jdoe2@email.internet")
 
+    def test_prefetch(self):
+        """ Tests that prefetched Foreign Keys return the same rows as normal traversal without querying the database """
+        self.connection.row_factory = objects.advancedrow_factory
+        table = self.connection.getadvancedtable("comments")
+        expected = [(row.uid,row.pid,row.replyto) for row in table.selectall()]
+
+        rows = table.quickselect(prefetch = ["uid","pid","replyto"])
+        queries = []
+        self.connection.set_trace_callback(queries.append)
+        try:
+            results = [(row.uid,row.pid,row.replyto) for row in rows]
+        finally:
+            self.connection.set_trace_callback(None)
+        self.assertEqual(queries,[])
+        self.assertEqual(results,expected)
+        self.assertIsNone(rows[0].replyto)
+
+    def test_prefetch_bad(self):
+        """ Tests that prefetch only accepts Foreign Key Columns """
+        self.connection.row_factory = objects.advancedrow_factory
+        table = self.connection.getadvancedtable("comments")
+        self.assertRaises(AttributeError,table.select,prefetch = ["notacolumn",])
+        self.assertRaises(ValueError,table.select,prefetch = ["comment",])
+
 
     def test_equality(self):
         """ Tests that two AdvancedRows are equal so long as their rows are equal and their table is equal """
@@ -5,6 +5,7 @@ from alcustoms.sql.objects import Connection,Table
 
 ## Builtin
 import functools
+import inspect
 import pathlib
 
 TESTTABLESQL = """CREATE TABLE testtable(name TEXT, value INTEGER)"""
@@ -127,6 +128,13 @@ def check_physicalfile():
 
 def filemanager(func):
     """ A Decorator to automatically check for, supply, and remove afterwards a physical file (per check_physicalfile) """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def ainner(*args,**kw):
+            file = check_physicalfile()
+            try: return await func(*args,file = file, **kw)
+            finally: check_physicalfile()
+        return ainner
     @functools.wraps(func)
     def inner(*args,**kw):
         file = check_physicalfile()